@@ -0,0 +1,124 @@
+import asyncio
+import copy
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """分析图中的一个阶段：name 是它的输出名，inputs 是它依赖的其他阶段或初始输入的名称"""
+
+    def __init__(self, name, fn, inputs=(), default=None, inline=False):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.default = default
+        self.inline = inline
+
+
+class StageRun:
+    """一次执行的结果：各阶段输出、各阶段耗时（秒，不含等待输入的时间）以及降级的阶段"""
+
+    def __init__(self):
+        self.results = {}
+        self.timings = {}
+        self.degraded = []
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+
+class StageGraph:
+    """
+    声明式的分析阶段图：每个阶段声明自己的输入，执行时只运行所请求输出依赖到的阶段。
+    没有依赖关系的阶段在同一个事件循环里并发执行，被多个阶段共用的输入只计算一次。
+    协程函数直接 await；普通函数放到线程中执行，inline=True 的轻量计算就地执行。
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, fn, inputs=(), default=None, inline=False):
+        if name in self.stages:
+            raise ValueError(f"阶段重复定义: {name}")
+        self.stages[name] = Stage(name, fn, inputs, default, inline)
+        return fn
+
+    def stage(self, name, inputs=(), default=None, inline=False):
+        """装饰器形式的 add"""
+        def decorator(fn):
+            return self.add(name, fn, inputs, default, inline)
+        return decorator
+
+    def _check(self, outputs, provided):
+        """检查所请求的输出都能由已定义的阶段和初始输入得到，且没有环"""
+        visiting, done = set(), set()
+
+        def visit(name, path):
+            if name in provided or name in done:
+                return
+            if name not in self.stages:
+                raise ValueError(f"未定义的阶段或输入: {name}（{' -> '.join(path)}）")
+            if name in visiting:
+                raise ValueError(f"阶段之间存在环: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in outputs:
+            visit(name, [])
+
+    async def run(self, outputs=None, degrade_on=(), **provided):
+        """
+        计算 outputs 中的阶段（默认全部），provided 为初始输入（如 username、client）。
+        阶段抛出 degrade_on 中的异常时使用该阶段 default 值的深拷贝并记为降级，依赖它的阶段照常执行；
+        其他异常直接向上抛出。
+        """
+        outputs = list(outputs or self.stages)
+        self._check(outputs, provided)
+
+        run = StageRun()
+        tasks = {}
+
+        async def resolve(name):
+            if name in provided:
+                return provided[name]
+            if name not in tasks:
+                tasks[name] = asyncio.ensure_future(execute(self.stages[name]))
+            return await tasks[name]
+
+        async def execute(stage):
+            values = await asyncio.gather(*(resolve(name) for name in stage.inputs))
+            kwargs = dict(zip(stage.inputs, values))
+            started = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(stage.fn):
+                    result = await stage.fn(**kwargs)
+                elif stage.inline:
+                    result = stage.fn(**kwargs)
+                else:
+                    result = await asyncio.to_thread(stage.fn, **kwargs)
+            except degrade_on as e:
+                logger.warning(f"阶段 '{stage.name}' 因依赖不可用被跳过: {str(e)}")
+                run.degraded.append(stage.name)
+                # default 在模块级定义、被所有请求共用，每次降级都返回一份深拷贝，避免调用方修改后串到其他请求
+                result = copy.deepcopy(stage.default)
+            run.timings[stage.name] = round(time.perf_counter() - started, 3)
+            run.results[stage.name] = result
+            return result
+
+        try:
+            await asyncio.gather(*(resolve(name) for name in outputs))
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        logger.info(f"分析阶段耗时（秒）: {run.timings}")
+        return run
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import time
+
+import aiohttp
+from requests.structures import CaseInsensitiveDict
+
+from config import GITHUB_ASYNC_CONCURRENCY, GITHUB_BACKOFF_FACTOR, GITHUB_MAX_RETRIES, GITHUB_TIMEOUT
+from github_client import GraphQLError, github_client, last_page_number, max_pages_for, parse_graphql_payload
+from http_cache import build_cached_response
+from negative_cache import NegativeCache
+from rate_limit import RateLimitExceeded, RateLimitScheduler
+from single_flight import current_scope, is_shareable, memoize_json
+
+logger = logging.getLogger(__name__)
+
+# aiohttp 的连接 / 读取错误和超时
+NETWORK_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class AsyncResponse:
+    """异步请求的响应，接口与 requests.Response 中用到的部分保持一致"""
+
+    def __init__(self, status_code, headers, content, url):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.from_cache = False
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8"))
+
+
+class AsyncGitHubClient:
+    """
+    基于 aiohttp 的异步 GitHub 客户端，供同一事件循环内并发执行的采集阶段使用。
+    默认复用同步客户端的速率限制调度器、ETag 缓存和负缓存，两条路径共享同一份配额状态；
+    通过信号量限制同时在途的请求数。需要在 async with 中使用。
+    """
+
+    def __init__(self, sync_client=github_client, timeout=GITHUB_TIMEOUT,
+                 max_concurrency=GITHUB_ASYNC_CONCURRENCY, max_retries=GITHUB_MAX_RETRIES,
+                 backoff_factor=GITHUB_BACKOFF_FACTOR):
+        self.sync_client = sync_client
+        self.scheduler = sync_client.scheduler
+        self.cache = sync_client.cache
+        self.negative_cache = sync_client.negative_cache
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session = None
+        self._semaphore = None
+        self._inflight = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Accept": "application/vnd.github+json"},
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+
+    @property
+    def can_use_graphql(self):
+        return self.sync_client.can_use_graphql
+
+    async def get(self, url, params=None, use_cache=True):
+        """
+        异步 GET 请求，缓存逻辑与 GitHubClient.get 相同。
+        同一 URL 的并发请求只发出一次；request_scope() 内与同步客户端共享已获取的响应。
+        """
+        full_url = self.sync_client.build_url(url, params)
+
+        scope = current_scope()
+        if scope is not None:
+            shared = scope.get(full_url)
+            if shared is not None:
+                return shared
+
+        task = self._inflight.get(full_url)
+        if task is None:
+            task = asyncio.ensure_future(self._get(full_url, use_cache))
+            self._inflight[full_url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(full_url, None))
+        # shield：某个等待者被取消时不影响其他共享同一请求的等待者
+        response = await asyncio.shield(task)
+
+        if scope is not None and is_shareable(response):
+            scope.put(full_url, response)
+        return response
+
+    async def _get(self, full_url, use_cache=True):
+        # ETag 缓存和负缓存读写的是磁盘 / SQLite，放到线程中执行，避免阻塞事件循环
+        cache = self.cache if use_cache else None
+        request_headers = await asyncio.to_thread(cache.conditional_headers, full_url) if cache else {}
+
+        # 与同步客户端一致：有 ETag 缓存条目时先做条件请求，负缓存只兜底没有条目的 404
+        negative = self.negative_cache if use_cache else None
+        if negative and not request_headers:
+            entry = await asyncio.to_thread(negative.get, full_url)
+            if entry is not None:
+                return memoize_json(build_cached_response(full_url, entry["status"], entry["body"]))
+
+        response = await self._send("GET", full_url, headers=request_headers)
+
+        if negative and NegativeCache.is_negative(response):
+            await asyncio.to_thread(
+                negative.mark, full_url, response.status_code, response.content.decode("utf-8", errors="replace")
+            )
+
+        if cache:
+            if response.status_code == 304:
+                cached = await asyncio.to_thread(cache.build_response, full_url, response)
+                if cached is not None:
+                    return memoize_json(cached)
+                return await self._get(full_url, use_cache=False)
+            await asyncio.to_thread(cache.store, full_url, response)
+        return memoize_json(response)
+
+    async def paginate_pages(self, url, params=None, per_page=100, max_pages=None):
+        """
+        GitHubClient.paginate_pages 的异步版本（异步生成器）：
+        读取第 1 页的 Link 头后并发请求剩余页，按页码顺序产出。
+        """
+        params = dict(params or {}, per_page=per_page)
+
+        first = await self.get(url, params=dict(params, page=1))
+        if first.status_code != 200:
+            logger.warning(f"分页请求失败，状态码: {first.status_code}, URL: {url}")
+            return
+        data = first.json()
+        if not data:
+            return
+        yield data
+
+        last_page = last_page_number(first.headers.get("Link"))
+        if max_pages:
+            last_page = min(last_page, max_pages)
+
+        tasks = [
+            asyncio.ensure_future(self.get(url, params=dict(params, page=page)))
+            for page in range(2, last_page + 1)
+        ]
+        try:
+            for page, task in enumerate(tasks, start=2):
+                response = await task
+                if response.status_code != 200:
+                    logger.warning(f"请求第 {page} 页失败，状态码: {response.status_code}, URL: {url}")
+                    break
+                data = response.json()
+                if not data:
+                    break
+                yield data
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def paginate(self, url, params=None, per_page=100, max_items=None):
+        """按顺序逐条产出列表接口的数据，最多 max_items 条"""
+        count = 0
+        async for page in self.paginate_pages(url, params, per_page, max_pages_for(max_items, per_page)):
+            for item in page:
+                yield item
+                count += 1
+                if max_items and count >= max_items:
+                    return
+
+    async def graphql(self, query, variables=None, allow_partial=False):
+        """执行 GraphQL 查询，返回 data 字段；失败时抛出 GraphQLError，allow_partial 含义同 GitHubClient.graphql"""
+        full_url = self.sync_client.build_url("/graphql")
+        response = await self._send("POST", full_url, json={"query": query, "variables": variables or {}})
+        if response.status_code != 200:
+            raise GraphQLError(f"GraphQL 请求失败，状态码: {response.status_code}")
+        return parse_graphql_payload(response.json(), allow_partial)
+
+    async def _acquire(self, resource):
+        """异步版本的 RateLimitScheduler.acquire，等待期间不阻塞事件循环"""
+        token, delay = self.scheduler.reserve(resource)
+        if delay > 0:
+            if self.scheduler.max_wait is not None and delay > self.scheduler.max_wait:
+                raise RateLimitExceeded(resource, time.time() + delay)
+            logger.info(f"GitHub {resource} 配额不足，等待 {delay:.1f} 秒")
+            await asyncio.sleep(delay)
+        return token
+
+    async def _request(self, method, full_url, headers, **kwargs):
+        """发送单次请求，连接错误和 5xx 按指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session.request(method, full_url, headers=headers, **kwargs) as resp:
+                    content = await resp.read()
+                    response = AsyncResponse(resp.status, resp.headers, content, full_url)
+                if response.status_code < 500 or attempt == self.max_retries:
+                    return response
+            except NETWORK_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def _send(self, method, full_url, **kwargs):
+        """经过与同步客户端共享的熔断器发送请求"""
+        breaker = self.sync_client.breaker
+        breaker.before_call()
+        try:
+            response = await self._send_with_rate_limit(method, full_url, **kwargs)
+        except NETWORK_ERRORS + (RateLimitExceeded,):
+            breaker.record_failure()
+            raise
+        if self.sync_client.is_dependency_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def _send_with_rate_limit(self, method, full_url, headers=None, **kwargs):
+        """经过速率限制调度发送请求，被限流的令牌隔离后换用其他令牌重试"""
+        resource = RateLimitScheduler.resource_for_url(full_url)
+        max_attempts = len(self.scheduler.tokens) + 1
+        async with self._semaphore:
+            for attempt in range(max_attempts):
+                token = await self._acquire(resource)
+                request_headers = dict(headers or {})
+                if token:
+                    request_headers["Authorization"] = f"token {token}"
+                response = await self._request(method, full_url, request_headers, **kwargs)
+                self.scheduler.update(token, resource, response.headers)
+
+                wait = self.scheduler.wait_time_after_limited(token, resource, response)
+                if wait is None or attempt == max_attempts - 1:
+                    return response
+                logger.warning(f"GitHub {resource} 请求被限流，切换令牌重试: {full_url}")
+                self.scheduler.quarantine(token, resource, time.time() + wait)
+            return response
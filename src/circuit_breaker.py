@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+
+import requests
+
+from config import BREAKER_FAILURE_THRESHOLD, BREAKER_RECOVERY_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# 计为失败的传输层错误：连不上、超时。依赖返回的业务错误（如模型输出无法解析）说明服务本身可用，不触发熔断
+TRANSPORT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """熔断器处于打开状态，调用被立即拒绝"""
+
+    def __init__(self, name, retry_at):
+        self.name = name
+        self.retry_at = retry_at
+        super().__init__(f"{name} 熔断中，{max(0, retry_at - time.time()):.0f} 秒后再尝试")
+
+
+class CircuitBreaker:
+    """
+    简单的三态熔断器：
+    - closed：正常放行，连续失败达到阈值后打开；
+    - open：在 recovery_timeout 内直接拒绝调用（抛出 CircuitOpenError）；
+    - half_open：冷却结束后只放行一个探测调用，成功则关闭，失败则重新打开；
+      探测调用超过 recovery_timeout 仍未报告结果（如被取消）时，再放行一个新的探测调用。
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout=BREAKER_RECOVERY_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """当前是否会拒绝调用（冷却期内的 open 状态，或已有探测调用在进行的 half_open 状态）"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.time() < self.opened_at + self.recovery_timeout
+            return self.state == self.HALF_OPEN and self._probe_pending(time.time())
+
+    def _probe_pending(self, now):
+        """是否有仍在等待结果的探测调用（调用方需持有锁）"""
+        return self._probe_in_flight and now < self.probe_started_at + self.recovery_timeout
+
+    def check(self):
+        """不改变状态的检查：熔断中则抛出 CircuitOpenError，用于在整个阶段开始前快速失败"""
+        if self.is_open:
+            raise CircuitOpenError(self.name, self.opened_at + self.recovery_timeout)
+
+    def before_call(self):
+        """调用前检查，熔断时抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.time()
+            retry_at = self.opened_at + self.recovery_timeout
+            if self.state == self.OPEN and now >= retry_at:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_pending(now):
+                self._probe_in_flight = True
+                self.probe_started_at = now
+                logger.info(f"{self.name} 熔断冷却结束，放行一次探测调用")
+                return
+            if self.state == self.HALF_OPEN:
+                retry_at = self.probe_started_at + self.recovery_timeout
+        raise CircuitOpenError(self.name, retry_at)
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} 探测调用成功，熔断器关闭")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"{self.name} 连续失败 {self.failures} 次，熔断 {self.recovery_timeout} 秒")
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self._probe_in_flight = False
+
+    def call(self, fn, *args, **kwargs):
+        """通过熔断器执行调用，只有 TRANSPORT_ERRORS 计为失败；其他异常照常抛出，也说明依赖可达"""
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except TRANSPORT_ERRORS:
+            self.record_failure()
+            raise
+        except Exception:
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+# 进程内共享的熔断器：GitHub API、Ollama 大模型、Ollama 向量嵌入
+github_breaker = CircuitBreaker("GitHub API")
+ollama_llm_breaker = CircuitBreaker("Ollama LLM")
+ollama_embedding_breaker = CircuitBreaker("Ollama Embedding")
+
@@ -1,6 +1,46 @@
 import os
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 headers = {"Authorization": f"token {GITHUB_TOKEN}"}
+# 多个令牌用逗号分隔，例如 GITHUB_TOKENS="ghp_a,ghp_b"；未设置时退回单个 GITHUB_TOKEN
+GITHUB_TOKENS = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",") if t.strip()] \
+    or ([GITHUB_TOKEN] if GITHUB_TOKEN else [])
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_TIMEOUT = 10           # 单次 GitHub 请求的默认超时（秒）
+GITHUB_POOL_SIZE = 20         # 连接池中保持的 keep-alive 连接数
+GITHUB_MAX_RETRIES = 3        # 连接错误 / 5xx 时的最大重试次数
+GITHUB_BACKOFF_FACTOR = 0.5   # 重试退避系数：0.5s, 1s, 2s ...
+GITHUB_ASYNC_CONCURRENCY = 16  # 异步采集时同时在途的 GitHub 请求上限
+GITHUB_PAGINATION_WORKERS = 8  # 并行分页时同时请求的页数上限
+GITHUB_FETCH_WORKERS = 8  # 批量并发 GET（如各仓库的 languages_url）时的线程数上限
+GITHUB_CACHE_DIR = os.getenv("GITHUB_CACHE_DIR", "./github_cache")  # GitHub 相关持久化缓存的根目录
+GITHUB_PACE_THRESHOLD = 0.2   # 剩余配额低于该比例时开始匀速节流
+GITHUB_MAX_RATE_LIMIT_WAIT = 300  # 配额耗尽时最多等待的秒数，超过则直接报错而不是阻塞
+GITHUB_USE_GRAPHQL = True     # 有令牌时优先用 GraphQL 批量获取数据，失败再回退到 REST
+HTTP_CACHE_ENABLED = True     # 是否启用基于 ETag / Last-Modified 的条件请求缓存
+BREAKER_FAILURE_THRESHOLD = 5  # 连续失败多少次后熔断 GitHub / Ollama 调用
+BREAKER_RECOVERY_TIMEOUT = 60  # 熔断后多少秒再放行探测调用
+NEGATIVE_CACHE_TTL = 6 * 3600  # 404、空列表、博客不可访问等缺失结果的缓存时间（秒）
+DOMAIN_ANALYSIS_MAX_REPOS = 100  # 领域分析最多使用的 owner 仓库数（从仓库快照中挑选）
+DOMAIN_ANALYSIS_ORDER_BY = "pushed"  # 领域分析挑选仓库的顺序："pushed"（最近活跃优先）或 "stars"（Star 数优先）
+EVENT_TIMES_MAX = 1000  # 事件游标中最多保留的事件时间数，用于活跃时间分析
+EVENT_SCORE_HALF_LIFE_DAYS = 90  # 事件游标中各仓库原始贡献分数的半衰期（天），与 GitHub /events 只保留约 90 天一致
+EVENT_SCORE_MIN = 0.01  # 衰减后低于该值的仓库从游标中移除
+TIMEZONE_MIN_EVENTS = 20  # 推测时区至少需要的事件数
+TIMEZONE_MAX_CONFIDENCE = 0.35  # 时区证据在国家预测中的最高置信度，取值理由见 timezone_analysis.analyze_timezone
+REPO_METADATA_TTL = 3600  # 贡献仓库 star / fork 等元数据在进程内的缓存时间（秒）
+REPO_METADATA_CACHE_SIZE = 10000  # 进程内最多缓存多少个仓库的元数据
+FOLLOW_LIST_MAX_ITEMS = 1000  # 枚举关注者 / 关注中列表时最多读取的用户数
+NATION_DETECT_SAMPLE_SIZE = 50  # 按关注关系推测国家时，每类最多查看多少个用户的资料
+NATION_DETECT_SAMPLING = "random"  # 抽样方式："random"（随机分页抽样）或 "recent"（GitHub 返回顺序的前若干个）
+USER_LOCATION_TTL = 7 * 24 * 3600  # 用户 location / bio 持久化缓存的有效期（秒）
+SOCIAL_CRAWL_WORKERS = 8  # 社交网络分析时同时在途的 GitHub 请求数上限（节点爬取和位置查询共用）
+SOCIAL_FOLLOWING_MAX_ITEMS = 300  # 社交网络分析时每个节点读取的关注中列表上限，只用来判断前几个关注者是否互相关注
+SOCIAL_CRAWL_MAX_CALLS = 300  # 单次社交网络分析最多发出的 GitHub 请求数
+SOCIAL_CRAWL_DEADLINE = 30  # 单次社交网络分析最多花费的时间（秒），超时返回已得到的部分结果
+SOCIAL_GRAPH_TTL = 7 * 24 * 3600  # 已爬取的关注 / 合作关系在社交图存储中的有效期（秒）
+SOCIAL_GRAPH_LOG_MIN_EDGES = 10000  # 社交图日志中的边数少于该值时不合并进 CSR
+SOCIAL_GRAPH_LOG_MAX_EDGES = 500000  # 社交图日志中的边数达到该值时一定合并，限制日志索引占用的内存
+SOCIAL_GRAPH_LOG_RATIO = 0.25  # 两者之间，日志边数达到 CSR 边数的该比例时合并，合并的总开销与写入的边数成正比
 CHUNK_SIZE = 1200
 CHUNK_OVERLAP = 200
 DOWNLOAD_DIR = "./downloaded"
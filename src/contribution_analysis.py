@@ -1,44 +1,59 @@
-import requests
-from config import headers
+import asyncio
+import logging
+from datetime import datetime
 
-def calculate_contribution_score(events):
+from config import EVENT_SCORE_HALF_LIFE_DAYS, EVENT_SCORE_MIN, EVENT_TIMES_MAX
+from event_cursor import event_cursor_store
+from github_client import github_client, last_page_number
+from repo_metadata import get_repos_metadata, get_repos_metadata_async
+
+# 各类事件的原始贡献权重
+CONTRIBUTION_WEIGHTS = {
+    "PushEvent": 0.4,
+    "PullRequestEvent": 0.3,
+    "IssuesEvent": 0.2,
+    "ForkEvent": 0.05,
+    "WatchEvent": 0.05
+}
+
+EVENTS_PER_PAGE = 100
+
+logger = logging.getLogger(__name__)
+
+
+def accumulate_raw_scores(raw_scores, events):
     """
-    根据用户的活动事件计算贡献分数，返回每个仓库的贡献分数和贡献评价。
+    把事件的原始贡献权重累加进 raw_scores（仓库名 -> 原始分数），新仓库按首次出现的顺序加入。
+    可以分多次调用，逐页或逐批折叠事件。
     """
-    weights = {
-        "PushEvent": 0.4,
-        "PullRequestEvent": 0.3,
-        "IssuesEvent": 0.2,
-        "ForkEvent": 0.05,
-        "WatchEvent": 0.05
-    }
-    contribution_score = {}
-
     for event in events:
         repo_name = event["repo"]["name"]
         event_type = event["type"]
 
         # 初始化项目的贡献分数
-        if repo_name not in contribution_score:
-            contribution_score[repo_name] = 0
+        if repo_name not in raw_scores:
+            raw_scores[repo_name] = 0
 
         # 更新贡献分数
-        if event_type in weights:
+        if event_type in CONTRIBUTION_WEIGHTS:
             # 如果是 PullRequestEvent 并且未合并，权重减半
             if event_type == "PullRequestEvent" and not event.get("payload", {}).get("pull_request", {}).get("merged",
                                                                                                              False):
-                contribution_score[repo_name] += weights[event_type] / 2
+                raw_scores[repo_name] += CONTRIBUTION_WEIGHTS[event_type] / 2
             else:
-                contribution_score[repo_name] += weights[event_type]
+                raw_scores[repo_name] += CONTRIBUTION_WEIGHTS[event_type]
+    return raw_scores
 
-    # 为没有事件记录的仓库分配最低贡献度
-    for repo in contribution_score:
-        if contribution_score[repo] == 0:
-            contribution_score[repo] = 0.1  # 最低贡献分数
 
-    # 根据贡献分数返回贡献度评价
+def evaluate_contribution_scores(raw_scores):
+    """把累计的原始分数换算成每个仓库的贡献度评价（1-3）"""
     contribution_evaluation = {}
-    for repo, score in contribution_score.items():
+    for repo, score in raw_scores.items():
+        # 为没有事件记录的仓库分配最低贡献度
+        if score == 0:
+            score = 0.1  # 最低贡献分数
+
+        # 根据贡献分数返回贡献度评价
         if score >= 1.5:
             evaluation = 3
         elif score >= 0.5:
@@ -50,6 +65,13 @@ def calculate_contribution_score(events):
     return contribution_evaluation
 
 
+def calculate_contribution_score(events):
+    """
+    根据用户的活动事件计算贡献分数，返回每个仓库的贡献分数和贡献评价。
+    """
+    return evaluate_contribution_scores(accumulate_raw_scores({}, events))
+
+
 def evaluate_combined_influence(repo_star, repo_fork):
     """
     根据仓库的 star 数和 fork 数计算贡献项目的影响力
@@ -90,56 +112,186 @@ def evaluate_overall_contribution(contributed_repos):
     return total_score
 
 
-def get_user_contributed_repos(username):
+def _build_contributed_repo(repo_name, repo_data, contribution_scores):
+    """由仓库详情和贡献分数构造贡献仓库记录"""
+    repo_star = repo_data.get("stargazers_count", 0)
+    repo_fork = repo_data.get("forks_count", 0)
+    return {
+        "repo_name": repo_name,
+        "repo_star": repo_star,
+        "repo_influence": evaluate_combined_influence(repo_star, repo_fork),
+        "repo_url": repo_data.get("html_url", ""),
+        "contribution": contribution_scores.get(repo_name, 0)
+    }
+
+
+def _take_new_events(events, last_event_id):
+    """取出比游标更新的事件，返回 (新事件, 是否已读到游标位置)"""
+    if last_event_id is None:
+        return events, False
+    new_events = [event for event in events if int(event["id"]) > last_event_id]
+    return new_events, len(new_events) < len(events)
+
+
+def _parse_event_time(created_at):
+    return datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%SZ")
+
+
+def _decay_scores(raw_scores, previous_newest, newest):
     """
-    获取用户每个贡献过的仓库的资料，包括仓库的名称、star 数、仓库地址和贡献分数。
+    按两批事件之间的时间间隔给已累计的原始分数做指数衰减（半衰期 EVENT_SCORE_HALF_LIFE_DAYS 天），
+    让游标里的分数反映近期贡献，而不是随分析次数无限累加；衰减到 EVENT_SCORE_MIN 以下的仓库直接移除，
+    游标大小也因此有界。时间取事件自身的 created_at，与分析的频率无关。
+    """
+    if not raw_scores or not previous_newest or not newest:
+        return dict(raw_scores)
+    elapsed_days = (_parse_event_time(newest) - _parse_event_time(previous_newest)).total_seconds() / 86400
+    if elapsed_days <= 0:
+        return dict(raw_scores)
+    factor = 0.5 ** (elapsed_days / EVENT_SCORE_HALF_LIFE_DAYS)
+    return {repo: score * factor for repo, score in raw_scores.items() if score * factor >= EVENT_SCORE_MIN}
+
+
+def _fold_events(cursor, new_events, etag):
+    """把新事件折叠进游标状态：旧分数按时间衰减后累加新事件的原始分数、记录事件时间、推进 last_event_id"""
+    if not new_events:
+        return dict(cursor, etag=etag or cursor["etag"])
+    event_times = [event["created_at"] for event in new_events if event.get("created_at")]
+    previous_newest = cursor["event_times"][0] if cursor["event_times"] else None
+    raw_scores = _decay_scores(cursor["raw_scores"], previous_newest, max(event_times, default=None))
+    raw_scores = accumulate_raw_scores(raw_scores, new_events)
+    return {
+        "last_event_id": max(int(event["id"]) for event in new_events),
+        "etag": etag,
+        "raw_scores": raw_scores,
+        "event_times": (event_times + cursor["event_times"])[:EVENT_TIMES_MAX],
+    }
+
+
+def _event_pages(username, cursor):
+    """
+    增量读取 /events 的分页流程，同步和异步路径共用：每次 yield 一组要请求的页码，
+    由调用方并发请求后按页码顺序把响应列表 send 回来；结束时通过 StopIteration.value 返回 (新事件列表, 第 1 页 ETag)，
+    第 1 页请求失败时返回 (None, None)。
+    已有游标时第 1 页 ETag 未变即没有新事件，只花一次条件请求；否则逐页顺序读取，读到游标位置就停止。
+    首次采集时剩余页一次性并发获取。
     """
+    last_event_id = cursor["last_event_id"]
 
-    contributed_repos = []  # 存储符合条件的仓库信息
-    page = 1
+    first, = yield [1]
+    if first.status_code != 200:
+        logger.warning(f"请求用户事件失败，状态码: {first.status_code}，用户: {username}")
+        return None, None
+    etag = first.headers.get("ETag")
+    if last_event_id is not None and etag and etag == cursor["etag"]:
+        return [], etag
 
-    while True:
-        url = f"https://api.github.com/users/{username}/events?page={page}&per_page=100"
-        response = requests.get(url, headers=headers)
+    new_events, reached = _take_new_events(first.json(), last_event_id)
+    last_page = last_page_number(first.headers.get("Link"))
+    if reached or last_page <= 1:
+        return new_events, etag
 
+    if last_event_id is None:
+        responses = yield list(range(2, last_page + 1))
+        for response in responses:
+            if response.status_code != 200:
+                break
+            new_events.extend(response.json())
+        return new_events, etag
+
+    for page in range(2, last_page + 1):
+        response, = yield [page]
         if response.status_code != 200:
-            print(f"请求用户活动失败，状态码: {response.status_code}")
             break
-
-        events = response.json()
-        if not events:
+        events, reached = _take_new_events(response.json(), last_event_id)
+        new_events.extend(events)
+        if reached:
             break
+    return new_events, etag
+
+
+def _events_url(username):
+    return f"https://api.github.com/users/{username}/events"
+
+
+def _fetch_new_events(username, cursor):
+    """获取游标之后的新事件（新→旧），返回 (新事件列表, 第 1 页 ETag)，分页流程见 _event_pages"""
+    url = _events_url(username)
+    pages = _event_pages(username, cursor)
+    try:
+        page_numbers = next(pages)
+        while True:
+            if len(page_numbers) == 1:
+                responses = [github_client.get(url, params={"per_page": EVENTS_PER_PAGE, "page": page_numbers[0]})]
+            else:
+                responses = github_client.get_many(
+                    github_client.build_url(url, {"per_page": EVENTS_PER_PAGE, "page": page}) for page in page_numbers
+                )
+            page_numbers = pages.send(responses)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _apply_new_events(username, cursor, new_events, etag):
+    """把新事件折叠进游标并保存，返回最新的游标状态；new_events 为 None（请求失败）时沿用旧状态"""
+    if new_events is None:
+        return cursor
+    updated = _fold_events(cursor, new_events, etag)
+    if new_events or updated["etag"] != cursor["etag"]:
+        event_cursor_store.save(username, updated, cursor["last_event_id"])
+    return updated
+
 
-        # 计算贡献分数
-        contribution_scores = calculate_contribution_score(events)
-
-        # 遍历用户的活动，统计每个仓库的事件
-        for event in events:
-            repo_name = event["repo"]["name"]  # 获取仓库名称
-
-            # 检查是否已记录该仓库
-            if not any(repo["repo_name"] == repo_name for repo in contributed_repos):
-                # 获取仓库的 star 数和 URL
-                repo_url = f"https://api.github.com/repos/{repo_name}"
-                repo_response = requests.get(repo_url, headers=headers)
-                if repo_response.status_code == 200:
-                    repo_data = repo_response.json()
-                    repo_star = repo_data.get("stargazers_count", 0)
-                    repo_fork = repo_data.get("forks_count", 0)
-
-                    contributed_repos.append({
-                        "repo_name": repo_name,
-                        "repo_star": repo_star,
-                        "repo_influence": evaluate_combined_influence(repo_star, repo_fork),
-                        "repo_url": repo_data.get("html_url", ""),
-                        "contribution": contribution_scores.get(repo_name, 0)
-                    })
-                else:
-                    print(f"请求仓库详情失败，状态码: {repo_response.status_code}，仓库: {repo_name}")
-
-        page += 1
-
-    return contributed_repos
+def _build_contributed_repos(raw_scores, metadata):
+    contribution_scores = evaluate_contribution_scores(raw_scores)
+    return [
+        _build_contributed_repo(repo_name, metadata[repo_name], contribution_scores)
+        for repo_name in raw_scores
+        if repo_name in metadata
+    ]
+
+
+def refresh_user_event_cursor(username):
+    """增量采集用户的新事件，返回最新的游标状态（各仓库原始分数、最近的事件时间等）"""
+    cursor = event_cursor_store.load(username)
+    new_events, etag = _fetch_new_events(username, cursor)
+    return _apply_new_events(username, cursor, new_events, etag)
+
+
+def get_user_contributed_repos(username):
+    """
+    获取用户每个贡献过的仓库的资料，包括仓库的名称、star 数、仓库地址和贡献分数。
+    事件按用户游标增量采集：只折叠上次分析之后的新事件，各仓库的原始分数持久累计后再统一换算评价；
+    最后一次性批量获取各仓库的 star / fork（GraphQL 每批 100 个，失败回退 REST）。
+    """
+    raw_scores = refresh_user_event_cursor(username)["raw_scores"]
+    return _build_contributed_repos(raw_scores, get_repos_metadata(list(raw_scores)))
+
+
+async def _fetch_new_events_async(username, cursor, client):
+    """_fetch_new_events 的异步版本，client 为 AsyncGitHubClient"""
+    url = _events_url(username)
+    pages = _event_pages(username, cursor)
+    try:
+        page_numbers = next(pages)
+        while True:
+            responses = await asyncio.gather(*(
+                client.get(url, params={"per_page": EVENTS_PER_PAGE, "page": page}) for page in page_numbers
+            ))
+            page_numbers = pages.send(list(responses))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def get_user_contributed_repos_async(username, client):
+    """
+    get_user_contributed_repos 的异步版本，client 为 AsyncGitHubClient。
+    """
+    cursor = event_cursor_store.load(username)
+    new_events, etag = await _fetch_new_events_async(username, cursor, client)
+    cursor = _apply_new_events(username, cursor, new_events, etag)
+    raw_scores = cursor["raw_scores"]
+    return _build_contributed_repos(raw_scores, await get_repos_metadata_async(list(raw_scores), client))
 
 def calculate_talent_rank(total_stars, followers, contribution_score):
     # 定义权重
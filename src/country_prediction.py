@@ -1,14 +1,60 @@
 import logging
 
+from circuit_breaker import CircuitOpenError
 from geo_utils import geocode_location
 from language_culture import analyze_language_culture_hints
-from social_network import analyze_social_network
+from repo_snapshot import build_repo_snapshot
+from single_flight import memoize_in_scope, scoped
+from social_network import crawl_social_network
+from timezone_analysis import analyze_timezone
 from user_profile import get_user_profile
 
+# 社交网络分析的深度
+SOCIAL_NETWORK_DEPTH = 3
 
 
-def predict_country_with_confidence(username):
-    """综合多种方法推测开发者所在国家，并提供置信度"""
+# 语言到国家的映射
+LANGUAGE_COUNTRY_MAP = {
+    "Chinese": "CN",
+    "Japanese": "JP",
+    "Korean": "KR",
+    "Russian": "RU",
+    "Arabic": "SA",  # 沙特阿拉伯作为阿拉伯语的代表国家
+    "Hindi": "IN",
+    "Thai": "TH",
+    "Hebrew": "IL",
+    "Spanish": "ES",
+    "French": "FR",
+    "German": "DE",
+    "Portuguese": "BR",  # 巴西作为葡萄牙语使用人数最多的国家
+    "Italian": "IT"
+}
+
+
+def _shared_evidence(username, source, compute):
+    """
+    每种证据在一次请求作用域内只计算一次：predict_developer_country 先算出的个人资料、时区、
+    语言文化和社交网络结果，predict_country_with_confidence 直接复用，不再重复爬取。
+    """
+    return memoize_in_scope(f"country_evidence:{source}:{username}", compute)
+
+
+def timezone_language_agreement(timezone_data, language_data):
+    """活跃时区推测的国家与首要语言线索指向同一国家时返回该国家代码，否则返回 None"""
+    if not timezone_data or not timezone_data.get("country") or not language_data:
+        return None
+    combined_languages = language_data.get("combined_languages") or []
+    if combined_languages and LANGUAGE_COUNTRY_MAP.get(combined_languages[0][0]) == timezone_data["country"]:
+        return timezone_data["country"]
+    return None
+
+
+@scoped
+def predict_country_with_confidence(username, snapshot=None):
+    """
+    综合多种方法推测开发者所在国家，并提供置信度；snapshot 为该开发者的 RepoSnapshot，未传入时按需构建。
+    各项证据在请求作用域内共享，同一请求中已经算过的不会重复计算。
+    """
     logger = logging.getLogger(__name__)
     logger.info(f"开始为用户 '{username}' 预测国家")
     
@@ -18,7 +64,7 @@ def predict_country_with_confidence(username):
     
     # 获取基本资料
     try:
-        profile = get_user_profile(username)
+        profile = _shared_evidence(username, "profile", lambda: get_user_profile(username))
         if profile and profile.get("国家") and profile.get("国家") != "Unknown":
             country = profile.get("国家")
             logger.info(f"用户 '{username}' 的个人资料中声明的国家/地区: {country}")
@@ -38,109 +84,58 @@ def predict_country_with_confidence(username):
                 logger.info(f"无法从个人资料中的位置 '{country}' 识别出国家代码")
         else:
             logger.info(f"用户 '{username}' 的个人资料中没有有效的国家/地区信息")
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.warning(f"获取用户 '{username}' 的个人资料时发生错误: {str(e)}")    
     
-    # 分析社交网络
+    # 仓库快照：社交网络和语言文化分析共用，仓库列表只获取一次
+    if snapshot is None:
+        try:
+            snapshot = build_repo_snapshot(username)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.warning(f"获取用户 '{username}' 的仓库快照失败: {str(e)}")
+
+    # 分析活跃时间推测时区：使用贡献分析已采集的事件时间，几乎不产生额外请求
+    timezone_data = None
     try:
-        logger.info(f"开始分析用户 '{username}' 的社交网络位置信息...")
-        social_data = analyze_social_network(username, depth=3)
-        if social_data and len(social_data) > 0:
-            # 获取前三个最常见位置
-            top_locations = social_data[:min(3, len(social_data))]
-            logger.info(f"用户 '{username}' 社交网络中最常见的位置: {top_locations}")
-            logger.info(f"社交网络分析共找到 {len(social_data)} 个位置，取前 {len(top_locations)} 个进行分析")
-            
-            # 计算总权重
-            total_weight = sum([x[1] for x in social_data])
-            logger.info(f"社交网络位置总权重: {total_weight}")
-            
-            # 详细记录所有社交网络位置数据
-            for idx, (loc, w) in enumerate(social_data):
-                logger.info(f"社交网络位置 #{idx+1}: {loc}, 权重: {w}, 占比: {w/total_weight:.4f}")
-            
-            # 处理每个位置
-            for i, (location, weight) in enumerate(top_locations):
-                logger.info(f"开始处理社交网络位置 #{i+1}: {location}, 权重: {weight}")
-                geo_country = geocode_location(location)
-                logger.info(f"位置 '{location}' 地理编码结果: {geo_country}")
-                
-                if geo_country:
-                    # 为每个位置创建单独的证据
-                    evidence_key = f"social_{i+1}"
-                    evidence[evidence_key] = geo_country
-                    
-                    # 计算该位置的权重占比
-                    weight_ratio = weight / total_weight if total_weight > 0 else 0
-                    logger.info(f"位置 '{location}' 权重占比: {weight_ratio:.4f}")
-                    
-                    # 根据权重比例和排名调整置信度
-                    rank_factor = 0.1 if i == 0 else 0.05 if i == 1 else 0.02  # 排名越高权重越大
-                    logger.info(f"位置 '{location}' 排名因子: {rank_factor}")
-                    
-                    concentration_factor = min(0.2, weight_ratio * 0.5)  # 权重集中度
-                    logger.info(f"位置 '{location}' 权重集中度因子: {concentration_factor:.4f}")
-                    
-                    # 由于社交网络深度分析增强，略微提高基础置信度
-                    base_confidence = 0.25
-                    logger.info(f"位置 '{location}' 基础置信度: {base_confidence}")
-                    
-                    confidence_scores[evidence_key] = base_confidence + rank_factor + concentration_factor
-                    logger.info(f"位置 '{location}' 初始置信度计算: {base_confidence} + {rank_factor} + {concentration_factor:.4f} = {confidence_scores[evidence_key]:.4f}")
-                    
-                    # 如果社交网络样本量太小（少于3个关注者），进一步降低置信度
-                    if total_weight < 3:
-                        original_confidence = confidence_scores[evidence_key]
-                        confidence_scores[evidence_key] *= 0.8
-                        logger.info(f"社交网络样本量较小(总权重={total_weight})，降低置信度: {original_confidence:.4f} * 0.8 = {confidence_scores[evidence_key]:.4f}")
-                    
-                    evidence_details[evidence_key] = {
-                        "source": f"社交网络位置{i+1}",
-                        "raw_value": location,
-                        "mapped_value": geo_country,
-                        "weight": weight,
-                        "weight_ratio": weight_ratio,
-                        "confidence": confidence_scores[evidence_key]
-                    }
-                    
-                    logger.info(f"从社交网络位置 '{location}' 识别出国家代码: {geo_country}, 最终置信度: {confidence_scores[evidence_key]:.4f}")
-                else:
-                    logger.info(f"社交网络位置 '{location}' 无法映射到国家代码，忽略此位置")
-        else:
-            logger.info(f"用户 '{username}' 没有足够的社交网络数据")
+        timezone_data = _shared_evidence(username, "timezone", lambda: analyze_timezone(username))
+        if timezone_data and timezone_data.get("country") and timezone_data.get("confidence", 0) > 0:
+            timezone_country = timezone_data["country"]
+            evidence["timezone"] = timezone_country
+            confidence_scores["timezone"] = timezone_data["confidence"]
+            evidence_details["timezone"] = {
+                "source": "活跃时间分布",
+                "raw_value": timezone_data["commit_timezone"],
+                "mapped_value": timezone_country,
+                "event_count": timezone_data["event_count"],
+                "confidence": timezone_data["confidence"]
+            }
+            logger.info(f"从活跃时间 {timezone_data['commit_timezone']} 推测国家代码: {timezone_country}, 置信度: {timezone_data['confidence']:.2f}")
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        logger.warning(f"分析用户 '{username}' 的社交网络时发生错误: {str(e)}")
+        logger.warning(f"分析用户 '{username}' 的活跃时区时发生错误: {str(e)}")
     
     # 分析语言文化线索
+    language_data = None
     try:
-        language_data = analyze_language_culture_hints(username)
+        language_data = _shared_evidence(
+            username, "language_culture", lambda: analyze_language_culture_hints(username, snapshot=snapshot)
+        )
         if language_data:
             # 使用合并后的语言结果
             combined_languages = language_data.get("combined_languages", [])
             if combined_languages and len(combined_languages) > 0:
-                # 语言到国家的映射
-                lang_country_map = {
-                    "Chinese": "CN",
-                    "Japanese": "JP",
-                    "Korean": "KR",
-                    "Russian": "RU",
-                    "Arabic": "SA",  # 沙特阿拉伯作为阿拉伯语的代表国家
-                    "Hindi": "IN",
-                    "Thai": "TH",
-                    "Hebrew": "IL",
-                    "Spanish": "ES",
-                    "French": "FR",
-                    "German": "DE",
-                    "Portuguese": "BR",  # 巴西作为葡萄牙语使用人数最多的国家
-                    "Italian": "IT"
-                }
                 
                 # 处理前两种最常见的语言
                 for i, (lang, count) in enumerate(combined_languages[:min(2, len(combined_languages))]):
                     logger.info(f"用户 '{username}' 检测到的语言: {lang}, 权重: {count}")
-                    if lang in lang_country_map:
+                    if lang in LANGUAGE_COUNTRY_MAP:
                         evidence_key = f"language_{i+1}"
-                        evidence[evidence_key] = lang_country_map[lang]
+                        evidence[evidence_key] = LANGUAGE_COUNTRY_MAP[lang]
                         
                         # 根据语言的独特性和计数调整置信度
                         # 某些语言（如中文、日文、韩文）更具地域特征
@@ -153,19 +148,100 @@ def predict_country_with_confidence(username):
                         evidence_details[evidence_key] = {
                             "source": f"语言文化线索{i+1}",
                             "raw_value": lang,
-                            "mapped_value": lang_country_map[lang],
+                            "mapped_value": LANGUAGE_COUNTRY_MAP[lang],
                             "count": count,
                             "confidence": confidence_scores[evidence_key]
                         }
                         
-                        logger.info(f"从语言 {lang} 推测国家代码: {lang_country_map[lang]}, 置信度: {confidence_scores[evidence_key]:.2f}")
+                        logger.info(f"从语言 {lang} 推测国家代码: {LANGUAGE_COUNTRY_MAP[lang]}, 置信度: {confidence_scores[evidence_key]:.2f}")
             else:
                 logger.info(f"用户 '{username}' 没有足够的语言文化线索")
         else:
             logger.info(f"用户 '{username}' 没有语言文化数据")
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.warning(f"分析用户 '{username}' 的语言文化线索时发生错误: {str(e)}")
     
+    # 时区和主要语言指向同一个国家时，证据已经足够，跳过请求量最大的社交网络爬取
+    agreed_country = timezone_language_agreement(timezone_data, language_data)
+    if agreed_country:
+        logger.info(f"用户 '{username}' 的时区与语言线索一致({agreed_country})，跳过社交网络分析")
+    else:
+        # 分析社交网络
+        try:
+            logger.info(f"开始分析用户 '{username}' 的社交网络位置信息...")
+            social_data = _shared_evidence(
+                username, "social_network", lambda: crawl_social_network(username, depth=SOCIAL_NETWORK_DEPTH, snapshot=snapshot)
+            )["locations"]
+            if social_data and len(social_data) > 0:
+                # 获取前三个最常见位置
+                top_locations = social_data[:min(3, len(social_data))]
+                logger.info(f"用户 '{username}' 社交网络中最常见的位置: {top_locations}")
+                logger.info(f"社交网络分析共找到 {len(social_data)} 个位置，取前 {len(top_locations)} 个进行分析")
+            
+                # 计算总权重
+                total_weight = sum([x[1] for x in social_data])
+                logger.info(f"社交网络位置总权重: {total_weight}")
+            
+                # 详细记录所有社交网络位置数据
+                for idx, (loc, w) in enumerate(social_data):
+                    logger.info(f"社交网络位置 #{idx+1}: {loc}, 权重: {w}, 占比: {w/total_weight:.4f}")
+            
+                # 处理每个位置
+                for i, (location, weight) in enumerate(top_locations):
+                    logger.info(f"开始处理社交网络位置 #{i+1}: {location}, 权重: {weight}")
+                    geo_country = geocode_location(location)
+                    logger.info(f"位置 '{location}' 地理编码结果: {geo_country}")
+                
+                    if geo_country:
+                        # 为每个位置创建单独的证据
+                        evidence_key = f"social_{i+1}"
+                        evidence[evidence_key] = geo_country
+                    
+                        # 计算该位置的权重占比
+                        weight_ratio = weight / total_weight if total_weight > 0 else 0
+                        logger.info(f"位置 '{location}' 权重占比: {weight_ratio:.4f}")
+                    
+                        # 根据权重比例和排名调整置信度
+                        rank_factor = 0.1 if i == 0 else 0.05 if i == 1 else 0.02  # 排名越高权重越大
+                        logger.info(f"位置 '{location}' 排名因子: {rank_factor}")
+                    
+                        concentration_factor = min(0.2, weight_ratio * 0.5)  # 权重集中度
+                        logger.info(f"位置 '{location}' 权重集中度因子: {concentration_factor:.4f}")
+                    
+                        # 由于社交网络深度分析增强，略微提高基础置信度
+                        base_confidence = 0.25
+                        logger.info(f"位置 '{location}' 基础置信度: {base_confidence}")
+                    
+                        confidence_scores[evidence_key] = base_confidence + rank_factor + concentration_factor
+                        logger.info(f"位置 '{location}' 初始置信度计算: {base_confidence} + {rank_factor} + {concentration_factor:.4f} = {confidence_scores[evidence_key]:.4f}")
+                    
+                        # 如果社交网络样本量太小（少于3个关注者），进一步降低置信度
+                        if total_weight < 3:
+                            original_confidence = confidence_scores[evidence_key]
+                            confidence_scores[evidence_key] *= 0.8
+                            logger.info(f"社交网络样本量较小(总权重={total_weight})，降低置信度: {original_confidence:.4f} * 0.8 = {confidence_scores[evidence_key]:.4f}")
+                    
+                        evidence_details[evidence_key] = {
+                            "source": f"社交网络位置{i+1}",
+                            "raw_value": location,
+                            "mapped_value": geo_country,
+                            "weight": weight,
+                            "weight_ratio": weight_ratio,
+                            "confidence": confidence_scores[evidence_key]
+                        }
+                    
+                        logger.info(f"从社交网络位置 '{location}' 识别出国家代码: {geo_country}, 最终置信度: {confidence_scores[evidence_key]:.4f}")
+                    else:
+                        logger.info(f"社交网络位置 '{location}' 无法映射到国家代码，忽略此位置")
+            else:
+                logger.info(f"用户 '{username}' 没有足够的社交网络数据")
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.warning(f"分析用户 '{username}' 的社交网络时发生错误: {str(e)}")
+    
     # 计算最终预测和置信度
     logger.info(f"用户 '{username}' 的证据收集完成: {evidence}")
     logger.info(f"用户 '{username}' 的各证据置信度: {confidence_scores}")
@@ -290,9 +366,13 @@ def predict_country_with_confidence(username):
         "country_scores": country_scores
     }
 
-def predict_developer_country(username):
+@scoped
+def predict_developer_country(username, snapshot=None):
     """
-    综合多种方法推测开发者所在国家，并提供详细分析结果
+    综合多种方法推测开发者所在国家，并提供详细分析结果。
+    社交网络、语言文化和综合预测共用同一个 RepoSnapshot，仓库列表只获取一次；
+    各项证据在请求作用域内只计算一次，综合预测直接复用前面步骤的结果。
+    GitHub 熔断时 CircuitOpenError 直接抛出，由阶段图把国家预测标记为降级，而不是返回看似正常的 Unknown。
     """
     logger = logging.getLogger(__name__)
     logger.info(f"开始分析用户 '{username}' 的国家/地区信息")
@@ -302,7 +382,7 @@ def predict_developer_country(username):
     try:
         # 1. 直接信息 - 从个人资料中获取
         try:
-            profile = get_user_profile(username)
+            profile = _shared_evidence(username, "profile", lambda: get_user_profile(username))
             results["profile_location"] = profile if profile else {}
             logger.info(f"获取到用户 '{username}' 的基本资料信息")
             # 如果 profile_location 里包含国家信息，则直接返回
@@ -316,36 +396,75 @@ def predict_developer_country(username):
                     "evidence_details": {"location": profile["国家"]}
                 }
                 return results
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.warning(f"获取用户 '{username}' 的基本资料失败: {str(e)}")
             results["profile_location"] = {}    
             
-        # 2. 社交网络分析
+        # 仓库快照：社交网络和语言文化分析共用，仓库列表只获取一次
+        if snapshot is None:
+            try:
+                snapshot = build_repo_snapshot(username)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"获取用户 '{username}' 的仓库快照失败: {str(e)}")
+
+        # 2. 活跃时区：基于贡献分析已采集的事件时间
         try:
-            logger.info(f"开始执行用户 '{username}' 的社交网络分析，深度为3...")
-            social_network = analyze_social_network(username, depth=3)
-            logger.info(f"获取到用户 '{username}' 的社交网络信息: {len(social_network) if social_network else 0} 条位置数据")
+            timezone_data = _shared_evidence(username, "timezone", lambda: analyze_timezone(username))
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            logger.warning(f"分析用户 '{username}' 的社交网络失败: {str(e)}")
-            social_network = None
+            logger.warning(f"分析用户 '{username}' 的活跃时区失败: {str(e)}")
+            timezone_data = None
             
-        results["social_network"] = social_network
+        results["timezone_analysis"] = timezone_data or {"commit_timezone": None, "activity_patterns": None}
         
         # 3. 语言和文化线索
         try:
-            language_culture = analyze_language_culture_hints(username)
+            language_culture = _shared_evidence(
+                username, "language_culture", lambda: analyze_language_culture_hints(username, snapshot=snapshot)
+            )
             logger.info(f"获取到用户 '{username}' 的语言文化线索")
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.warning(f"分析用户 '{username}' 的语言文化线索失败: {str(e)}")
             language_culture = None
             
         results["language_culture"] = language_culture
         
-        # 4. 综合预测结果
+        # 4. 社交网络分析：时区与语言线索一致时跳过
+        social_network = None
+        social_network_budget = None
+        if timezone_language_agreement(timezone_data, language_culture):
+            logger.info(f"用户 '{username}' 的时区与语言线索一致，跳过社交网络分析")
+        else:
+            try:
+                logger.info(f"开始执行用户 '{username}' 的社交网络分析，深度为3...")
+                social_crawl = _shared_evidence(
+                    username, "social_network", lambda: crawl_social_network(username, depth=SOCIAL_NETWORK_DEPTH, snapshot=snapshot)
+                )
+                social_network = social_crawl["locations"]
+                social_network_budget = social_crawl["budget"]
+                logger.info(f"获取到用户 '{username}' 的社交网络信息: {len(social_network) if social_network else 0} 条位置数据")
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"分析用户 '{username}' 的社交网络失败: {str(e)}")
+            
+        results["social_network"] = social_network
+        results["social_network_budget"] = social_network_budget  # 社交网络爬取的请求数 / 耗时预算使用情况
+        
+        # 5. 综合预测结果
         try:
             logger.info(f"开始进行用户 '{username}' 的国家综合预测...")
-            prediction = predict_country_with_confidence(username)
+            prediction = predict_country_with_confidence(username, snapshot=snapshot)
             logger.info(f"完成用户 '{username}' 的国家预测: {prediction.get('predicted_country', 'Unknown')}, 置信度: {prediction.get('confidence', 0):.4f}, 级别: {prediction.get('confidence_level', '未知')}")
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.warning(f"预测用户 '{username}' 的国家失败: {str(e)}")
             prediction = {
@@ -360,6 +479,8 @@ def predict_developer_country(username):
         
         return results
         
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"分析用户 '{username}' 的国家/地区信息时发生错误: {str(e)}", exc_info=True)
         # 返回部分结果而不是None，确保API不会因此崩溃
@@ -367,6 +488,7 @@ def predict_developer_country(username):
             "profile_location": {},
             "timezone_analysis": {"commit_timezone": None, "activity_patterns": None},
             "social_network": None,
+            "social_network_budget": None,
             "language_culture": None,
             "prediction": {
                 "predicted_country": "Unknown", 
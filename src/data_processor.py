@@ -5,6 +5,7 @@ import logging
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import FAISS
+from circuit_breaker import ollama_embedding_breaker
 from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL_NAME, DOWNLOAD_DIR
 
 logger = logging.getLogger(__name__)
@@ -102,9 +103,10 @@ def process_developer_data(username, data):
     embeddings = get_embeddings_model()
     
     # 创建向量存储
-    vector_store = FAISS.from_texts(
-        documents, 
-        embeddings, 
+    vector_store = ollama_embedding_breaker.call(
+        FAISS.from_texts,
+        documents,
+        embeddings,
         metadatas=metadatas
     )
     
@@ -5,14 +5,15 @@ from bs4 import BeautifulSoup
 import logging
 from urllib.parse import urlparse
 import json
-from config import GITHUB_TOKEN, headers
+from github_client import github_client
+from repo_snapshot import build_repo_snapshot
 
 logger = logging.getLogger(__name__)
 
 def get_developer_profile(username):
     """获取开发者的GitHub个人资料信息"""
     url = f"https://api.github.com/users/{username}"
-    response = requests.get(url, headers=headers)
+    response = github_client.get(url)
     
     if response.status_code != 200:
         logger.error(f"获取开发者资料失败: {response.status_code}")
@@ -39,7 +40,7 @@ def get_developer_profile(username):
 def get_developer_readme(username):
     """获取开发者的个人README信息（GitHub个人主页特殊仓库）"""
     url = f"https://api.github.com/repos/{username}/{username}/readme"
-    response = requests.get(url, headers=headers)
+    response = github_client.get(url)
     
     if response.status_code != 200:
         logger.info(f"开发者没有个人README: {response.status_code}")
@@ -103,44 +104,13 @@ def fetch_external_website(url, custom_headers=None):
         logger.error(f"抓取外部网站异常: {url}, 错误: {str(e)}")
         return ""
 
-def get_developer_languages(username):
-    """获取开发者常用的编程语言"""
-    url = f"https://api.github.com/users/{username}/repos"
-    response = requests.get(url, headers=headers, params={"per_page": 100})
-    
-    if response.status_code != 200:
-        logger.error(f"获取开发者仓库失败: {response.status_code}")
-        return {}
-    
-    repos = response.json()
-    languages = {}
-    
-    for repo in repos:
-        lang_url = repo["languages_url"]
-        lang_response = requests.get(lang_url, headers=headers)
-        
-        if lang_response.status_code == 200:
-            repo_languages = lang_response.json()
-            for lang, bytes_count in repo_languages.items():
-                if lang in languages:
-                    languages[lang] += bytes_count
-                else:
-                    languages[lang] = bytes_count
-    
-    # 转换为百分比
-    total_bytes = sum(languages.values())
-    language_percentages = {}
-    
-    if total_bytes > 0:
-        for lang, bytes_count in languages.items():
-            percentage = (bytes_count / total_bytes) * 100
-            language_percentages[lang] = round(percentage, 2)
-    
-    # 按百分比排序
-    sorted_languages = {k: v for k, v in sorted(language_percentages.items(), key=lambda item: item[1], reverse=True)}
-    return sorted_languages
+def get_developer_languages(username, snapshot=None):
+    """获取开发者常用的编程语言（owner 仓库的语言字节数占比），数据来自仓库快照"""
+    if snapshot is None:
+        snapshot = build_repo_snapshot(username)
+    return snapshot.language_percentages()
 
-def collect_developer_data(username):
+def collect_developer_data(username, snapshot=None):
     """收集开发者的所有相关数据"""
     profile_data = get_developer_profile(username)
     
@@ -150,7 +120,7 @@ def collect_developer_data(username):
     data = {
         "profile": profile_data,
         "readme": get_developer_readme(username),
-        "languages": get_developer_languages(username),
+        "languages": get_developer_languages(username, snapshot),
         "blog_content": ""
     }
     
@@ -158,6 +128,13 @@ def collect_developer_data(username):
     if profile_data.get("blog"):
         blog_url = profile_data["blog"]
         logger.info(f"开发者 {username} 提供了博客/网站: {blog_url}")
-        data["blog_content"] = fetch_external_website(blog_url)
+        negative_key = f"blog:{blog_url}"
+        negative_cache = github_client.negative_cache
+        if negative_cache and negative_cache.is_absent(negative_key):
+            logger.info(f"博客/网站近期抓取失败或为空，跳过: {blog_url}")
+        else:
+            data["blog_content"] = fetch_external_website(blog_url)
+            if not data["blog_content"] and negative_cache:
+                negative_cache.mark_absent(negative_key)
     
     return data 
\ No newline at end of file
@@ -11,7 +11,7 @@ from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from collections import Counter
 import math
-from typing import Dict, List, Any, Tuple
+from typing import Dict, Iterable, List, Any, Tuple
 
 try:
     from config import headers
@@ -672,19 +672,27 @@ class WeightNormalizer:
         self.initialized: bool = False
         self.idf_cache: Dict[str,float] = {}
 
-    def build_document_frequencies(self, repos: List[Dict[str,Any]]):
+    def build_document_frequencies(self, repos: Iterable[Dict[str,Any]]):
         logger.info("开始构建文档频率统计 …")
         self.document_frequencies.clear()
-        self.total_documents = len(repos)
+        self.total_documents = 0
         for repo in repos:
-            kws = set()
-            if repo.get('repo_name'):
-                kws |= set(extract_keywords(repo['repo_name']))
-            if repo.get('repo_description'):
-                kws |= set(extract_keywords(repo['repo_description']))
-            kws |= {t.lower() for t in repo.get('topics',[])}
-            for kw in kws:
-                self.document_frequencies[kw] += 1
+            self.add_document(repo)
+        self.finalize()
+
+    def add_document(self, repo: Dict[str,Any]):
+        """增量统计一个仓库的关键词文档频率，配合 finalize() 用于流式输入"""
+        self.total_documents += 1
+        kws = set()
+        if repo.get('repo_name'):
+            kws |= set(extract_keywords(repo['repo_name']))
+        if repo.get('repo_description'):
+            kws |= set(extract_keywords(repo['repo_description']))
+        kws |= {t.lower() for t in repo.get('topics',[])}
+        for kw in kws:
+            self.document_frequencies[kw] += 1
+
+    def finalize(self):
         total = max(1, self.total_documents)
         for kw, df in self.document_frequencies.items():
             self.idf_cache[kw] = math.log((total+1)/(df+1)) + 1
@@ -919,6 +927,7 @@ def analyze_repository_with_weights(repo,
     return total_l1, total_l2, total_l3
 
 def aggregate_language_characters(repos):
+    """累加各仓库的语言字节数；repos 可以是列表，也可以是只遍历一次的生成器"""
     from collections import Counter
     lang_counter = Counter()
     for repo in repos:
@@ -928,25 +937,60 @@ def aggregate_language_characters(repos):
     return dict(lang_counter)
 
 
+# 领域分析只用到这些字段；流式输入时每个仓库只保留它们，language_detail 等大字段随即丢弃
+DOMAIN_REPO_FIELDS = ('repo_name', 'repo_description', 'repo_topics', 'repo_languages')
+
+
+def analyze_domains_and_languages(username: str, repos: Iterable[Dict[str,Any]], **kwargs):
+    """单次遍历仓库流，同时得到领域分析结果和语言字节数统计（aggregate_language_characters 的结果）"""
+    lang_counter = Counter()
+
+    def counted():
+        for repo in repos:
+            lang_counter.update(repo.get("language_detail") or {})
+            yield repo
+
+    domains = get_developer_domains_weighted(username, counted(), **kwargs)
+    return domains, dict(lang_counter)
+
+
 # --- 主分析函数 ---
 def get_developer_domains_weighted(username: str,
-                                  owner_repos: List[Dict[str,Any]],
+                                  owner_repos: Iterable[Dict[str,Any]],
                                   apply_tfidf: bool = True,
                                   apply_softmax: bool = True,
                                   softmax_temp: float = 0.5
 ) -> List[Dict[str,Any]]:
+    """
+    owner_repos 可以是列表或生成器，只遍历一次。
+    不做 TF-IDF 时仓库到达即分析；做 TF-IDF 时需要先看完全部仓库才能得到 IDF，
+    遍历时增量统计文档频率，只保留 DOMAIN_REPO_FIELDS 中的字段，最后再逐个打分。
+    """
     normalizer = WeightNormalizer()
-    if apply_tfidf:
-        normalizer.build_document_frequencies(owner_repos)
     agg_l1 = Counter(); agg_l2 = Counter(); agg_l3 = Counter()
-    # 各仓库分析与本地归一化
-    for repo in owner_repos:
+
+    def norm(c):
+        if not c: return {}
+        m = max(c.values()); return {k: v/m for k,v in c.items()}
+
+    def accumulate(repo):
         l1,l2,l3 = analyze_repository_with_weights(repo, normalizer, apply_tfidf)
-        def norm(c):
-            if not c: return {}
-            m = max(c.values()); return {k: v/m for k,v in c.items()}
         nl1,nl2,nl3 = norm(l1), norm(l2), norm(l3)
         agg_l1.update(nl1); agg_l2.update(nl2); agg_l3.update(nl3)
+
+    # 各仓库分析与本地归一化
+    if apply_tfidf:
+        slim_repos = []
+        for repo in owner_repos:
+            slim = {k: repo[k] for k in DOMAIN_REPO_FIELDS if k in repo}
+            normalizer.add_document(slim)
+            slim_repos.append(slim)
+        normalizer.finalize()
+        for repo in slim_repos:
+            accumulate(repo)
+    else:
+        for repo in owner_repos:
+            accumulate(repo)
     # 最终 Softmax 归一化
     if apply_softmax:
         agg_l1 = WeightNormalizer.apply_softmax(agg_l1, softmax_temp)
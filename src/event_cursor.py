@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import GITHUB_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def empty_cursor():
+    """还没有采集过的用户的初始状态"""
+    return {"last_event_id": None, "etag": None, "raw_scores": {}, "event_times": []}
+
+
+class EventCursorStore:
+    """
+    每个用户的事件采集游标，持久化在 SQLite 中：
+    - last_event_id / etag：已折叠的最新事件 ID 和 /events 第 1 页的 ETag；
+    - raw_scores：各仓库累计的原始贡献分数（仓库名 -> 分数），按首次出现顺序；旧分数按事件时间衰减，见 contribution_analysis._decay_scores；
+    - event_times：最近若干个事件的 created_at（新→旧），供活跃时间分析使用。
+    再次分析同一开发者时只需折叠游标之后的新事件。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def _conn(self):
+        """第一次使用时才创建目录和数据库，导入模块不会在磁盘上留下文件"""
+        if self._connection is None:
+            with self._open_lock:
+                if self._connection is None:
+                    os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+                    conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                    with conn:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS event_cursor ("
+                            "username TEXT PRIMARY KEY, last_event_id INTEGER, etag TEXT, "
+                            "raw_scores TEXT, event_times TEXT, updated_at REAL)"
+                        )
+                    self._connection = conn
+        return self._connection
+
+    def load(self, username):
+        """读取用户的游标，不存在或损坏时返回 empty_cursor()"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_event_id, etag, raw_scores, event_times FROM event_cursor WHERE username = ?",
+                (username.lower(),)
+            ).fetchone()
+        if row is None:
+            return empty_cursor()
+        last_event_id, etag, raw_scores, event_times = row
+        try:
+            return {
+                "last_event_id": last_event_id,
+                "etag": etag,
+                "raw_scores": json.loads(raw_scores or "{}"),
+                "event_times": json.loads(event_times or "[]"),
+            }
+        except ValueError as e:
+            logger.warning(f"事件游标损坏，重新采集: {username}, 错误: {str(e)}")
+            return empty_cursor()
+
+    def save(self, username, cursor, expected_last_event_id):
+        """
+        保存游标。只有库中的 last_event_id 仍等于 expected_last_event_id 时才写入，
+        避免同一用户的两次并发分析把同一批事件重复累加；返回是否写入成功。
+        """
+        values = (
+            cursor["last_event_id"],
+            cursor["etag"],
+            json.dumps(cursor["raw_scores"], ensure_ascii=False),
+            json.dumps(cursor["event_times"]),
+            time.time(),
+            username.lower(),
+        )
+        try:
+            with self._lock, self._conn:
+                # IS 同时适用于 NULL 和普通值的比较
+                updated = self._conn.execute(
+                    "UPDATE event_cursor SET last_event_id = ?, etag = ?, raw_scores = ?, "
+                    "event_times = ?, updated_at = ? WHERE username = ? AND last_event_id IS ?",
+                    values + (expected_last_event_id,)
+                ).rowcount
+                if not updated and expected_last_event_id is None:
+                    updated = self._conn.execute(
+                        "INSERT OR IGNORE INTO event_cursor "
+                        "(last_event_id, etag, raw_scores, event_times, updated_at, username) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", values
+                    ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"写入事件游标失败: {username}, 错误: {str(e)}")
+            return False
+        if not updated:
+            logger.info(f"用户 '{username}' 的事件游标已被并发更新，跳过本次写入")
+        return bool(updated)
+
+
+event_cursor_store = EventCursorStore(os.path.join(GITHUB_CACHE_DIR, "events.sqlite3"))
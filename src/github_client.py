@@ -0,0 +1,361 @@
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.utils import parse_header_links
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    GITHUB_API_URL,
+    GITHUB_BACKOFF_FACTOR,
+    GITHUB_CACHE_DIR,
+    GITHUB_FETCH_WORKERS,
+    GITHUB_MAX_RATE_LIMIT_WAIT,
+    GITHUB_MAX_RETRIES,
+    GITHUB_PAGINATION_WORKERS,
+    GITHUB_PACE_THRESHOLD,
+    GITHUB_POOL_SIZE,
+    GITHUB_TIMEOUT,
+    GITHUB_TOKENS,
+    GITHUB_USE_GRAPHQL,
+    HTTP_CACHE_ENABLED,
+    NEGATIVE_CACHE_TTL,
+)
+from circuit_breaker import github_breaker
+from http_cache import ETagCache, build_cached_response
+from negative_cache import NegativeCache
+from rate_limit import RateLimitScheduler
+from single_flight import SingleFlight, current_scope, is_shareable, memoize_json
+
+logger = logging.getLogger(__name__)
+
+
+class GraphQLError(requests.exceptions.RequestException):
+    """GraphQL 请求失败或返回了 errors 字段"""
+
+
+class RequestCounter:
+    """统计一段代码实际发出的 GitHub 请求数（不含请求作用域、负缓存等未联网的命中）"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+
+_request_counter = contextvars.ContextVar("github_request_counter", default=None)
+
+
+@contextmanager
+def counting_requests():
+    """在 with 块内统计实际发出的请求数；工作线程复制上下文后计入同一个计数器"""
+    counter = RequestCounter()
+    token = _request_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _request_counter.reset(token)
+
+
+def last_page_number(link_header):
+    """从 Link 响应头中解析 rel="last" 的页码；没有下一页时返回 1"""
+    if not link_header:
+        return 1
+    for link in parse_header_links(link_header):
+        if link.get("rel") == "last":
+            page = parse_qs(urlparse(link["url"]).query).get("page")
+            if page:
+                return int(page[0])
+    return 1
+
+
+def parse_graphql_payload(payload, allow_partial=False):
+    """取出 GraphQL 响应的 data 字段，同步和异步客户端共用"""
+    errors = payload.get("errors")
+    if errors:
+        messages = "; ".join(e.get("message", "") for e in errors)
+        if not (allow_partial and payload.get("data")):
+            raise GraphQLError(f"GraphQL 返回错误: {messages}")
+        logger.info(f"GraphQL 返回部分错误，忽略出错的字段: {messages}")
+    return payload.get("data") or {}
+
+
+def max_pages_for(max_items, per_page):
+    """按条目上限换算需要请求的页数，None 表示不限"""
+    return math.ceil(max_items / per_page) if max_items else None
+
+
+class GitHubClient:
+    """
+    所有模块共享的 GitHub API 客户端。
+    内部复用同一个 requests.Session，保持 keep-alive 连接池，
+    统一处理认证头、重试退避策略和单次请求超时。
+    GET 请求默认走 ETag 条件请求缓存，命中 304 时返回缓存内容（response.from_cache 为 True）。
+    每次请求前经过 RateLimitScheduler 按 core / search / graphql 配额节流，
+    并在多个令牌之间选择剩余额度最多的一个。
+    相同 URL 的并发 GET 合并为一次网络往返，request_scope() 内的重复 GET 复用同一个响应。
+    404 会写入负缓存，TTL 内再次请求（且没有 ETag 缓存条目时）直接返回缓存结果，不发出网络请求。
+    连续的网络错误、5xx 或限流会触发熔断，熔断期间请求立即失败（缓存命中仍可返回）。
+    """
+
+    def __init__(self, tokens=GITHUB_TOKENS, base_url=GITHUB_API_URL, timeout=GITHUB_TIMEOUT,
+                 pool_size=GITHUB_POOL_SIZE, max_retries=GITHUB_MAX_RETRIES,
+                 backoff_factor=GITHUB_BACKOFF_FACTOR, cache=None, scheduler=None, negative_cache=None,
+                 breaker=github_breaker):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = cache
+        self.negative_cache = negative_cache
+        self.breaker = breaker
+        self.scheduler = scheduler or RateLimitScheduler(tokens=tokens)
+        self._single_flight = SingleFlight()
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/vnd.github+json"})
+
+        # 只对连接错误和 5xx 做自动重试；403/429 属于速率限制，交给调用方处理
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _full_url(self, url):
+        """支持传入完整 URL 或以 / 开头的 API 路径"""
+        if url.startswith("http://") or url.startswith("https://"):
+            return url
+        return f"{self.base_url}/{url.lstrip('/')}"
+
+    def build_url(self, url, params=None):
+        """把 params 合并进完整 URL，同时作为缓存键（同步和异步客户端共用）"""
+        return requests.Request("GET", self._full_url(url), params=params).prepare().url
+
+    def get(self, url, params=None, timeout=None, use_cache=True, **kwargs):
+        """
+        发送 GET 请求，返回 requests.Response。
+        同一 URL 的并发请求只发出一次（single-flight）；在 request_scope() 内重复请求同一 URL 直接复用已解析的响应。
+        传入自定义 headers 等参数的请求不参与共享。
+        """
+        full_url = self.build_url(url, params)
+        if kwargs:
+            return self._get(full_url, timeout, use_cache, **kwargs)
+
+        scope = current_scope()
+        if scope is not None:
+            shared = scope.get(full_url)
+            if shared is not None:
+                logger.debug(f"GitHub 请求作用域命中: {full_url}")
+                return shared
+
+        response = self._single_flight.do(
+            full_url, lambda: memoize_json(self._get(full_url, timeout, use_cache))
+        )
+        if scope is not None and is_shareable(response):
+            scope.put(full_url, response)
+        return response
+
+    def _get(self, full_url, timeout=None, use_cache=True, **kwargs):
+        """实际发送 GET 请求，处理负缓存和 ETag 条件请求缓存"""
+        cache = self.cache if use_cache else None
+        conditional_headers = cache.conditional_headers(full_url) if cache else {}
+
+        # 有 ETag 缓存条目时优先做条件请求（304 不消耗配额），负缓存只兜底没有条目的 404
+        negative = self.negative_cache if use_cache else None
+        if negative and not conditional_headers:
+            entry = negative.get(full_url)
+            if entry is not None:
+                logger.debug(f"GitHub 负缓存命中 ({entry['status']}): {full_url}")
+                return build_cached_response(full_url, entry["status"], entry["body"])
+
+        request_headers = dict(kwargs.pop("headers", None) or {})
+        request_headers.update(conditional_headers)
+
+        logger.debug(f"GitHub GET {full_url}")
+        response = self._send("GET", full_url, headers=request_headers,
+                              timeout=timeout or self.timeout, **kwargs)
+        response.from_cache = False
+
+        if negative and NegativeCache.is_negative(response):
+            negative.mark(full_url, response.status_code, response.text)
+
+        if cache:
+            if response.status_code == 304:
+                cached = cache.build_response(full_url, response)
+                if cached is not None:
+                    logger.debug(f"GitHub 缓存命中 (304): {full_url}")
+                    return cached
+                # 缓存条目在请求期间被删除，去掉条件头重新请求
+                return self._get(full_url, timeout, use_cache=False, **kwargs)
+            cache.store(full_url, response)
+        return response
+
+    def paginate_pages(self, url, params=None, per_page=100, max_pages=None,
+                       max_workers=GITHUB_PAGINATION_WORKERS):
+        """
+        按页流式返回列表接口的数据，每次 yield 一页（list）。
+        先请求第 1 页，从 Link 头读取 rel="last" 得到总页数，再用线程池并发请求剩余页，按页码顺序产出；
+        不再需要额外请求一个空页来判断结束。某一页失败时停止。
+        """
+        params = dict(params or {}, per_page=per_page)
+
+        first = self.get(url, params=dict(params, page=1))
+        if first.status_code != 200:
+            logger.warning(f"分页请求失败，状态码: {first.status_code}, URL: {url}")
+            return
+        data = first.json()
+        if not data:
+            return
+        yield data
+
+        last_page = last_page_number(first.headers.get("Link"))
+        if max_pages:
+            last_page = min(last_page, max_pages)
+        if last_page <= 1:
+            return
+
+        def fetch(page):
+            return self.get(url, params=dict(params, page=page))
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, last_page - 1)) as executor:
+            # 每个任务使用独立的上下文副本，保证工作线程继承当前请求作用域
+            futures = [
+                executor.submit(contextvars.copy_context().run, fetch, page)
+                for page in range(2, last_page + 1)
+            ]
+            try:
+                for page, future in enumerate(futures, start=2):
+                    response = future.result()
+                    if response.status_code != 200:
+                        logger.warning(f"请求第 {page} 页失败，状态码: {response.status_code}, URL: {url}")
+                        break
+                    data = response.json()
+                    if not data:
+                        break
+                    yield data
+            finally:
+                # 调用方提前结束迭代时，取消尚未开始的页
+                for future in futures:
+                    future.cancel()
+
+    def paginate(self, url, params=None, per_page=100, max_items=None,
+                 max_workers=GITHUB_PAGINATION_WORKERS):
+        """按顺序逐条返回列表接口的数据，最多 max_items 条（None 表示全部）"""
+        count = 0
+        for page in self.paginate_pages(url, params, per_page,
+                                        max_pages_for(max_items, per_page), max_workers):
+            for item in page:
+                yield item
+                count += 1
+                if max_items and count >= max_items:
+                    return
+
+    def get_many(self, urls, max_workers=GITHUB_FETCH_WORKERS):
+        """
+        用有界线程池并发请求一组 URL，按输入顺序返回响应列表。
+        每个请求仍经过速率限制调度，配额不足时工作线程自行等待，不会突破配额。
+        """
+        urls = list(urls)
+        if len(urls) <= 1:
+            return [self.get(url) for url in urls]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+            # 每个任务使用独立的上下文副本，保证工作线程继承当前请求作用域
+            futures = [executor.submit(contextvars.copy_context().run, self.get, url) for url in urls]
+            return [future.result() for future in futures]
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        """发送 POST 请求（GraphQL 等），返回 requests.Response"""
+        full_url = self._full_url(url)
+        logger.debug(f"GitHub POST {full_url}")
+        return self._send("POST", full_url, json=json, timeout=timeout or self.timeout, **kwargs)
+
+    @property
+    def can_use_graphql(self):
+        """GitHub GraphQL API 必须认证，没有令牌时只能走 REST"""
+        return GITHUB_USE_GRAPHQL and any(self.scheduler.tokens)
+
+    def graphql(self, query, variables=None, timeout=None, allow_partial=False):
+        """
+        执行 GraphQL 查询，返回 data 字段；请求失败或包含 errors 时抛出 GraphQLError。
+        allow_partial=True 时，只要返回了 data 就容忍部分字段的错误（如批量查询中个别仓库不存在），出错的字段为 None。
+        """
+        response = self.post("/graphql", json={"query": query, "variables": variables or {}},
+                             timeout=timeout)
+        if response.status_code != 200:
+            raise GraphQLError(f"GraphQL 请求失败，状态码: {response.status_code}")
+        return parse_graphql_payload(response.json(), allow_partial)
+
+    @staticmethod
+    def is_dependency_failure(response):
+        """5xx 和限流响应说明 GitHub 侧出了问题，计入熔断器失败次数"""
+        if response.status_code >= 500 or response.status_code == 429:
+            return True
+        return response.status_code == 403 and (
+            response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers
+        )
+
+    def _send(self, method, full_url, **kwargs):
+        """经过熔断器发送请求：熔断期间直接抛出 CircuitOpenError，不占用网络和线程"""
+        self.breaker.before_call()
+        counter = _request_counter.get()
+        if counter is not None:
+            counter.add()
+        try:
+            response = self._send_with_rate_limit(method, full_url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        if self.is_dependency_failure(response):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _send_with_rate_limit(self, method, full_url, headers=None, **kwargs):
+        """
+        经过速率限制调度发送请求。
+        被限流的令牌会被隔离到重置时刻，然后换用其他令牌重试；所有令牌都耗尽时由调度器精确等待。
+        """
+        resource = RateLimitScheduler.resource_for_url(full_url)
+        max_attempts = len(self.scheduler.tokens) + 1
+        for attempt in range(max_attempts):
+            token = self.scheduler.acquire(resource)
+            request_headers = dict(headers or {})
+            if token:
+                request_headers["Authorization"] = f"token {token}"
+            response = self.session.request(method, full_url, headers=request_headers, **kwargs)
+            self.scheduler.update(token, resource, response.headers)
+
+            wait = self.scheduler.wait_time_after_limited(token, resource, response)
+            if wait is None or attempt == max_attempts - 1:
+                return response
+            logger.warning(f"GitHub {resource} 请求被限流，切换令牌重试: {full_url}")
+            self.scheduler.quarantine(token, resource, time.time() + wait)
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+# 进程内共享的客户端实例，各模块直接导入使用
+github_client = GitHubClient(
+    cache=ETagCache(os.path.join(GITHUB_CACHE_DIR, "http")) if HTTP_CACHE_ENABLED else None,
+    negative_cache=NegativeCache(os.path.join(GITHUB_CACHE_DIR, "negative.sqlite3"), NEGATIVE_CACHE_TTL),
+    scheduler=RateLimitScheduler(tokens=GITHUB_TOKENS,
+                                 pace_threshold=GITHUB_PACE_THRESHOLD,
+                                 max_wait=GITHUB_MAX_RATE_LIMIT_WAIT),
+)
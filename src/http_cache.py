@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+
+class ETagCache:
+    """
+    基于磁盘的 HTTP 条件请求缓存。
+    每个 URL 对应一个 JSON 文件，保存响应体以及 ETag / Last-Modified，
+    下次请求时带上 If-None-Match / If-Modified-Since；GitHub 返回 304 时直接复用缓存内容，
+    且 304 响应不计入速率限制。
+    """
+
+    # 需要随缓存一起保存的响应头，其余响应头没有复用价值
+    KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+    def __init__(self, cache_dir):
+        # 目录在第一次写入条目时才创建，导入模块不会在磁盘上留下文件
+        self.cache_dir = cache_dir
+
+    def _path(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def get(self, url):
+        """读取缓存条目，不存在或损坏时返回 None"""
+        path = self._path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 HTTP 缓存失败，忽略该条目: {url}, 错误: {str(e)}")
+            return None
+        # 防止哈希碰撞
+        if entry.get("url") != url:
+            return None
+        return entry
+
+    def conditional_headers(self, url):
+        """根据缓存条目生成条件请求头"""
+        entry = self.get(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, response):
+        """保存带 ETag 或 Last-Modified 的 200 响应"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "headers": {k: response.headers[k] for k in self.KEPT_HEADERS if k in response.headers},
+            "body": response.content.decode("utf-8", errors="replace"),
+            "stored_at": time.time(),
+        }
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，避免并发读到半个文件
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入 HTTP 缓存失败: {url}, 错误: {str(e)}")
+
+    def build_response(self, url, not_modified_response=None):
+        """用缓存内容构造一个 200 响应；304 响应中的新响应头（如速率限制信息）会覆盖旧值"""
+        entry = self.get(url)
+        if not entry:
+            return None
+        response = build_cached_response(url, 200, entry["body"], entry.get("headers", {}))
+        if not_modified_response is not None:
+            response.headers.update(not_modified_response.headers)
+            # 异步客户端的响应对象没有 elapsed / request 属性
+            response.elapsed = getattr(not_modified_response, "elapsed", response.elapsed)
+            response.request = getattr(not_modified_response, "request", None)
+        return response
+
+
+def build_cached_response(url, status_code, body, headers=None):
+    """用缓存的状态码和响应体构造 requests.Response，并标记 from_cache"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.encoding = "utf-8"
+    response._content = (body or "").encode("utf-8")
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.from_cache = True
+    return response
@@ -2,12 +2,17 @@ import base64
 from collections import Counter
 import logging
 import requests
-from config import headers
+from circuit_breaker import CircuitOpenError
+from github_client import github_client
+from repo_snapshot import RepoSnapshot, build_repo_snapshot
 import re
 
+# 逐个仓库读取 README 和 issue 的请求较多，只分析前 30 个 owner 仓库（即原先 /repos 默认一页的数量）
+MAX_ANALYZED_REPOS = 30
 
-def analyze_language_culture_hints(username):
-    """分析用户仓库中的语言和文化线索"""
+
+def analyze_language_culture_hints(username, snapshot=None):
+    """分析用户仓库中的语言和文化线索；仓库列表来自 RepoSnapshot，未传入时按需构建"""
     logger = logging.getLogger(__name__)
     logger.info(f"开始分析用户 '{username}' 的语言和文化线索")
     
@@ -45,7 +50,7 @@ def analyze_language_culture_hints(username):
         # 1. 分析用户个人资料中的语言线索
         try:
             profile_url = f"https://api.github.com/users/{username}"
-            profile_response = requests.get(profile_url, headers=headers, timeout=10)
+            profile_response = github_client.get(profile_url)
             
             if profile_response.status_code == 200:
                 profile = profile_response.json()
@@ -65,40 +70,37 @@ def analyze_language_culture_hints(username):
                             if keyword.lower() in bio.lower():
                                 bio_languages[lang] += 1
                                 logger.info(f"在用户 '{username}' 的个人简介中检测到 {lang} 关键词: {keyword}")
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.warning(f"分析用户 '{username}' 的个人资料时发生错误: {str(e)}")
         
         # 2. 分析用户仓库
-        repos_url = f"https://api.github.com/users/{username}/repos"
-        repos_response = requests.get(repos_url, headers=headers, timeout=10)
-        
-        if repos_response.status_code != 200:
-            logger.warning(f"请求用户 '{username}' 的仓库列表失败，状态码: {repos_response.status_code}")
-            return None
-            
-        repos = repos_response.json()
+        if snapshot is None:
+            snapshot = build_repo_snapshot(username)
+        repos = snapshot.owner_repos[:MAX_ANALYZED_REPOS]
         logger.info(f"获取到用户 '{username}' 的仓库: {len(repos)} 个")
         
         for repo in repos:
             try:
                 # 统计编程语言
-                language = repo.get("language")
+                language = RepoSnapshot.primary_language(repo)
                 if language:
                     language_counter[language] += 1
-                    logger.info(f"仓库 '{repo['name']}' 的主要编程语言: {language}")
+                    logger.info(f"仓库 '{repo['repo_name']}' 的主要编程语言: {language}")
                 
                 # 分析仓库描述
-                description = repo.get("description", "")
+                description = repo.get("repo_description", "")
                 if description:
                     for lang, pattern in language_patterns.items():
                         if re.search(pattern, description):
                             readme_languages[lang] += 2  # 描述中的语言线索权重较高
-                            logger.info(f"在仓库 '{repo['name']}' 的描述中检测到 {lang} 语言")
+                            logger.info(f"在仓库 '{repo['repo_name']}' 的描述中检测到 {lang} 语言")
                     
                 # 分析README文件
-                repo_name = repo["name"]
+                repo_name = repo["repo_name"]
                 readme_url = f"https://api.github.com/repos/{username}/{repo_name}/readme"
-                readme_response = requests.get(readme_url, headers=headers, timeout=10)
+                readme_response = github_client.get(readme_url)
                 
                 if readme_response.status_code == 200:
                     try:
@@ -118,6 +120,8 @@ def analyze_language_culture_hints(username):
                                     logger.debug(f"在仓库 '{repo_name}' 的README中检测到 {lang} 关键词")
                     except UnicodeDecodeError as e:
                         logger.warning(f"解码仓库 '{repo_name}' 的README内容时发生错误: {str(e)}")
+                    except CircuitOpenError:
+                        raise
                     except Exception as e:
                         logger.warning(f"处理仓库 '{repo_name}' 的README内容时发生错误: {str(e)}")
                 
@@ -125,7 +129,7 @@ def analyze_language_culture_hints(username):
                 try:
                     # 只分析最近的几个issue，避免过多API请求
                     issues_url = f"https://api.github.com/repos/{username}/{repo_name}/issues?creator={username}&state=all&per_page=5"
-                    issues_response = requests.get(issues_url, headers=headers, timeout=10)
+                    issues_response = github_client.get(issues_url)
                     
                     if issues_response.status_code == 200:
                         issues = issues_response.json()
@@ -137,11 +141,15 @@ def analyze_language_culture_hints(username):
                                     if re.search(pattern, issue_body):
                                         issue_languages[lang] += 1
                                         logger.info(f"在用户 '{username}' 的issue中检测到 {lang} 语言")
+                except CircuitOpenError:
+                    raise
                 except Exception as e:
                     logger.debug(f"分析仓库 '{repo_name}' 的issue时发生错误: {str(e)}")
                     
+            except CircuitOpenError:
+                raise
             except Exception as e:
-                logger.warning(f"处理仓库 '{repo.get('name', 'unknown')}' 时发生错误: {str(e)}")
+                logger.warning(f"处理仓库 '{repo.get('repo_name', 'unknown')}' 时发生错误: {str(e)}")
                 continue
         
         # 合并所有语言线索，加权计算
@@ -166,6 +174,8 @@ def analyze_language_culture_hints(username):
         logger.info(f"完成用户 '{username}' 的语言文化分析，找到 {len(language_counter)} 种编程语言，{len(combined_languages)} 种自然语言")
         return result
         
+    except CircuitOpenError:
+        raise
     except requests.exceptions.RequestException as e:
         logger.error(f"分析用户 '{username}' 的语言文化线索时发生网络错误: {str(e)}")
         return None
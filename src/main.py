@@ -1,5 +1,6 @@
 import os
 import json
+import asyncio
 import logging
 from datetime import datetime
 
@@ -10,20 +11,26 @@ from flask_caching import Cache
 from langsmith import Client, traceable
 from langsmith.utils import LangSmithConflictError
 
+from analysis_dag import StageGraph
+from async_github_client import AsyncGitHubClient
+from circuit_breaker import CircuitOpenError, github_breaker, ollama_embedding_breaker, ollama_llm_breaker
 from contribution_analysis import (
     calculate_talent_rank,
     evaluate_overall_contribution,
-    get_user_contributed_repos
+    get_user_contributed_repos_async
 )
+from config import DOMAIN_ANALYSIS_MAX_REPOS, DOMAIN_ANALYSIS_ORDER_BY
 from country_prediction import predict_developer_country
 from domain_analysis import (
-    get_developer_domains_weighted,
-    convert_numpy,
-    aggregate_language_characters
+    analyze_domains_and_languages,
+    convert_numpy
 )
 from geo_utils import get_country_name
+from rate_limit import RateLimitExceeded
+from repo_snapshot import build_repo_snapshot, build_repo_snapshot_async
 from search_utils import search_repositories_by_language_and_topic
-from user_profile import get_user_repos, get_user_total_stars, get_user_profile
+from single_flight import scoped
+from user_profile import get_user_profile_async
 from developer_profile_crawler import collect_developer_data
 from data_processor import process_developer_data
 from retrieval import (
@@ -80,64 +87,129 @@ cache = Cache(app)
 
 @cache.memoize(timeout=3600)
 def predict_country_cached(username):
-    """对 predict_developer_country(username) 缓存 1 小时"""
+    """对 predict_developer_country(username) 缓存 1 小时；GitHub 熔断时抛出 CircuitOpenError，不会缓存降级结果"""
     return predict_developer_country(username)
 
 
 @cache.memoize(timeout=1800)
-def analyze_domains_cached(username, owner_repos_json):
+def analyze_domains_cached(username):
     """
     对领域分析做缓存，缓存 30 分钟。
-    参数 owner_repos_json: JSON 字符串形式的 owner_repos 列表。
+    从仓库快照中取最相关的 DOMAIN_ANALYSIS_MAX_REPOS 个 owner 仓库（按 DOMAIN_ANALYSIS_ORDER_BY 排序），
+    单次遍历同时得到领域分析结果和语言字节数统计；请求作用域内快照已经构建时不再请求仓库列表。
     """
-    owner_repos = json.loads(owner_repos_json)
-    domains = get_developer_domains_weighted(
+    repos = build_repo_snapshot(username).top_repos(DOMAIN_ANALYSIS_ORDER_BY, DOMAIN_ANALYSIS_MAX_REPOS)
+    domains, stats = analyze_domains_and_languages(
         username,
-        owner_repos,
+        repos,
         apply_tfidf=True,
         apply_softmax=True,
         softmax_temp=0.5
     )
-    stats = aggregate_language_characters(owner_repos)
     return convert_numpy(domains), stats
 
 
-# ——— API：获取单个开发者信息 ———
+# ——— 开发者分析阶段图 ———
 
-@app.route('/api/developer/<username>', methods=['GET'])
-def get_developer_info(username):
-    try:
-        logger.info(f"开始获取开发者信息: '{username}'")
+# 依赖熔断或配额耗尽时，阶段直接跳过并在结果中标记降级，而不是让请求报错
+DEGRADED_ERRORS = (CircuitOpenError, RateLimitExceeded)
 
-        # 1. 国家预测（从缓存取或计算）
-        country_prediction = predict_country_cached(username)
+UNKNOWN_COUNTRY = {
+    "profile_location": {},
+    "prediction": {"predicted_country": "Unknown", "confidence": 0},
+}
 
-        # 2. 获取仓库列表
-        user_repo = get_user_repos(username)
-        owner_repos = [r for r in user_repo if r["repo_type"] == "owner"]
-        member_repos = [r for r in user_repo if r["repo_type"] == "member"]
-        logger.info(f"获取到用户 '{username}' 的仓库: {len(user_repo)} 个")
+# 各阶段声明自己的输入；初始输入为 username 和 client（AsyncGitHubClient）。
+# GitHub 请求走异步客户端，国家预测和领域分析仍是同步实现，由执行器放到线程里执行。
+developer_graph = StageGraph()
 
-        # 3. 领域分析（从缓存取或计算）
-        owner_json = json.dumps(owner_repos, sort_keys=True, default=str)
-        domains, language_character_stats = analyze_domains_cached(username, owner_json)
-        logger.info(f"获取到用户 '{username}' 的领域分析结果")
 
-        # 4. 贡献信息
-        contribution_data = get_user_contributed_repos(username)
-        contribution_score = evaluate_overall_contribution(contribution_data)
+@developer_graph.stage("profile", inputs=("username", "client"), default={})
+async def _profile_stage(username, client):
+    return await get_user_profile_async(username, client) or {}
 
-        # 5. Star 总数
-        total_stars = get_user_total_stars(username)
 
-        # 6. TalentRank 评分
-        followers_count = (
-            country_prediction.get("profile_location", {})
-            .get("关注者数", 0)
-        )
-        talent_rank_score = calculate_talent_rank(
-            total_stars, followers_count, contribution_score
-        )
+@developer_graph.stage("snapshot", inputs=("username", "client"))
+async def _snapshot_stage(username, client):
+    # 仓库快照只获取一次：仓库列表、Star 总数以及国家预测里的社交网络 / 语言文化分析共用
+    snapshot = await build_repo_snapshot_async(username, client)
+    logger.info(f"获取到用户 '{username}' 的仓库: {len(snapshot)} 个")
+    return snapshot
+
+
+@developer_graph.stage("owner_repos", inputs=("snapshot",), default=[], inline=True)
+def _owner_repos_stage(snapshot):
+    return snapshot.owner_repos if snapshot else []
+
+
+@developer_graph.stage("member_repos", inputs=("snapshot",), default=[], inline=True)
+def _member_repos_stage(snapshot):
+    return snapshot.member_repos if snapshot else []
+
+
+@developer_graph.stage("total_stars", inputs=("snapshot",), default=0, inline=True)
+def _total_stars_stage(snapshot):
+    return snapshot.total_stars if snapshot else 0
+
+
+@developer_graph.stage("domains", inputs=("username", "snapshot"), default=({}, {}))
+def _domains_stage(username, snapshot):
+    # 与国家预测相同，依赖 snapshot 是为了等快照放入请求作用域，领域分析直接复用，不重复请求仓库列表；
+    # 返回 (领域, 语言字节数统计)
+    return analyze_domains_cached(username)
+
+
+@developer_graph.stage("contributions", inputs=("username", "client"), default=[])
+async def _contributions_stage(username, client):
+    return await get_user_contributed_repos_async(username, client)
+
+
+@developer_graph.stage("contribution_score", inputs=("contributions",), default=0, inline=True)
+def _contribution_score_stage(contributions):
+    return evaluate_overall_contribution(contributions)
+
+
+@developer_graph.stage("talent_rank_score", inputs=("total_stars", "profile", "contribution_score"),
+                       default=0, inline=True)
+def _talent_rank_stage(total_stars, profile, contribution_score):
+    return calculate_talent_rank(total_stars, profile.get("关注者数", 0), contribution_score)
+
+
+@developer_graph.stage("country_prediction", inputs=("username", "snapshot"), default=UNKNOWN_COUNTRY)
+def _country_stage(username, snapshot):
+    # 依赖 snapshot 只是为了等快照放入请求作用域，线程里的 build_repo_snapshot 直接复用，不重复请求仓库列表
+    return predict_country_cached(username)
+
+
+# /api/developer 和 /api/search/domain 各自需要的输出
+DEVELOPER_OUTPUTS = ("profile", "country_prediction", "owner_repos", "member_repos",
+                     "total_stars", "domains", "talent_rank_score")
+SEARCH_OUTPUTS = ("profile", "owner_repos", "member_repos", "total_stars", "domains", "talent_rank_score")
+
+
+async def run_developer_graph(username, client, outputs, degrade_on=DEGRADED_ERRORS):
+    """对一个开发者执行阶段图，只计算 outputs 及其依赖"""
+    return await developer_graph.run(outputs, degrade_on=degrade_on, username=username, client=client)
+
+
+async def collect_developer_info_async(username):
+    """在同一个事件循环里按阶段图并发执行 /api/developer 的各个采集阶段"""
+    async with AsyncGitHubClient() as client:
+        return await run_developer_graph(username, client, DEVELOPER_OUTPUTS)
+
+
+# ——— API：获取单个开发者信息 ———
+
+@app.route('/api/developer/<username>', methods=['GET'])
+@scoped
+def get_developer_info(username):
+    try:
+        logger.info(f"开始获取开发者信息: '{username}'")
+
+        # 1-6. 资料、国家预测、仓库快照、领域分析、贡献信息、TalentRank 按阶段图并发采集
+        run = asyncio.run(collect_developer_info_async(username))
+        country_prediction = run["country_prediction"]
+        domains, language_character_stats = run["domains"]
 
         # 7. 格式化国家预测输出
         prediction = country_prediction.get("prediction", {})
@@ -154,16 +226,18 @@ def get_developer_info(username):
         # 8. 返回 JSON
         return jsonify({
             "username": username,
-            "profile": country_prediction.get("profile_location", {}),
+            "profile": run["profile"] or country_prediction.get("profile_location", {}),
             "country_prediction": prediction,
             "timezone_analysis": country_prediction.get("timezone_analysis", {}),
             "language_culture": country_prediction.get("language_culture", {}),
-            "repositories": owner_repos,
-            "contributions": member_repos,
-            "total_stars": total_stars,
-            "talent_rank_score": talent_rank_score,
+            "repositories": run["owner_repos"],
+            "contributions": run["member_repos"],
+            "total_stars": run["total_stars"],
+            "talent_rank_score": run["talent_rank_score"],
             "domains": domains,
-            "language_character_stats": language_character_stats
+            "language_character_stats": language_character_stats,
+            "degraded_stages": run.degraded,
+            "stage_timings": run.timings
         })
 
     except Exception as e:
@@ -182,6 +256,18 @@ def analyze_developer_skills(username):
     """分析开发者的技术能力"""
     try:
         logger.info(f"开始分析开发者技术能力: '{username}'")
+
+        # Ollama 熔断期间直接返回降级结果，不再排队等待超时
+        unavailable = [b.name for b in (ollama_llm_breaker, ollama_embedding_breaker) if b.is_open]
+        if unavailable:
+            logger.warning(f"依赖不可用，跳过技术能力分析: {unavailable}")
+            return jsonify({
+                "error": "依赖服务暂不可用",
+                "username": username,
+                "skill_summary": "LLM 服务暂时不可用，请稍后再试",
+                "degraded": True,
+                "unavailable_dependencies": unavailable
+            }), 503
         
         # 检查是否已有向量存储
         from config import DOWNLOAD_DIR
@@ -292,7 +378,65 @@ def analyze_developer_skills(username):
             "skill_summary": f"分析过程中发生错误: {str(e)}"
         }), 500
 
+def _placeholder_developer(username, error, degraded=False):
+    """分析失败或被跳过的开发者的占位条目"""
+    entry = {
+        "username": username,
+        "error": error,
+        "profile": {},
+        "repositories": [],
+        "contributions": [],
+        "total_stars": 0,
+        "talent_rank_score": 0,
+        "domains": {},
+        "language_character_stats": {}
+    }
+    if degraded:
+        entry["degraded"] = True
+    return entry
+
+
+async def _search_developer_async(username, client):
+    """领域搜索中单个开发者的分析：不做国家预测，任何阶段失败都只让该阶段取默认值"""
+    # GitHub 熔断期间剩余开发者直接标记为降级，不再逐个超时
+    if github_breaker.is_open:
+        return _placeholder_developer(username, "GitHub API 暂不可用，已跳过", degraded=True)
+
+    run = await run_developer_graph(username, client, SEARCH_OUTPUTS, degrade_on=Exception)
+    domains, language_character_stats = run["domains"]
+    logger.info(f"{username} 的 TalentRank 评分: {run['talent_rank_score']}")
+    logger.info(f"用户 '{username}' 的技术领域详细信息:\n{json.dumps(domains, indent=2, ensure_ascii=False)}")
+    return {
+        "username": username,
+        "profile": run["profile"],
+        "repositories": run["owner_repos"],
+        "contributions": run["member_repos"],
+        "total_stars": run["total_stars"],
+        "talent_rank_score": run["talent_rank_score"],
+        "domains": domains,
+        "language_character_stats": language_character_stats,
+        "degraded_stages": run.degraded
+    }
+
+
+async def collect_page_developers_async(usernames):
+    """并发分析一页开发者，保持输入顺序；单个开发者出错时返回带错误信息的占位条目"""
+    async with AsyncGitHubClient() as client:
+        results = await asyncio.gather(
+            *(_search_developer_async(username, client) for username in usernames),
+            return_exceptions=True
+        )
+    developers = []
+    for username, result in zip(usernames, results):
+        if isinstance(result, Exception):
+            logger.error(f"处理开发者 {username} 时发生错误: {str(result)}", exc_info=result)
+            result = _placeholder_developer(username, f"处理数据时发生错误: {str(result)}")
+        developers.append(result)
+    return developers
+
+
 @app.route('/api/search/domain', methods=['GET'])
+@scoped
 def search_by_domain():
     """基于领域搜索开发者的API端点"""
     try:
@@ -329,101 +473,8 @@ def search_by_domain():
         
         # 只处理当前分页需要的用户
         page_usernames = usernames[offset:offset + limit]
-        developers = []
-        
-        # 获取每个开发者的详细信息
-        for idx, username in enumerate(page_usernames, 1):
-            logger.info(f"正在处理第 {idx}/{len(page_usernames)} 个开发者: {username}")
-            
-            try:
-                # 使用新的国家预测功能
-                # country_prediction = predict_developer_country(username)
-                profile = get_user_profile(username)
-                # country_prediction = {
-                #     "profile_location": {},
-                #     "prediction": {"predicted_country": "Unknown", "confidence": 0},
-                #     "timezone_analysis": {},
-                #     "language_culture": {}
-                # }
-                
-                # 尝试获取仓库信息
-                try:
-                    user_repo = get_user_repos(username)
-                    owner_repos = [repo for repo in user_repo if repo["repo_type"] == "owner"]
-                    member_repos = [repo for repo in user_repo if repo["repo_type"] == "member"]
-                    logger.info(f"获取到 {username} 的仓库信息: {len(user_repo)} 个仓库")
-                except Exception as e:
-                    logger.warning(f"获取 {username} 的仓库信息失败: {str(e)}")
-                    owner_repos = []
-                    member_repos = []
-
-                # 尝试获取贡献信息
-                try:
-                    contribution_data = get_user_contributed_repos(username)
-                    logger.info(f"获取到 {username} 的贡献信息")
-                    contribution_score = evaluate_overall_contribution(contribution_data)
-                except Exception as e:
-                    logger.warning(f"获取 {username} 的贡献信息失败: {str(e)}")
-                
-                # 尝试获取star总数
-                try:
-                    total_stars = get_user_total_stars(username)
-                except Exception as e:
-                    logger.warning(f"获取 {username} 的star总数失败: {str(e)}")
-                
-                # 计算TalentRank评分
-                followers_count = 0
-                followers_count = profile.get("关注者数", 0)
-                
-                talent_rank_score = calculate_talent_rank(
-                    total_stars,
-                    followers_count,
-                    contribution_score
-                )
-                logger.info(f"{username} 的 TalentRank 评分: {talent_rank_score}")
-                
-                # 分析开发者技术领域
-                try:
-                    domains = get_developer_domains_weighted(username, owner_repos,
-                                                            apply_tfidf=True,
-                                                            apply_softmax=True,
-                                                            softmax_temp=0.5)
-                    language_character_stats = aggregate_language_characters(owner_repos)
-                    logger.info(f"用户 '{username}' 的技术领域详细信息:\n{json.dumps(convert_numpy(domains), indent=2, ensure_ascii=False)}")
-                except Exception as e:
-                    logger.warning(f"分析用户 '{username}' 的技术领域失败: {str(e)}")
-                    domains = {}
-                    language_character_stats = {}
-                
-                developer_info = {
-                    "username": username,
-                    "profile": profile,
-                    # "country_prediction": {"predicted_country": "Unknown", "confidence": 0} if not country_prediction else country_prediction.get("prediction", {}),
-                    # "timezone_analysis": {} if not country_prediction else country_prediction.get("timezone_analysis", {}),
-                    # "language_culture": {} if not country_prediction else country_prediction.get("language_culture", {}),
-                    "repositories": owner_repos,
-                    "contributions": member_repos,
-                    "total_stars": total_stars,
-                    "talent_rank_score": talent_rank_score,
-                    "domains": convert_numpy(domains),
-                    "language_character_stats" : language_character_stats
-                }
-                developers.append(developer_info)
-            except Exception as e:
-                logger.error(f"处理开发者 {username} 时发生错误: {str(e)}", exc_info=True)
-                # 添加一个带有错误信息的占位开发者条目
-                developers.append({
-                    "username": username,
-                    "error": f"处理数据时发生错误: {str(e)}",
-                    "profile": {},
-                    # "country_prediction": {"predicted_country": "Unknown", "confidence": 0},
-                    "repositories": [],
-                    "contributions": [],
-                    "total_stars": 0,
-                    "talent_rank_score": 0,
-                    "domains": {},
-                    "language_character_stats" : {}
-                })
+        # 当前页的开发者在同一个事件循环里并发分析，共用一个异步客户端
+        developers = asyncio.run(collect_page_developers_async(page_usernames))
         
         # 按TalentRank评分排序（只排序当前页的数据）
         developers.sort(key=lambda x: x.get("talent_rank_score", 0), reverse=True)
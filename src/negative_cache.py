@@ -0,0 +1,81 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class NegativeCache:
+    """
+    “确定不存在”结果的持久化缓存，带独立的 TTL。
+    用于 404（没有个人 README、用户名不存在）以及“博客无法访问”等结果，
+    重复分析时这些已知缺失的资源不再发起任何请求。
+    空列表不在此缓存：事件等列表随时会出现新数据，交给 ETag 条件请求重新验证（304 不消耗配额）。
+    """
+
+    def __init__(self, db_path, ttl):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def _conn(self):
+        """第一次使用时才创建目录和数据库，导入模块不会在磁盘上留下文件"""
+        if self._connection is None:
+            with self._open_lock:
+                if self._connection is None:
+                    os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+                    conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                    with conn:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS negative_cache ("
+                            "key TEXT PRIMARY KEY, status INTEGER, body TEXT, expires_at REAL)"
+                        )
+                    self._connection = conn
+        return self._connection
+
+    def get(self, key):
+        """返回未过期的条目 {"status", "body"}，否则返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, body, expires_at FROM negative_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, body, expires_at = row
+        if expires_at < time.time():
+            self.discard(key)
+            return None
+        return {"status": status, "body": body}
+
+    def mark(self, key, status=404, body="", ttl=None):
+        """记录一个缺失结果"""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO negative_cache (key, status, body, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, status, body, expires_at),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"写入负缓存失败: {key}, 错误: {str(e)}")
+
+    def discard(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM negative_cache WHERE key = ?", (key,))
+
+    def is_absent(self, key):
+        """非 HTTP 结果（如博客抓取失败）的便捷查询"""
+        return self.get(key) is not None
+
+    def mark_absent(self, key, ttl=None):
+        self.mark(key, status=404, body="", ttl=ttl)
+
+    @staticmethod
+    def is_negative(response):
+        """判断 GitHub 响应是否属于可缓存的缺失结果：只有 404"""
+        return response.status_code == 404
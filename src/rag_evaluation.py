@@ -1,4 +1,5 @@
 from langsmith import Client
+from circuit_breaker import ollama_llm_breaker
 from config import OLLAMA_LLM
 from typing import Dict
 import json, re
@@ -59,7 +60,7 @@ def helpfulness(inputs: dict, outputs: dict) -> float:
     full_prompt = prompt_template + "\n\n" + user_block
 
     try:
-        raw = OLLAMA_LLM.invoke(full_prompt)
+        raw = ollama_llm_breaker.call(OLLAMA_LLM.invoke, full_prompt)
         # print("🔴 RAW LLM OUTPUT ↙︎\n", raw[:500])
         parsed = parse_helpfulness_output(raw)
         # print("🟢 PARSED ↙︎", parsed)
@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# 本地额度已用完、但重置时间未知（重置后还没收到新的响应头）时，令牌隔离的秒数
+UNKNOWN_RESET_WAIT = 60.0
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """速率限制桶已耗尽，且距离重置的时间超过允许等待的上限"""
+
+    def __init__(self, resource, reset_at):
+        self.resource = resource
+        self.reset_at = reset_at
+        wait = max(0, reset_at - time.time())
+        super().__init__(f"GitHub {resource} 速率限制已耗尽，{wait:.0f} 秒后重置")
+
+
+class RateLimitBucket:
+    """单个令牌在单个资源（core / search / graphql）上的速率限制状态"""
+
+    def __init__(self, limit=None, remaining=None, reset_at=0.0):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+        self.next_allowed = 0.0       # 节流后下一次允许发出请求的时间点
+        self.quarantined_until = 0.0  # 被限流后隔离到的时间点
+
+    def refresh(self, now):
+        """重置时间已过，则恢复满额并解除隔离"""
+        if self.reset_at and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = 0.0
+            self.next_allowed = 0.0
+        if self.quarantined_until and now >= self.quarantined_until:
+            self.quarantined_until = 0.0
+
+    def available_at(self, now):
+        """该桶最早可用的时间点，当前可用则返回 now"""
+        if self.quarantined_until > now:
+            return self.quarantined_until
+        if self.remaining is not None and self.remaining <= 0:
+            return max(now, self.reset_at)
+        return now
+
+    def score(self):
+        """令牌选择依据：剩余额度越多越优先，尚未探测过的令牌视为满额"""
+        return float("inf") if self.remaining is None else self.remaining
+
+
+class RateLimitScheduler:
+    """
+    根据 X-RateLimit-* 响应头为每个令牌的 core、search、graphql 三个资源分别维护配额。
+    每次请求路由到剩余额度最多的令牌；耗尽或被限流的令牌隔离到重置时刻。
+    剩余配额低于阈值时把请求均匀摊到重置前的时间窗口里，全部令牌耗尽时精确休眠到最早的重置时刻。
+    """
+
+    RESOURCES = ("core", "search", "graphql")
+
+    def __init__(self, tokens=None, pace_threshold=0.2, max_wait=300):
+        """
+        tokens: GitHub 令牌列表，为空时以匿名身份请求
+        pace_threshold: 剩余配额低于 limit * pace_threshold 时开始匀速节流
+        max_wait: 单次允许休眠的最长时间（秒），超过则抛出 RateLimitExceeded
+        """
+        self.tokens = list(tokens) if tokens else [None]
+        self.pace_threshold = pace_threshold
+        self.max_wait = max_wait
+        self._buckets = {
+            (token, resource): RateLimitBucket()
+            for token in self.tokens for resource in self.RESOURCES
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def resource_for_url(url):
+        """根据请求地址判断所属的速率限制资源"""
+        if "/graphql" in url:
+            return "graphql"
+        if "/search/" in url:
+            return "search"
+        return "core"
+
+    def _select_token(self, resource, now):
+        """挑选可用且剩余额度最多的令牌；全部不可用时挑选最早恢复的令牌"""
+        buckets = []
+        for token in self.tokens:
+            bucket = self._buckets[(token, resource)]
+            bucket.refresh(now)
+            buckets.append((token, bucket))
+
+        available = [(t, b) for t, b in buckets if b.available_at(now) <= now]
+        if available:
+            return max(available, key=lambda item: item[1].score())
+        return min(buckets, key=lambda item: item[1].available_at(now))
+
+    def reserve(self, resource):
+        """
+        预占一次请求额度，返回 (令牌, 发出请求前需要等待的秒数)，不阻塞。
+        预占会先扣减本地剩余额度，避免并发线程同时冲向已耗尽的桶。
+        """
+        with self._lock:
+            now = time.time()
+            token, bucket = self._select_token(resource, now)
+
+            available_at = bucket.available_at(now)
+            if available_at > now:
+                return token, available_at - now + 1.0
+
+            if bucket.remaining is None or bucket.limit is None:
+                return token, 0.0
+
+            if bucket.remaining <= 0:
+                # 额度已耗尽却没有重置时间（available_at 认为可用），不能继续透支：
+                # 隔离该令牌，与其他耗尽的情况一样走等待路径，直到响应头带回新的配额
+                bucket.remaining = 0
+                bucket.quarantined_until = max(bucket.quarantined_until, now + UNKNOWN_RESET_WAIT)
+                return token, bucket.quarantined_until - now
+
+            delay = 0.0
+            if bucket.remaining < bucket.limit * self.pace_threshold and bucket.reset_at > now:
+                interval = (bucket.reset_at - now) / bucket.remaining
+                start = max(now, bucket.next_allowed)
+                delay = start - now
+                bucket.next_allowed = start + interval
+            bucket.remaining = max(0, bucket.remaining - 1)
+            return token, delay
+
+    def acquire(self, resource):
+        """阻塞直到可以对该资源发出请求，返回本次请求应使用的令牌"""
+        token, delay = self.reserve(resource)
+        if delay <= 0:
+            return token
+        if self.max_wait is not None and delay > self.max_wait:
+            raise RateLimitExceeded(resource, time.time() + delay)
+        logger.info(f"GitHub {resource} 配额不足，等待 {delay:.1f} 秒")
+        time.sleep(delay)
+        return token
+
+    def update(self, token, resource, response_headers):
+        """根据响应头刷新该令牌的配额信息"""
+        resource = response_headers.get("X-RateLimit-Resource", resource)
+        bucket = self._buckets.get((token, resource))
+        if bucket is None:
+            return
+        try:
+            limit = int(response_headers["X-RateLimit-Limit"])
+            remaining = int(response_headers["X-RateLimit-Remaining"])
+            reset_at = float(response_headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            bucket.limit = limit
+            bucket.remaining = remaining
+            bucket.reset_at = reset_at
+
+    def quarantine(self, token, resource, until):
+        """把被限流的令牌隔离到指定时间点"""
+        bucket = self._buckets.get((token, resource))
+        if bucket is None:
+            return
+        with self._lock:
+            bucket.quarantined_until = max(bucket.quarantined_until, until)
+        logger.warning(f"GitHub 令牌 #{self.tokens.index(token) + 1} 的 {resource} 配额被限流，"
+                       f"隔离 {max(0, until - time.time()):.0f} 秒")
+
+    def wait_time_after_limited(self, token, resource, response):
+        """
+        请求被限流（403/429）时返回该令牌需要等待的秒数；不是限流响应则返回 None。
+        主速率限制看 X-RateLimit-Remaining，次级速率限制看 Retry-After。
+        """
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                return None
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            resource = response.headers.get("X-RateLimit-Resource", resource)
+            with self._lock:
+                bucket = self._buckets.get((token, resource))
+                reset_at = bucket.reset_at if bucket else 0.0
+            return max(0.0, reset_at - time.time()) + 1.0
+        return None
+
+    def snapshot(self):
+        """返回当前各令牌、各资源的配额状态，便于日志和调试（令牌以序号表示）"""
+        with self._lock:
+            return {
+                f"token#{self.tokens.index(token) + 1}:{resource}": {
+                    "limit": b.limit,
+                    "remaining": b.remaining,
+                    "reset_at": b.reset_at,
+                    "quarantined_until": b.quarantined_until,
+                }
+                for (token, resource), b in self._buckets.items()
+            }
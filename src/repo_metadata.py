@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import threading
+
+from cachetools import TTLCache
+
+from config import REPO_METADATA_CACHE_SIZE, REPO_METADATA_TTL
+from github_client import github_client
+
+logger = logging.getLogger(__name__)
+
+# 进程内共享的仓库元数据缓存，键为 owner/name；
+# 热门上游仓库（如 torvalds/linux）在分析不同开发者时只请求一次
+_metadata_cache = TTLCache(maxsize=REPO_METADATA_CACHE_SIZE, ttl=REPO_METADATA_TTL)
+_metadata_lock = threading.Lock()
+
+# 一次 GraphQL 查询最多带多少个 repository 别名
+GRAPHQL_BATCH_SIZE = 100
+
+
+def _repo_url(full_name):
+    return f"https://api.github.com/repos/{full_name}"
+
+
+def store_repo_metadata(full_name, repo_data):
+    """从仓库详情中取出贡献评估用到的字段并放入缓存"""
+    metadata = {
+        "stargazers_count": repo_data.get("stargazers_count", 0),
+        "forks_count": repo_data.get("forks_count", 0),
+        "html_url": repo_data.get("html_url", ""),
+    }
+    with _metadata_lock:
+        _metadata_cache[full_name] = metadata
+    return metadata
+
+
+def _split_cached(full_names):
+    """返回 (已缓存的 {仓库名: 元数据}, 需要请求的仓库名列表)，仓库名去重并保持顺序"""
+    found, missing = {}, []
+    with _metadata_lock:
+        for full_name in dict.fromkeys(full_names):
+            metadata = _metadata_cache.get(full_name)
+            if metadata is None:
+                missing.append(full_name)
+            else:
+                found[full_name] = metadata
+    return found, missing
+
+
+def _batch_query(full_names):
+    """为一批仓库构造带别名的 GraphQL 查询：r0: repository(owner: $o0, name: $n0) { ... }"""
+    declarations, fields, variables = [], [], {}
+    for i, full_name in enumerate(full_names):
+        owner, _, name = full_name.partition("/")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = name
+        declarations.append(f"$o{i}: String!, $n{i}: String!")
+        fields.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ stargazerCount forkCount url }}")
+    query = f"query({', '.join(declarations)}) {{\n  " + "\n  ".join(fields) + "\n}"
+    return query, variables
+
+
+def _batches(full_names):
+    for start in range(0, len(full_names), GRAPHQL_BATCH_SIZE):
+        yield full_names[start:start + GRAPHQL_BATCH_SIZE]
+
+
+def _store_graphql_batch(batch, data, found):
+    """保存一批 GraphQL 结果；不存在或无权访问的仓库对应字段为 None，直接跳过"""
+    for i, full_name in enumerate(batch):
+        node = data.get(f"r{i}")
+        if node is None:
+            logger.warning(f"GraphQL 未找到仓库或无权访问: {full_name}")
+            continue
+        found[full_name] = store_repo_metadata(full_name, {
+            "stargazers_count": node.get("stargazerCount", 0),
+            "forks_count": node.get("forkCount", 0),
+            "html_url": node.get("url", ""),
+        })
+
+
+def _store_rest_response(full_name, response, found):
+    if response.status_code == 200:
+        found[full_name] = store_repo_metadata(full_name, response.json())
+    else:
+        logger.warning(f"请求仓库详情失败，状态码: {response.status_code}，仓库: {full_name}")
+
+
+def get_repos_metadata(full_names):
+    """
+    批量获取仓库的 star 数、fork 数和地址，返回 {仓库名: 元数据}。
+    先查进程内缓存；未命中的仓库有令牌时每 100 个合成一个 GraphQL 查询，
+    某一批查询失败时这一批回退到 REST 并发请求。获取失败的仓库不出现在结果中。
+    """
+    found, missing = _split_cached(full_names)
+    if missing and github_client.can_use_graphql:
+        failed = []
+        for batch in _batches(missing):
+            try:
+                query, variables = _batch_query(batch)
+                _store_graphql_batch(batch, github_client.graphql(query, variables, allow_partial=True), found)
+            except Exception as e:
+                logger.warning(f"GraphQL 批量获取 {len(batch)} 个仓库详情失败，回退到 REST: {str(e)}")
+                failed.extend(batch)
+        missing = failed
+    if missing:
+        for full_name, response in zip(missing, github_client.get_many(_repo_url(n) for n in missing)):
+            _store_rest_response(full_name, response, found)
+    return found
+
+
+async def get_repos_metadata_async(full_names, client):
+    """get_repos_metadata 的异步版本，client 为 AsyncGitHubClient；各批 GraphQL 查询并发执行"""
+    found, missing = _split_cached(full_names)
+    if missing and client.can_use_graphql:
+        async def query_batch(batch):
+            query, variables = _batch_query(batch)
+            return await client.graphql(query, variables, allow_partial=True)
+
+        batches = list(_batches(missing))
+        results = await asyncio.gather(*(query_batch(b) for b in batches), return_exceptions=True)
+        failed = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                logger.warning(f"GraphQL 批量获取 {len(batch)} 个仓库详情失败，回退到 REST: {str(result)}")
+                failed.extend(batch)
+            else:
+                _store_graphql_batch(batch, result, found)
+        missing = failed
+    if missing:
+        responses = await asyncio.gather(*(client.get(_repo_url(n)) for n in missing))
+        for full_name, response in zip(missing, responses):
+            _store_rest_response(full_name, response, found)
+    return found
@@ -0,0 +1,108 @@
+import heapq
+import logging
+from collections import Counter
+
+from single_flight import memoize_in_scope, memoize_in_scope_async
+from user_profile import get_user_repos, get_user_repos_async
+
+logger = logging.getLogger(__name__)
+
+# top_repos 支持的排序方式：最近推送优先，或 Star 数优先；pushed_at 为 ISO 8601 字符串，可以直接比较
+REPO_ORDERINGS = {
+    "pushed": lambda repo: repo.get("pushed_at") or "",
+    "stars": lambda repo: repo.get("Star", 0) or 0,
+}
+
+
+class RepoSnapshot:
+    """
+    一个开发者在一次请求内的仓库快照：仓库列表只获取一次，
+    Star 总数、语言占比、owner / member 划分等都在内存中派生，供各个分析函数共用。
+    """
+
+    def __init__(self, username, repos):
+        self.username = username
+        self.repos = list(repos)
+        self.owner_repos = [repo for repo in self.repos if repo["repo_type"] == "owner"]
+        self.member_repos = [repo for repo in self.repos if repo["repo_type"] == "member"]
+
+    def __len__(self):
+        return len(self.repos)
+
+    @property
+    def total_stars(self):
+        """所有仓库（owner 和 member）的 Star 总数，与 get_user_total_stars 口径一致"""
+        return sum(repo.get("Star", 0) or 0 for repo in self.repos)
+
+    @property
+    def total_forks(self):
+        return sum(repo.get("Fork", 0) or 0 for repo in self.repos)
+
+    def language_bytes(self, repos=None):
+        """按语言累加代码字节数，默认统计 owner 仓库"""
+        languages = Counter()
+        for repo in self.owner_repos if repos is None else repos:
+            languages.update(repo.get("language_detail") or {})
+        return languages
+
+    def language_percentages(self, repos=None):
+        """各语言字节数占比（百分比，保留两位小数），按占比降序"""
+        languages = self.language_bytes(repos)
+        total_bytes = sum(languages.values())
+        if total_bytes <= 0:
+            return {}
+        return {
+            lang: round(bytes_count / total_bytes * 100, 2)
+            for lang, bytes_count in languages.most_common()
+        }
+
+    def top_repos(self, order_by="pushed", limit=None, repos=None):
+        """
+        按 REPO_ORDERINGS 中的顺序挑出最相关的 limit 个仓库（默认在 owner 仓库中挑选），
+        在快照的内存列表上排序，不再发起请求
+        """
+        if order_by not in REPO_ORDERINGS:
+            raise ValueError(f"不支持的仓库排序方式: {order_by}")
+        repos = self.owner_repos if repos is None else repos
+        key = REPO_ORDERINGS[order_by]
+        if limit is None:
+            return sorted(repos, key=key, reverse=True)
+        return heapq.nlargest(limit, repos, key=key)
+
+    @staticmethod
+    def primary_language(repo):
+        """仓库的主要语言：language_detail 按字节数降序，取第一个"""
+        return next(iter(repo.get("language_detail") or {}), None)
+
+    @staticmethod
+    def full_name(repo):
+        """从 html_url 中取出 owner/name 形式的完整仓库名，取不到时返回 None"""
+        html_url = repo.get("html_url", "")
+        if html_url and "github.com/" in html_url:
+            return html_url.split("github.com/", 1)[1] or None
+        return None
+
+
+def _scope_key(username):
+    return f"repo_snapshot:{username}"
+
+
+def build_repo_snapshot(username):
+    """获取开发者的仓库快照；在 request_scope() 内同一开发者只构建一次"""
+    def build():
+        snapshot = RepoSnapshot(username, get_user_repos(username))
+        logger.info(f"构建用户 '{username}' 的仓库快照: {len(snapshot)} 个仓库")
+        return snapshot
+    return memoize_in_scope(_scope_key(username), build)
+
+
+async def build_repo_snapshot_async(username, client):
+    """
+    build_repo_snapshot 的异步版本，client 为 AsyncGitHubClient；与同步版本共用作用域中的同一个键，
+    不论阶段图如何编排，同一请求内同一开发者的仓库列表都只获取一次
+    """
+    async def build():
+        snapshot = RepoSnapshot(username, await get_user_repos_async(username, client))
+        logger.info(f"构建用户 '{username}' 的仓库快照: {len(snapshot)} 个仓库")
+        return snapshot
+    return await memoize_in_scope_async(_scope_key(username), build)
@@ -6,6 +6,7 @@ from langchain_community.vectorstores import FAISS
 from langchain_ollama import OllamaEmbeddings
 from langchain_core.prompts import PromptTemplate
 from langchain_ollama import ChatOllama
+from circuit_breaker import ollama_embedding_breaker, ollama_llm_breaker
 from config import EMBEDDING_MODEL_NAME, MODEL_NAME, PROMPT, DOWNLOAD_DIR, SKILL_ANALYSIS_PROMPT, TOP_K_RESULTS
 
 logger = logging.getLogger(__name__)
@@ -33,7 +34,7 @@ def retrieve_relevant_information(username, query, top_k=TOP_K_RESULTS):
     
     try:
         # 执行相似性搜索
-        search_results = vector_store.similarity_search_with_score(query, k=top_k)
+        search_results = ollama_embedding_breaker.call(vector_store.similarity_search_with_score, query, k=top_k)
         
         # 提取结果
         results = []
@@ -78,7 +79,7 @@ def generate_skill_summary(username, context):
     
     # 生成摘要
     try:
-        raw_summary = chain.invoke({"username": username, "context": context})
+        raw_summary = ollama_llm_breaker.call(chain.invoke, {"username": username, "context": context})
         
         # 从ChatMessage或字符串中获取内容
         if hasattr(raw_summary, 'content'):
@@ -135,7 +136,7 @@ def generate_search_queries(query):
         chain = prompt | llm
         
         # 生成查询
-        result = chain.invoke({"input_query": query, "date": current_date})
+        result = ollama_llm_breaker.call(chain.invoke, {"input_query": query, "date": current_date})
         
         # 从ChatMessage或字符串中获取内容
         if hasattr(result, 'content'):
@@ -1,7 +1,8 @@
 import logging
 import time
 import requests
-from config import headers
+from github_client import github_client
+from rate_limit import RateLimitExceeded
 
 def search_repositories_by_language_and_topic(language, topic, max_results):
     """
@@ -28,7 +29,7 @@ def search_repositories_by_language_and_topic(language, topic, max_results):
                 url = f"https://api.github.com/search/repositories?q={query}&per_page={per_page}&page={page}"
                 
                 logger.info(f"正在请求第 {page} 页，URL: {url}")
-                response = requests.get(url, headers=headers, timeout=30)
+                response = github_client.get(url, timeout=30)
                 
                 if response.status_code == 200:
                     repositories = response.json().get('items', [])
@@ -48,8 +49,8 @@ def search_repositories_by_language_and_topic(language, topic, max_results):
                     break  # 成功获取数据，跳出重试循环
                     
                 elif response.status_code == 403:
-                    logger.error("GitHub API 速率限制已达到，等待重试")
-                    time.sleep(60)  # 如果达到速率限制，等待60秒
+                    # 速率限制的等待已由 github_client 按 X-RateLimit-Reset 精确处理，这里不再固定休眠
+                    logger.error("GitHub API 请求被拒绝 (403)，重试")
                     retries += 1
                     
                 elif response.status_code == 401:
@@ -61,6 +62,10 @@ def search_repositories_by_language_and_topic(language, topic, max_results):
                     retries += 1
                     time.sleep(retry_delay)
                     
+            except RateLimitExceeded as e:
+                logger.error(f"GitHub 搜索配额已耗尽，返回已获取的结果: {str(e)}")
+                return profiles[:max_results]
+
             except requests.exceptions.RequestException as e:
                 logger.error(f"请求异常: {str(e)}")
                 retries += 1
@@ -0,0 +1,188 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class _Call:
+    """一次正在进行中的请求，等待者通过 event 获取领头者的结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    同一个键的并发调用只执行一次：第一个调用者真正发起请求，
+    其余调用者阻塞等待并拿到同一个结果（或同一个异常）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+
+class RequestScope:
+    """
+    一次 API 请求范围内的共享表：同一 URL 在作用域内只请求、只解析一次；
+    也可以按任意字符串键存放请求内复用的计算结果（见 memoize_in_scope）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._key_locks = {}  # 正在计算的键 -> 该键的锁
+
+    def get(self, key):
+        with self._lock:
+            return self._responses.get(key)
+
+    def put(self, key, response):
+        with self._lock:
+            self._responses.setdefault(key, response)
+
+    def get_or_compute(self, key, fn):
+        """
+        返回 key 对应的值，不存在时调用 fn() 计算并保存；None 也是有效结果。
+        同一个键的并发调用只有一个线程执行 fn，其余线程等待它的结果；fn 抛出异常时不保存，下一个等待者重新计算。
+        """
+        with self._lock:
+            if key in self._responses:
+                return self._responses[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._responses:
+                    return self._responses[key]
+            value = fn()
+            with self._lock:
+                self._responses.setdefault(key, value)
+                self._key_locks.pop(key, None)
+                return self._responses[key]
+
+    def __len__(self):
+        return len(self._responses)
+
+
+_current_scope = contextvars.ContextVar("github_request_scope", default=None)
+
+
+def current_scope():
+    """返回当前上下文的请求作用域，不在作用域内时返回 None"""
+    return _current_scope.get()
+
+
+@contextmanager
+def request_scope():
+    """
+    开启一个请求作用域。嵌套使用时复用外层作用域。
+    作用域对象通过 contextvars 传递，asyncio 任务和 asyncio.to_thread 会自动继承；
+    自行创建的线程池需要用 contextvars.copy_context().run 提交任务。
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        yield scope
+        return
+    scope = RequestScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def memoize_in_scope(key, fn):
+    """
+    在当前请求作用域内按 key 缓存 fn() 的结果（包括 None）；不在作用域内时直接调用。
+    作用域内的并发线程（如 asyncio.to_thread 执行的多个阶段）同时请求同一个键时，fn 只执行一次。
+    """
+    scope = current_scope()
+    if scope is None:
+        return fn()
+    return scope.get_or_compute(key, fn)
+
+
+async def memoize_in_scope_async(key, coro_fn):
+    """
+    memoize_in_scope 的异步版本，与同步调用方共用同一个键：协程和线程里的同步调用同时请求同一个键时，
+    coro_fn() 也只执行一次。等待在线程里进行，不阻塞事件循环；coro_fn() 仍在当前事件循环上执行。
+    """
+    scope = current_scope()
+    if scope is None:
+        return await coro_fn()
+    loop = asyncio.get_running_loop()
+
+    async def run_in_scope():
+        # run_coroutine_threadsafe 创建的任务不继承调用方的上下文，这里显式带上作用域
+        token = _current_scope.set(scope)
+        try:
+            return await coro_fn()
+        finally:
+            _current_scope.reset(token)
+
+    def compute():
+        return asyncio.run_coroutine_threadsafe(run_in_scope(), loop).result()
+
+    return await asyncio.to_thread(scope.get_or_compute, key, compute)
+
+
+def scoped(fn):
+    """装饰器：函数执行期间处于同一个请求作用域内，用于 Flask 视图函数"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with request_scope():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def memoize_json(response):
+    """让响应对象的 json() 只解析一次；共享的响应被多个调用方读取时不会重复解析"""
+    if getattr(response, "_json_memoized", False):
+        return response
+    parse = response.json
+    parsed = []
+
+    def json(**kwargs):
+        if kwargs:
+            return parse(**kwargs)
+        if not parsed:
+            parsed.append(parse())
+        return parsed[0]
+
+    response.json = json
+    response._json_memoized = True
+    return response
+
+
+def is_shareable(response):
+    """只有确定性的结果才在作用域内共享；限流和服务端错误需要调用方自己重试"""
+    return response.status_code < 500 and response.status_code not in (403, 429)
@@ -0,0 +1,293 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from config import (GITHUB_CACHE_DIR, SOCIAL_GRAPH_LOG_MAX_EDGES, SOCIAL_GRAPH_LOG_MIN_EDGES, SOCIAL_GRAPH_LOG_RATIO,
+                    SOCIAL_GRAPH_TTL)
+
+logger = logging.getLogger(__name__)
+
+# 存储的边类型，均为“被爬取的节点 -> 对方”的有向边：
+# follower：关注者；following：关注中；mutual：互相关注的关注者；collaborator：共同贡献者
+EDGE_KINDS = ("follower", "following", "mutual", "collaborator")
+
+
+class SocialGraphStore:
+    """
+    爬取到的社交网络边的持久化存储。
+    登录名映射为整数 ID（SQLite），每类边以 CSR 格式（indptr / indices 两个 .npy 文件）保存，
+    读取时内存映射，不整体载入内存。新爬取的边先追加到日志文件，同时在内存中按节点索引它最后一次记录的边，
+    读取时日志中记录过的节点以日志为准；日志增长到阈值时才整体合并进 CSR。
+    节点被重新爬取时，它原有的出边被新结果替换。
+    """
+
+    def __init__(self, root_dir, ttl):
+        self.root_dir = root_dir
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._open_lock = threading.Lock()
+        self._connection = None
+        self._csr = {}
+        # kind -> ({节点 ID: 日志中最后一次记录的出边数组}, 日志中的边数)
+        self._tails = {}
+
+    @property
+    def _conn(self):
+        """第一次使用时才创建目录和数据库，导入模块不会在磁盘上留下文件；边的日志和 CSR 文件都在写入节点之后才出现"""
+        if self._connection is None:
+            with self._open_lock:
+                if self._connection is None:
+                    os.makedirs(self.root_dir, exist_ok=True)
+                    conn = sqlite3.connect(os.path.join(self.root_dir, "graph.sqlite3"), check_same_thread=False)
+                    with conn:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, key TEXT UNIQUE, login TEXT)"
+                        )
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS crawls (node_id INTEGER, kind TEXT, fetched_at REAL, "
+                            "PRIMARY KEY (node_id, kind))"
+                        )
+                    self._connection = conn
+        return self._connection
+
+    def _path(self, kind, suffix):
+        return os.path.join(self.root_dir, f"{kind}.{suffix}")
+
+    # ——— 节点 ID ———
+
+    def node_ids(self, logins, create=False):
+        """返回 {登录名: 节点 ID}；create=True 时为新用户分配 ID，否则只返回已有的"""
+        logins = list(dict.fromkeys(logins))
+        with self._lock:
+            if create:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO nodes (key, login) VALUES (?, ?)",
+                        [(login.lower(), login) for login in logins]
+                    )
+            by_key = {}
+            keys = list(dict.fromkeys(login.lower() for login in logins))
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                by_key.update(self._conn.execute(
+                    f"SELECT key, id FROM nodes WHERE key IN ({placeholders})", batch
+                ).fetchall())
+        return {login: by_key[login.lower()] for login in logins if login.lower() in by_key}
+
+    def logins(self, ids):
+        """节点 ID 数组 -> 登录名列表（同序）"""
+        ids = [int(node_id) for node_id in ids]
+        with self._lock:
+            mapping = {}
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                mapping.update(self._conn.execute(
+                    f"SELECT id, login FROM nodes WHERE id IN ({placeholders})", batch
+                ).fetchall())
+        return [mapping.get(node_id) for node_id in ids]
+
+    def _node_count(self):
+        row = self._conn.execute("SELECT MAX(id) FROM nodes").fetchone()
+        return (row[0] or 0) + 1
+
+    # ——— 写入 ———
+
+    def is_fresh(self, login, kind):
+        """该用户的 kind 类出边是否已爬取且未过期"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT c.fetched_at FROM crawls c JOIN nodes n ON n.id = c.node_id WHERE n.key = ? AND c.kind = ?",
+                (login.lower(), kind)
+            ).fetchone()
+        return row is not None and row[0] >= time.time() - self.ttl
+
+    def fresh_nodes(self, logins, kind):
+        """logins 中 kind 类出边已爬取且未过期的用户集合，分批用 IN (...) 查询"""
+        logins = list(dict.fromkeys(logins))
+        keys = list(dict.fromkeys(login.lower() for login in logins))
+        fresh_keys = set()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                fresh_keys.update(key for (key,) in self._conn.execute(
+                    f"SELECT n.key FROM crawls c JOIN nodes n ON n.id = c.node_id "
+                    f"WHERE n.key IN ({placeholders}) AND c.kind = ? AND c.fetched_at >= ?",
+                    batch + [kind, time.time() - self.ttl]
+                ))
+        return {login for login in logins if login.lower() in fresh_keys}
+
+    def record(self, login, kind, targets):
+        """记录一次爬取结果：login 的全部 kind 类出边为 targets（按顺序），替换以前的结果"""
+        targets = [target for target in dict.fromkeys(targets) if target.lower() != login.lower()]
+        with self._lock:
+            ids = self.node_ids([login] + targets, create=True)
+            tails, log_edges = self._load_tails(kind)
+            # 每次记录以 (src, -1) 分隔行开头，合并时据此只保留每个节点最后一次记录的边（没有边时也能清空旧结果）
+            edges = np.array([(ids[login], -1)] + [(ids[login], ids[target]) for target in targets],
+                             dtype=np.int32)
+            with open(self._path(kind, "log"), "ab") as log:
+                edges.tofile(log)
+            tails[ids[login]] = edges[1:, 1]
+            self._tails[kind] = (tails, log_edges + len(targets))
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO crawls (node_id, kind, fetched_at) VALUES (?, ?, ?)",
+                    (ids[login], kind, time.time())
+                )
+
+    # ——— CSR 读取与合并 ———
+
+    def _load_csr(self, kind):
+        if kind not in self._csr:
+            indptr_path, indices_path = self._path(kind, "indptr.npy"), self._path(kind, "indices.npy")
+            if os.path.exists(indptr_path) and os.path.exists(indices_path):
+                self._csr[kind] = (np.load(indptr_path, mmap_mode="r"), np.load(indices_path, mmap_mode="r"))
+            else:
+                self._csr[kind] = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32))
+        return self._csr[kind]
+
+    def _load_tails(self, kind):
+        """
+        日志的内存索引：每个记录过的节点只保留最后一次记录的出边。
+        进程内第一次访问时读一遍日志文件重建，之后由 record 增量维护。
+        """
+        if kind not in self._tails:
+            tails = {}
+            log_path = self._path(kind, "log")
+            log = np.fromfile(log_path, dtype=np.int32).reshape(-1, 2) if os.path.exists(log_path) \
+                else np.zeros((0, 2), dtype=np.int32)
+            markers = np.flatnonzero(log[:, 1] < 0)
+            for start, end in zip(markers, np.append(markers[1:], len(log))):
+                tails[int(log[start, 0])] = log[start + 1:end, 1].copy()
+            self._tails[kind] = (tails, len(log) - len(markers))
+        return self._tails[kind]
+
+    def _row(self, kind, node_id):
+        """node_id 的 kind 类出边（节点 ID 数组）：日志中记录过的以日志为准，否则读 CSR 中的一行"""
+        with self._lock:
+            tails, _ = self._load_tails(kind)
+            if node_id in tails:
+                return tails[node_id]
+            indptr, indices = self._load_csr(kind)
+        if node_id + 1 >= len(indptr):
+            return np.zeros(0, dtype=np.int32)
+        return indices[indptr[node_id]:indptr[node_id + 1]]
+
+    def _merged(self, kind):
+        """CSR 与日志索引合并后的 (indptr, indices)，只在内存中构建：日志中记录过的节点，CSR 中的旧出边全部丢弃"""
+        tails, _ = self._load_tails(kind)
+        indptr, indices = self._load_csr(kind)
+        n = self._node_count()
+        if not tails:
+            return indptr, indices
+
+        recrawled = np.fromiter(tails, dtype=np.int64, count=len(tails))
+        old_src = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        keep = ~np.isin(old_src, recrawled)
+        src = np.concatenate([old_src[keep]] + [np.full(len(row), node_id) for node_id, row in tails.items()])
+        dst = np.concatenate([np.asarray(indices)[keep]] + list(tails.values()))
+        order = np.argsort(src, kind="stable")  # 行内保持写入顺序
+        new_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=new_indptr[1:])
+        return new_indptr, dst[order].astype(np.int32)
+
+    def _needs_compaction(self, kind):
+        """日志边数达到 SOCIAL_GRAPH_LOG_MAX_EDGES，或超过 SOCIAL_GRAPH_LOG_MIN_EDGES 且达到 CSR 边数的一定比例"""
+        _, log_edges = self._load_tails(kind)
+        _, indices = self._load_csr(kind)
+        threshold = min(SOCIAL_GRAPH_LOG_MAX_EDGES, max(SOCIAL_GRAPH_LOG_MIN_EDGES, SOCIAL_GRAPH_LOG_RATIO * len(indices)))
+        return log_edges > 0 and log_edges >= threshold
+
+    def compact(self, kinds=EDGE_KINDS, force=False):
+        """
+        把日志合并进 CSR 文件并清空日志。默认只合并超过阈值的边类型，force=True 时日志非空即合并。
+        爬取结束时调用，而不是每次读取时调用：读取直接使用日志索引，不需要先合并。
+        """
+        with self._lock:
+            for kind in kinds:
+                tails, _ = self._load_tails(kind)
+                if tails and (force or self._needs_compaction(kind)):
+                    self._compact(kind)
+
+    def _compact(self, kind):
+        indptr, indices = self._merged(kind)
+        # 先写临时文件再替换，已经映射旧文件的读取方不受影响
+        for suffix, array in (("indptr.npy", np.asarray(indptr, dtype=np.int64)), ("indices.npy", indices)):
+            tmp_path = self._path(kind, "tmp.npy")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, self._path(kind, suffix))
+        open(self._path(kind, "log"), "wb").close()
+        self._csr.pop(kind, None)
+        self._tails.pop(kind, None)
+        logger.info(f"社交图 '{kind}' 边合并完成: {len(indices)} 条边, {len(indptr) - 1} 个节点")
+
+    def adjacency(self, kind):
+        """
+        kind 类边的邻接矩阵（scipy.sparse.csr_matrix，n×n，行是被爬取的节点）。
+        日志为空时数据直接来自内存映射文件，否则在内存中与日志索引合并，不改写文件。
+        """
+        with self._lock:
+            indptr, indices = self._merged(kind)
+            n = self._node_count()
+        if len(indptr) < n + 1:
+            # 合并之后新分配的节点还没有出边
+            indptr = np.concatenate([indptr, np.full(n + 1 - len(indptr), indptr[-1], dtype=np.int64)])
+        return sparse.csr_matrix((np.ones(len(indices), dtype=np.float64), indices, indptr), shape=(n, n))
+
+    def neighbours(self, login, kind):
+        """login 的 kind 类出边对应的登录名，按爬取时的顺序"""
+        node_id = self.node_ids([login]).get(login)
+        if node_id is None:
+            return []
+        return self.logins(self._row(kind, node_id))
+
+    # ——— 向量化聚合 ———
+
+    def depth_weights(self, username, max_depth):
+        """
+        在已存储的边上按层计算每个节点的证据权重，返回 (节点 ID 数组, 权重数组)。
+        第 d 层的关注者权重为 1/d，与上一层节点互相关注的加倍；每个节点只在第一次到达的层计数，
+        只有互相关注者继续向下一层展开。每一层是一次稀疏矩阵与向量的乘法。
+        """
+        root = self.node_ids([username]).get(username)
+        if root is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        followers = self.adjacency("follower")
+        mutual = self.adjacency("mutual")
+        mutual = mutual + mutual.T  # 互相关注是对称关系
+        n = followers.shape[0]
+
+        visited = np.zeros(n, dtype=bool)
+        visited[root] = True
+        weights = np.zeros(n)
+        frontier = visited.astype(np.float64)
+        for depth in range(1, max_depth + 1):
+            reached = followers.T.dot(frontier) > 0
+            is_mutual = mutual.dot(frontier) > 0
+            new = reached & ~visited
+            weights[new] = np.where(is_mutual[new], 2.0, 1.0) / depth
+            visited |= new
+            frontier = (new & is_mutual).astype(np.float64)
+            if not frontier.any():
+                break
+
+        node_ids = np.flatnonzero(weights)
+        return node_ids, weights[node_ids]
+
+    def collaborators(self, username):
+        """username 的共同贡献者节点 ID 数组"""
+        root = self.node_ids([username]).get(username)
+        if root is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self._row("collaborator", root), dtype=np.int64)
+
+
+social_graph_store = SocialGraphStore(os.path.join(GITHUB_CACHE_DIR, "social_graph"), SOCIAL_GRAPH_TTL)
@@ -1,48 +1,97 @@
+import contextvars
+import heapq
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import requests
-from config import headers
-from contribution_analysis import get_user_contributed_repos
-from user_profile import get_user_repos
+from circuit_breaker import CircuitOpenError
+from config import SOCIAL_CRAWL_DEADLINE, SOCIAL_CRAWL_MAX_CALLS, SOCIAL_CRAWL_WORKERS, SOCIAL_FOLLOWING_MAX_ITEMS
+from github_client import counting_requests, github_client, max_pages_for
+from repo_snapshot import RepoSnapshot, build_repo_snapshot
+from social_graph import social_graph_store
+from user_location import get_user_locations, user_location_store
+from user_profile import iter_user_logins
 
-def analyze_social_network(username, depth=2):
-    """深入分析用户的社交网络，包括合作者和共同关注者"""
+def crawl_social_network(username, depth=2, snapshot=None, max_calls=SOCIAL_CRAWL_MAX_CALLS,
+                         deadline=SOCIAL_CRAWL_DEADLINE):
+    """
+    在 API 调用预算和时间预算内分析用户的社交网络，返回
+    {"locations": 按权重排序的 (位置, 权重) 列表, "budget": 预算使用情况}。
+    共同贡献者先补齐，随后按预期证据价值从高到低展开关注网络，两个阶段共用同一份预算；
+    任一预算用完即停止，位置权重基于此时图中已有的边计算，是部分结果而不是报错。
+    与最初的递归爬取相比，结果有两处有意的变化：
+    - 互相关注指“节点也关注了这个关注者”。原实现请求 /users/{关注者}/following/{节点}，
+      对关注者来说恒为真，所以每个关注者都按互相关注加倍并被展开；现在只有真正回关的才加倍、才继续展开；
+    - 每层不再固定只展开前 5 个互相关注者，展开多少由请求数 / 时间预算和优先级决定。
+    """
     logger = logging.getLogger(__name__)
-    logger.info(f"开始分析用户 '{username}' 的社交网络，深度设置为{depth}")
+    logger.info(f"开始分析用户 '{username}' 的社交网络，深度设置为{depth}，"
+                f"预算: {max_calls} 次请求 / {deadline} 秒")
     
-    location_weights = {}
-    processed_users = set()  # 记录已处理的用户，避免重复处理
-    processed_users.add(username)  # 先添加目标用户
+    budget = CrawlBudget(max_calls, deadline)
+    with counting_requests() as counter:
+        budget.counter = counter
+        
+        # 补齐共同贡献者
+        if not social_graph_store.is_fresh(username, "collaborator"):
+            _crawl_collaborators(username, snapshot, budget, logger)
+        
+        # 按优先级补齐关注关系
+        _crawl_network_best_first(username, depth, budget, logger)
     
-    # 递归分析社交网络
-    _analyze_network_level(username, location_weights, processed_users, current_depth=1, max_depth=depth, logger=logger)
+    # 本次写入的边留在日志中，超过阈值时才合并进 CSR
+    social_graph_store.compact()
     
-    # 获取用户作为member的仓库信息
+    location_weights = network_location_weights(username, depth)
+    
+    # 返回按权重排序的位置列表
+    result = sorted(location_weights.items(), key=lambda x: x[1], reverse=True)
+    report = budget.report()
+    logger.info(f"完成用户 '{username}' 的社交网络分析，找到 {len(location_weights)} 个不同位置，预算使用: {report}")
+    return {"locations": result, "budget": report}
+
+
+def analyze_social_network(username, depth=2, snapshot=None):
+    """
+    深入分析用户的社交网络，包括合作者和共同关注者；member 仓库来自 RepoSnapshot，未传入时按需构建。
+    爬取到的边保存在 social_graph_store 中：只有图中缺失或过期的节点才请求 API，
+    位置权重在存储的边上向量化计算，重复分析同一开发者或已爬取过的邻居时不再发起请求。
+    只返回位置列表，需要预算使用情况时调用 crawl_social_network。
+    """
+    return crawl_social_network(username, depth, snapshot)["locations"]
+
+
+def _crawl_collaborators(username, snapshot, budget, logger):
+    """
+    获取用户作为 member 的仓库的贡献者，记录为共同贡献者边，并在剩余预算内预取他们的位置。
+    预算在遍历仓库途中用完时不写入（下次分析时仍视为缺失），避免把不完整的列表当作最新结果。
+    """
+    if budget.exhausted():
+        return
     try:
-        # 获取用户所有仓库
-        all_repos = get_user_repos(username)
-        # 筛选出用户作为member的仓库
-        member_repos = [repo for repo in all_repos if repo["repo_type"] == "member"]
+        if snapshot is None:
+            snapshot = build_repo_snapshot(username)
+        member_repos = snapshot.member_repos
         logger.info(f"获取到用户 '{username}' 作为member的仓库: {len(member_repos)} 个")
         
+        collaborators = []
         for repo_info in member_repos:
+            if budget.exhausted():
+                logger.info(f"获取共同贡献者时预算用完({budget.stopped_by})，本次不记录共同贡献者")
+                return
             try:
                 repo_name = repo_info["repo_name"]
-                # 获取完整的仓库名称（包含所有者）
-                repo_full_name = None
-                
-                # 从html_url中获取完整仓库名称
-                html_url = repo_info.get("html_url", "")
-                if html_url and "github.com/" in html_url:
-                    parts = html_url.split("github.com/")
-                    if len(parts) > 1:
-                        repo_full_name = parts[1]
+                # 从html_url中获取完整仓库名称（包含所有者）
+                repo_full_name = RepoSnapshot.full_name(repo_info)
                 
                 if not repo_full_name:
                     logger.warning(f"无法从仓库信息中获取完整仓库名称，跳过仓库 '{repo_name}'")
                     continue
                 
                 contributors_url = f"https://api.github.com/repos/{repo_full_name}/contributors"
-                contributors_response = requests.get(contributors_url, headers=headers, timeout=10)
+                contributors_response = github_client.get(contributors_url)
                 
                 if contributors_response.status_code != 200:
                     logger.warning(f"请求仓库 '{repo_full_name}' 的贡献者失败，状态码: {contributors_response.status_code}")
@@ -51,139 +100,308 @@ def analyze_social_network(username, depth=2):
                 contributors = contributors_response.json()
                 logger.info(f"仓库 '{repo_full_name}' 共有 {len(contributors)} 个贡献者")
                 
-                for contributor in contributors:
-                    if contributor.get("login") != username:
-                        try:
-                            contributor_name = contributor.get('login')
-                            contributor_profile_url = f"https://api.github.com/users/{contributor_name}"
-                            contributor_profile_response = requests.get(contributor_profile_url, headers=headers, timeout=10)
-                            
-                            if contributor_profile_response.status_code == 200:
-                                contributor_data = contributor_profile_response.json()
-                                location = contributor_data.get("location")
-                                
-                                if location and not any(char in location for char in ['#', '%', '&', '*', '乱码']):
-                                    logger.info(f"贡献者 '{contributor_name}' 的位置: {location}, 权重: 1.5")
-                                    if location in location_weights:
-                                        location_weights[location] += 1.5  # 共同贡献者权重为1.5
-                                    else:
-                                        location_weights[location] = 1.5
-                        except Exception as e:
-                            logger.warning(f"处理贡献者 '{contributor_name}' 时发生错误: {str(e)}")
-                            continue
+                collaborators.extend(
+                    contributor.get("login") for contributor in contributors
+                    if contributor.get("login") and contributor.get("login") != username
+                )
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 logger.warning(f"处理仓库 '{repo_name}' 时发生错误: {str(e)}")
                 continue
+        
+        social_graph_store.record(username, "collaborator", collaborators)
+        # 贡献者的位置写入持久化缓存，聚合时直接读取；未缓存的最多请求剩余预算允许的个数
+        if not budget.out_of_time():
+            cached = user_location_store.get_many(collaborators)
+            missing = [login for login in dict.fromkeys(collaborators) if login not in cached]
+            get_user_locations(missing[:budget.remaining_calls()])
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.warning(f"获取用户 '{username}' 的member仓库时发生错误: {str(e)}")
-    
-    # 返回按权重排序的位置列表
-    result = sorted(location_weights.items(), key=lambda x: x[1], reverse=True)
-    logger.info(f"完成用户 '{username}' 的社交网络分析，找到 {len(location_weights)} 个不同位置")
-    return result
 
-def _analyze_network_level(username, location_weights, processed_users, current_depth, max_depth, logger):
-    """递归分析社交网络层级"""
-    if current_depth > max_depth:
+# 简介中的位置关键词 -> 国家代码
+BIO_LOCATION_KEYWORDS = {
+    "China": "CN", "中国": "CN", "Beijing": "CN", "Shanghai": "CN", "Shenzhen": "CN",
+    "USA": "US", "United States": "US", "America": "US", "New York": "US", "California": "US",
+    "Japan": "JP", "Tokyo": "JP", "日本": "JP",
+    "Korea": "KR", "韩国": "KR", "Seoul": "KR",
+    "India": "IN", "Mumbai": "IN", "Delhi": "IN",
+    "UK": "GB", "United Kingdom": "GB", "London": "GB", "England": "GB",
+    "Germany": "DE", "Berlin": "DE", "德国": "DE",
+    "France": "FR", "Paris": "FR", "法国": "FR",
+    "Russia": "RU", "Moscow": "RU", "俄罗斯": "RU",
+    "Canada": "CA", "Toronto": "CA", "Vancouver": "CA",
+    "Australia": "AU", "Sydney": "AU", "Melbourne": "AU"
+}
+
+FOLLOWERS_PER_NODE = 20  # 每个节点最多查看的关注者数
+# 展开一个新节点最多发出的请求数：关注者 1 页、关注中列表的全部页（iter_user_logins 每页 100 个）、每个关注者一次位置查询
+MAX_CALLS_PER_NODE = 1 + max_pages_for(SOCIAL_FOLLOWING_MAX_ITEMS, 100) + FOLLOWERS_PER_NODE
+STORED_NODE_BOOST = 2.0  # 已在社交图中的候选展开不花请求，优先级加成
+LOCATED_NODE_BOOST = 1.5  # 本身位置已缓存且有效的候选，优先级加成
+COLLABORATOR_WEIGHT = 1.5  # 共同贡献者的权重
+BIO_WEIGHT_FACTOR = 0.5  # 简介信息的权重较低
+
+
+def _is_valid_location(location):
+    return bool(location) and not any(char in location for char in ['#', '%', '&', '*', '乱码'])
+
+
+def _bio_country(bio):
+    """简介中第一个匹配的位置关键词对应的国家代码，没有时返回 None"""
+    if not bio or len(bio) <= 5:
+        return None
+    for keyword, country_code in BIO_LOCATION_KEYWORDS.items():
+        if keyword.lower() in bio.lower():
+            return country_code
+    return None
+
+
+def _sum_by_label(labels, weights):
+    """按标签汇总权重，空标签忽略"""
+    labels = np.array(labels, dtype=str)
+    mask = labels != ""
+    if not mask.any():
+        return {}
+    unique_labels, inverse = np.unique(labels[mask], return_inverse=True)
+    totals = np.bincount(inverse, weights=weights[mask], minlength=len(unique_labels))
+    return {str(label): float(total) for label, total in zip(unique_labels, totals)}
+
+
+def network_location_weights(username, depth):
+    """
+    只读取已存储的边和位置缓存，计算 username 社交网络中各位置的权重，不发起任何 API 请求：
+    第 d 层关注者权重 1/d，互相关注的加倍，简介中的位置关键词按一半权重计入，共同贡献者每人 1.5。
+    """
+    follower_ids, follower_weights = social_graph_store.depth_weights(username, depth)
+    collaborator_ids = social_graph_store.collaborators(username)
+    logins = social_graph_store.logins(np.concatenate([follower_ids, collaborator_ids]))
+    records = user_location_store.get_many(login for login in logins if login)
+
+    locations, bio_labels = [], []
+    for login in logins:
+        record = records.get(login) or {}
+        location = record.get("location")
+        locations.append(location if _is_valid_location(location) else "")
+        country_code = _bio_country(record.get("bio"))
+        bio_labels.append(f"bio:{country_code}" if country_code else "")
+
+    location_weights = _sum_by_label(
+        locations, np.concatenate([follower_weights, np.full(len(collaborator_ids), COLLABORATOR_WEIGHT)])
+    )
+    # 共同贡献者的简介不计入
+    bio_weights = _sum_by_label(
+        bio_labels, np.concatenate([follower_weights * BIO_WEIGHT_FACTOR, np.zeros(len(collaborator_ids))])
+    )
+    for label, weight in bio_weights.items():
+        location_weights[label] = location_weights.get(label, 0) + weight
+    return location_weights
+
+
+def _crawl_node(node, budget, logger):
+    """
+    读取单个节点的关注者和关注中列表，返回 (关注者, 关注中)，由调用方统一查询位置后写入 social_graph_store。
+    关注中列表逐页顺序读取（本函数已在爬取线程池中运行），关注者是否互相关注用集合判断，不再逐个请求检查。
+    每一步开始前检查截止时间，超时返回 None（下次分析时仍视为缺失）；请求关注者失败时返回 ([], [])。
+    """
+    if budget.out_of_time():
+        return None
+    response = github_client.get(f"https://api.github.com/users/{node}/followers")
+    if response.status_code != 200:
+        logger.warning(f"请求用户 '{node}' 的关注者失败，状态码: {response.status_code}")
+        return [], []
+    # 限制每个节点处理的关注者数量
+    followers = [follower["login"] for follower in response.json()][:FOLLOWERS_PER_NODE]
+    logger.info(f"获取到用户 '{node}' 的关注者: {len(followers)} 人")
+
+    following = []
+    for login in iter_user_logins(f"https://api.github.com/users/{node}/following", SOCIAL_FOLLOWING_MAX_ITEMS,
+                                  max_workers=1):
+        if budget.out_of_time():
+            return None
+        following.append(login)
+    return followers, following
+
+
+def _crawl_nodes(nodes, budget, logger):
+    """
+    并发爬取一组节点，返回因截止时间未能完成的节点列表。
+    先用 SOCIAL_CRAWL_WORKERS 个线程读取各节点的关注列表，再把整批关注者去重后一次查询位置，
+    两个阶段先后进行且都不嵌套线程池，同时在途的请求数不超过 SOCIAL_CRAWL_WORKERS。
+    """
+    if len(nodes) <= 1:
+        lists = [_crawl_node(node, budget, logger) for node in nodes]
+    else:
+        with ThreadPoolExecutor(max_workers=min(SOCIAL_CRAWL_WORKERS, len(nodes))) as executor:
+            # 每个任务使用独立的上下文副本，保证工作线程继承当前请求作用域和请求计数器
+            futures = [
+                executor.submit(contextvars.copy_context().run, _crawl_node, node, budget, logger)
+                for node in nodes
+            ]
+            lists = [future.result() for future in futures]
+
+    crawled = {node: result for node, result in zip(nodes, lists) if result is not None}
+    if crawled and budget.out_of_time():
+        crawled = {}
+    if crawled:
+        # 位置和简介写入持久化缓存，聚合时直接读取；查询完位置再写入边，图中已有的节点其关注者位置一定已缓存
+        get_user_locations([login for followers, _ in crawled.values() for login in followers],
+                           max_workers=SOCIAL_CRAWL_WORKERS)
+    for node, (followers, following) in crawled.items():
+        # 节点也关注了对方即为互相关注，按关注者顺序
+        following_set = {login.lower() for login in following}
+        social_graph_store.record(node, "follower", followers)
+        social_graph_store.record(node, "following", following)
+        social_graph_store.record(node, "mutual", [login for login in followers if login.lower() in following_set])
+    return [node for node in nodes if node not in crawled]
+
+
+class CrawlBudget:
+    """社交网络爬取的预算：最多发出 max_calls 次 GitHub 请求，最多花费 deadline 秒"""
+
+    def __init__(self, max_calls, deadline):
+        self.max_calls = max_calls
+        self.deadline = deadline
+        self.started = time.monotonic()
+        self.counter = None
+        self.nodes_expanded = 0
+        self.nodes_pending = 0
+        self.stopped_by = None
+
+    @property
+    def calls_used(self):
+        return self.counter.count if self.counter else 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining_calls(self):
+        return max(0, self.max_calls - self.calls_used)
+
+    def out_of_time(self):
+        """是否已过截止时间；工作线程在每一步请求前检查"""
+        return self.elapsed >= self.deadline
+
+    def exhausted(self):
+        """预算是否已用完，用完时记录是哪一项"""
+        if self.stopped_by is None:
+            if self.calls_used >= self.max_calls:
+                self.stopped_by = "calls"
+            elif self.out_of_time():
+                self.stopped_by = "deadline"
+        return self.stopped_by is not None
+
+    def batch_size(self):
+        """本批最多展开多少个需要请求 API 的节点：按每个节点的最大请求数计算，保证整批不会超出剩余请求数"""
+        return min(SOCIAL_CRAWL_WORKERS, self.remaining_calls() // MAX_CALLS_PER_NODE)
+
+    def report(self):
+        return {
+            "max_calls": self.max_calls,
+            "calls_used": self.calls_used,
+            "deadline_seconds": self.deadline,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "nodes_expanded": self.nodes_expanded,
+            "nodes_pending": self.nodes_pending,
+            "stopped_by": self.stopped_by,
+        }
+
+
+def _expansion_priority(depth, is_mutual, is_fresh, location_record):
+    """
+    展开一个候选节点的预期证据价值：它的关注者位于 depth + 1 层，权重为 1/(depth + 1)，
+    互相关注的候选加倍；图中已有的节点展开不花请求，本身位置已缓存且有效的候选更可能带来位置线索。
+    """
+    value = (2.0 if is_mutual else 1.0) / (depth + 1)
+    if is_fresh:
+        value *= STORED_NODE_BOOST
+    if location_record and _is_valid_location(location_record.get("location")):
+        value *= LOCATED_NODE_BOOST
+    return value
+
+
+def _claim_candidates(node, depth, max_depth, visited):
+    """
+    按存储的边认领 node 的关注者，返回可以继续展开的 (优先级, 登录名, 深度, 是否已在图中) 列表。
+    整批候选的图中状态和位置缓存各查询一次，不逐个查询。
+    """
+    if depth + 1 >= max_depth:
+        # 关注者已经在最深一层，不再展开
+        return []
+    mutuals = set(social_graph_store.neighbours(node, "mutual"))
+    claimed = []
+    for follower in social_graph_store.neighbours(node, "follower"):
+        if follower.lower() in visited:
+            continue
+        visited.add(follower.lower())
+        # 只有互相关注者继续向下一层展开
+        if follower in mutuals:
+            claimed.append(follower)
+    if not claimed:
+        return []
+    fresh = social_graph_store.fresh_nodes(claimed, "follower")
+    records = user_location_store.get_many(claimed)
+    return [
+        (_expansion_priority(depth + 1, True, login in fresh, records.get(login)), login, depth + 1, login in fresh)
+        for login in claimed
+    ]
+
+
+def _crawl_network_best_first(username, max_depth, budget, logger):
+    """
+    按预期证据价值从高到低展开社交网络：每批从优先队列取出若干个最有价值的节点，
+    其中图中缺失或过期的并发爬取，然后把它们的互相关注者作为新候选放回队列，直到队列为空或预算用完。
+    """
+    if max_depth < 1:
         return
-    
-    logger.info(f"分析第 {current_depth} 层社交网络: 用户 '{username}'")
-    depth_weight_factor = 1.0 / current_depth  # 随着深度增加，权重递减
-    
-    try:
-        # 获取用户的关注者
-        followers_url = f"https://api.github.com/users/{username}/followers"
-        followers_response = requests.get(followers_url, headers=headers, timeout=10)
-        
-        if followers_response.status_code != 200:
-            logger.warning(f"请求用户 '{username}' 的关注者失败，状态码: {followers_response.status_code}")
-            return
-            
-        followers = followers_response.json()
-        logger.info(f"获取到用户 '{username}' 的关注者: {len(followers)} 人")
-        
-        # 分析关注者和被关注者的位置，加权处理
-        mutual_followers = []  # 存储互相关注的用户
-        
-        for follower in followers[:min(20, len(followers))]:  # 限制每层处理的关注者数量
-            try:
-                follower_name = follower['login']
-                
-                if follower_name in processed_users:
-                    logger.info(f"用户 '{follower_name}' 已处理过，跳过")
-                    continue
-                    
-                processed_users.add(follower_name)
-                
-                # 检查是否互相关注
-                following_url = f"https://api.github.com/users/{follower_name}/following/{username}"
-                following_response = requests.get(following_url, headers=headers, timeout=10)
-                
-                is_mutual = following_response.status_code == 204
-                base_weight = 2.0 if is_mutual else 1.0  # 互相关注的基础权重更高
-                weight = base_weight * depth_weight_factor  # 根据深度调整权重
-                
-                # 获取关注者的位置
-                follower_profile_url = f"https://api.github.com/users/{follower_name}"
-                follower_profile_response = requests.get(follower_profile_url, headers=headers, timeout=10)
-                
-                if follower_profile_response.status_code == 200:
-                    follower_data = follower_profile_response.json()
-                    location = follower_data.get("location")
-                    bio = follower_data.get("bio", "")
-                    
-                    # 处理位置信息
-                    if location and not any(char in location for char in ['#', '%', '&', '*', '乱码']):
-                        logger.info(f"关注者 '{follower_name}' 的位置: {location}, 深度: {current_depth}, 权重: {weight:.2f}")
-                        if location in location_weights:
-                            location_weights[location] += weight
-                        else:
-                            location_weights[location] = weight
-                    
-                    # 分析简介中可能包含的位置信息
-                    if bio and len(bio) > 5:
-                        bio_weight = weight * 0.5  # 简介信息的权重较低
-                        logger.info(f"分析关注者 '{follower_name}' 的简介信息")
-                        
-                        # 简单的位置关键词检测
-                        location_keywords = {
-                            "China": "CN", "中国": "CN", "Beijing": "CN", "Shanghai": "CN", "Shenzhen": "CN",
-                            "USA": "US", "United States": "US", "America": "US", "New York": "US", "California": "US",
-                            "Japan": "JP", "Tokyo": "JP", "日本": "JP",
-                            "Korea": "KR", "韩国": "KR", "Seoul": "KR",
-                            "India": "IN", "Mumbai": "IN", "Delhi": "IN",
-                            "UK": "GB", "United Kingdom": "GB", "London": "GB", "England": "GB",
-                            "Germany": "DE", "Berlin": "DE", "德国": "DE",
-                            "France": "FR", "Paris": "FR", "法国": "FR",
-                            "Russia": "RU", "Moscow": "RU", "俄罗斯": "RU",
-                            "Canada": "CA", "Toronto": "CA", "Vancouver": "CA",
-                            "Australia": "AU", "Sydney": "AU", "Melbourne": "AU"
-                        }
-                        
-                        for keyword, country_code in location_keywords.items():
-                            if keyword.lower() in bio.lower():
-                                logger.info(f"在关注者 '{follower_name}' 的简介中发现位置关键词: {keyword} -> {country_code}")
-                                location_name = f"bio:{country_code}"
-                                if location_name in location_weights:
-                                    location_weights[location_name] += bio_weight
-                                else:
-                                    location_weights[location_name] = bio_weight
-                                break
-                
-                # 如果是互相关注，记录下来进行下一层递归分析
-                if is_mutual and current_depth < max_depth:
-                    mutual_followers.append(follower_name)
-                    
-            except Exception as e:
-                logger.warning(f"处理关注者 '{follower_name}' 时发生错误: {str(e)}")
+    visited = {username.lower()}  # 记录已处理的用户，避免重复处理
+    # (负优先级, 入队序号, 登录名, 深度, 入队时是否已在图中)
+    heap = [(-float("inf"), 0, username, 0, social_graph_store.is_fresh(username, "follower"))]
+    sequence = 1
+    while heap:
+        if budget.exhausted():
+            logger.info(f"社交网络爬取预算用完({budget.stopped_by})，剩余 {len(heap)} 个候选未展开")
+            break
+
+        # 取出本批节点：图中已有的节点不花请求，不占批次名额；
+        # 队首节点需要请求而剩余请求数不够展开一个节点时停止
+        limit = budget.batch_size()
+        batch, stale = [], []
+        while heap:
+            is_fresh = heap[0][4]
+            if not is_fresh and len(stale) >= limit:
+                break
+            _, _, node, depth, _ = heapq.heappop(heap)
+            batch.append((node, depth))
+            if not is_fresh:
+                stale.append(node)
+        if not batch:
+            budget.stopped_by = "calls"
+            logger.info(f"剩余请求数不足以展开下一个节点，剩余 {len(heap)} 个候选未展开")
+            break
+
+        try:
+            unfinished = _crawl_nodes(stale, budget, logger) if stale else []
+        except CircuitOpenError:
+            raise
+        except requests.exceptions.RequestException as e:
+            logger.error(f"分析用户 '{username}' 的社交网络时发生网络错误: {str(e)}")
+            break
+        except Exception as e:
+            logger.error(f"分析用户 '{username}' 的社交网络时发生错误: {str(e)}")
+            break
+
+        for node, depth in batch:
+            if node in unfinished:
+                # 截止时间前没有爬完，放回队列计入未展开的候选
+                heapq.heappush(heap, (-_expansion_priority(depth, False, False, None), sequence, node, depth, False))
+                sequence += 1
                 continue
-        
-        # 对互相关注的用户进行下一层级分析
-        for mutual_follower in mutual_followers[:min(5, len(mutual_followers))]:  # 限制递归分析的用户数量
-            _analyze_network_level(mutual_follower, location_weights, processed_users, 
-                                  current_depth + 1, max_depth, logger)
-                
-    except requests.exceptions.RequestException as e:
-        logger.error(f"分析用户 '{username}' 的社交网络层级 {current_depth} 时发生网络错误: {str(e)}")
-    except Exception as e:
-        logger.error(f"分析用户 '{username}' 的社交网络层级 {current_depth} 时发生错误: {str(e)}")
+            budget.nodes_expanded += 1
+            for priority, follower, follower_depth, is_fresh in _claim_candidates(node, depth, max_depth, visited):
+                heapq.heappush(heap, (-priority, sequence, follower, follower_depth, is_fresh))
+                sequence += 1
+    budget.nodes_pending = len(heap)
@@ -0,0 +1,125 @@
+import logging
+
+import numpy as np
+
+from config import TIMEZONE_MAX_CONFIDENCE, TIMEZONE_MIN_EVENTS
+from contribution_analysis import refresh_user_event_cursor
+
+logger = logging.getLogger(__name__)
+
+# 开发者在本地时间各小时的典型活跃度（0 点到 23 点）：凌晨最低，上午和下午两个高峰，晚上还有一段活跃
+LOCAL_ACTIVITY_TEMPLATE = np.array([
+    0.35, 0.20, 0.10, 0.05, 0.03, 0.03, 0.05, 0.15, 0.35, 0.60, 0.80, 0.85,
+    0.70, 0.75, 0.85, 0.90, 0.90, 0.80, 0.65, 0.60, 0.65, 0.70, 0.65, 0.50,
+])
+
+# 候选的 UTC 偏移（小时）
+CANDIDATE_OFFSETS = np.arange(-12, 15)
+
+# 每个候选 UTC 偏移覆盖的地区，以及映射到的国家：只有该偏移下开发者明显集中于一个国家时才给出。
+# 国家为 None 的偏移要么开发者很少，要么被多个体量相近的国家共用（如 UTC+2 的东欧 / 南非 / 以色列），不做推测。
+OFFSET_REGIONS = {
+    -12: ("贝克岛等无人岛", None),
+    -11: ("美属萨摩亚", None),
+    -10: ("夏威夷", None),
+    -9: ("阿拉斯加", None),
+    -8: ("美国太平洋时区", "US"),
+    -7: ("美国山地时区 / 太平洋夏令时", "US"),
+    -6: ("美国中部时区 / 墨西哥", "US"),
+    -5: ("美国东部时区 / 加拿大东部 / 哥伦比亚", "US"),
+    -4: ("美国东部夏令时 / 加勒比", "US"),
+    -3: ("巴西 / 阿根廷", "BR"),
+    -2: ("大西洋中部", None),
+    -1: ("亚速尔群岛 / 佛得角", None),
+    0: ("英国 / 葡萄牙 / 西非", "GB"),
+    1: ("中欧（德国、法国、荷兰等）", "DE"),
+    2: ("东欧 / 中欧夏令时 / 南非 / 以色列", None),
+    3: ("莫斯科 / 土耳其 / 东非", "RU"),
+    4: ("海湾国家 / 高加索", None),
+    5: ("巴基斯坦 / 印度", "IN"),  # 印度为 UTC+5:30，整点偏移拟合时落在 +5 和 +6 两侧
+    6: ("孟加拉 / 印度", "IN"),
+    7: ("越南 / 泰国 / 印尼西部", None),
+    8: ("中国 / 新加坡 / 台湾 / 菲律宾", "CN"),
+    9: ("日本 / 韩国", "JP"),
+    10: ("澳大利亚东部", "AU"),
+    11: ("所罗门群岛 / 澳大利亚东部夏令时", None),
+    12: ("新西兰", None),
+    13: ("新西兰夏令时 / 汤加", None),
+    14: ("莱恩群岛", None),
+}
+
+# UTC 偏移到国家代码，只包含 OFFSET_REGIONS 中给出国家的偏移
+OFFSET_COUNTRY_MAP = {offset: country for offset, (_, country) in OFFSET_REGIONS.items() if country}
+
+
+def activity_histogram(timestamps, utc_offset=0):
+    """
+    由 ISO 8601 时间戳（如 2024-05-01T13:45:00Z）计算活跃度直方图，
+    返回 (按小时的 24 维数组, 按星期的 7 维数组，周一为 0)。
+    utc_offset 为 0 时按 UTC 统计；传入偏移时先换算成本地时间，跨零点的事件计入本地的那一天。
+    """
+    times = np.array([t.rstrip("Z") for t in timestamps], dtype="datetime64[s]") + np.timedelta64(utc_offset, "h")
+    days = times.astype("datetime64[D]")
+    hours = ((times - days).astype("timedelta64[h]")).astype(int)
+    # 1970-01-01 是星期四
+    weekdays = (days.astype(int) + 3) % 7
+    return np.bincount(hours, minlength=24), np.bincount(weekdays, minlength=7)
+
+
+def fit_utc_offset(hour_histogram):
+    """
+    把 UTC 小时直方图平移到每个候选时区，与典型作息模板计算余弦相似度，
+    返回 (最佳偏移, 各候选偏移的相似度数组)。
+    """
+    hist = np.asarray(hour_histogram, dtype=float)
+    # 第 i 行是 UTC 偏移为 CANDIDATE_OFFSETS[i] 时的本地时间直方图：本地 h 点对应 UTC (h - offset) 点
+    local = hist[(np.arange(24)[None, :] - CANDIDATE_OFFSETS[:, None]) % 24]
+    norms = np.linalg.norm(local, axis=1) * np.linalg.norm(LOCAL_ACTIVITY_TEMPLATE)
+    scores = local @ LOCAL_ACTIVITY_TEMPLATE / np.where(norms > 0, norms, 1)
+    return int(CANDIDATE_OFFSETS[np.argmax(scores)]), scores
+
+
+def analyze_timezone(username, event_times=None):
+    """
+    根据开发者事件的时间分布推测其所在时区。
+    默认使用贡献分析已经采集并保存在事件游标中的事件时间，已是最新时只需一次条件请求。
+    事件过少时返回 None。
+    """
+    if event_times is None:
+        event_times = refresh_user_event_cursor(username)["event_times"]
+    if len(event_times) < TIMEZONE_MIN_EVENTS:
+        logger.info(f"用户 '{username}' 的事件数 {len(event_times)} 不足 {TIMEZONE_MIN_EVENTS}，跳过时区分析")
+        return None
+
+    utc_hours, _ = activity_histogram(event_times)
+    offset, scores = fit_utc_offset(utc_hours)
+    # 星期分布在本地时间下统计：UTC+8 开发者周一上午的活动在 UTC 下落在周日
+    local_hours, weekday_histogram = activity_histogram(event_times, offset)
+
+    # 置信度 = TIMEZONE_MAX_CONFIDENCE × 样本因子 × 突出度因子：
+    # - 样本因子：100 个事件及以上取满值，事件越少越不可信；
+    # - 突出度因子：最佳偏移的相似度高出全部候选均值 3 个标准差及以上取满值，作息模糊时趋近 0；
+    # - 上限 TIMEZONE_MAX_CONFIDENCE（0.35）：时区只能确定一条经度带，同一偏移下常有多个国家，
+    #   还受夜猫子作息和夏令时影响，所以拟合再好也远低于个人资料的 0.9，不能单独压过用户自己声明的位置。
+    best = scores.max()
+    spread = scores.std()
+    sharpness = (best - scores.mean()) / spread if spread > 0 else 0.0
+    sample_factor = min(1.0, len(event_times) / 100)
+    confidence = round(float(TIMEZONE_MAX_CONFIDENCE * sample_factor * min(1.0, sharpness / 3)), 4)
+
+    result = {
+        "commit_timezone": f"UTC{offset:+d}",
+        "utc_offset": offset,
+        "fit_score": round(float(best), 4),
+        "confidence": confidence,
+        "event_count": len(event_times),
+        "country": OFFSET_COUNTRY_MAP.get(offset),
+        "region": OFFSET_REGIONS[offset][0],
+        "activity_patterns": {
+            "local_hourly": local_hours.tolist(),
+            "weekday": weekday_histogram.tolist(),
+        },
+    }
+    logger.info(f"用户 '{username}' 的活跃时间拟合时区: {result['commit_timezone']}, "
+                f"拟合度: {result['fit_score']}, 置信度: {confidence}, 对应国家: {result['country']}")
+    return result
@@ -0,0 +1,118 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import GITHUB_CACHE_DIR, USER_LOCATION_TTL
+from github_client import github_client
+
+logger = logging.getLogger(__name__)
+
+
+class UserLocationStore:
+    """
+    GitHub 用户的 location / bio 持久化缓存（登录名 -> (location, bio, fetched_at)），带 TTL。
+    同一批活跃的关注者、贡献者会反复出现在不同开发者的社交网络里，跨开发者共用后不必重复请求 /users/{login}。
+    不存在的用户也会记录（location、bio 为空），避免反复请求 404。
+    """
+
+    def __init__(self, db_path, ttl):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def _conn(self):
+        """第一次使用时才创建目录和数据库，导入模块不会在磁盘上留下文件"""
+        if self._connection is None:
+            with self._open_lock:
+                if self._connection is None:
+                    os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+                    conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                    with conn:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS user_location ("
+                            "login TEXT PRIMARY KEY, location TEXT, bio TEXT, fetched_at REAL)"
+                        )
+                    self._connection = conn
+        return self._connection
+
+    def get_many(self, logins):
+        """返回 {登录名: {"location", "bio"}}，只包含未过期的条目"""
+        keys = {login.lower(): login for login in logins}
+        rows = []
+        key_list = list(keys)
+        # 分批查询，避免超过 SQLite 单条语句的参数个数上限
+        for start in range(0, len(key_list), 500):
+            batch = key_list[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows.extend(self._conn.execute(
+                    f"SELECT login, location, bio, fetched_at FROM user_location WHERE login IN ({placeholders})",
+                    batch
+                ).fetchall())
+        fresh_after = time.time() - self.ttl
+        return {
+            keys[login]: {"location": location, "bio": bio}
+            for login, location, bio, fetched_at in rows
+            if fetched_at >= fresh_after
+        }
+
+    def put_many(self, records):
+        """写入 {登录名: {"location", "bio"}}"""
+        if not records:
+            return
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO user_location (login, location, bio, fetched_at) VALUES (?, ?, ?, ?)",
+                    [(login.lower(), record.get("location"), record.get("bio"), now)
+                     for login, record in records.items()]
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"写入用户位置缓存失败: {str(e)}")
+
+
+user_location_store = UserLocationStore(os.path.join(GITHUB_CACHE_DIR, "locations.sqlite3"), USER_LOCATION_TTL)
+
+
+def remember_user_location(profile_data):
+    """顺带缓存已经拿到的用户资料中的 location / bio"""
+    login = profile_data.get("login") if profile_data else None
+    if login:
+        user_location_store.put_many({login: {"location": profile_data.get("location"),
+                                              "bio": profile_data.get("bio")}})
+
+
+def get_user_locations(logins, max_workers=None):
+    """
+    获取一组用户的 location / bio，返回 {登录名: {"location", "bio"}}，按输入顺序。
+    先读持久化缓存，未命中的用户再并发请求 /users/{login} 并写回缓存；请求失败（非 404）的用户不出现在结果中。
+    """
+    logins = list(dict.fromkeys(logins))
+    cached = user_location_store.get_many(logins)
+    missing = [login for login in logins if login not in cached]
+    if logins:
+        logger.info(f"用户位置缓存命中 {len(cached)}/{len(logins)}")
+
+    fetched = {}
+    if missing:
+        kwargs = {"max_workers": max_workers} if max_workers else {}
+        responses = github_client.get_many((f"https://api.github.com/users/{login}" for login in missing), **kwargs)
+        for login, response in zip(missing, responses):
+            if response.status_code == 200:
+                data = response.json()
+                fetched[login] = {"location": data.get("location"), "bio": data.get("bio")}
+            elif response.status_code == 404:
+                fetched[login] = {"location": None, "bio": None}
+        user_location_store.put_many(fetched)
+
+    return {
+        login: cached.get(login) or fetched[login]
+        for login in logins
+        if login in cached or login in fetched
+    }
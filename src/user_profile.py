@@ -1,9 +1,33 @@
+import asyncio
 from collections import Counter
 import logging
+import random
 
 import requests
-from config import headers
- 
+from async_github_client import NETWORK_ERRORS
+from circuit_breaker import CircuitOpenError
+from config import FOLLOW_LIST_MAX_ITEMS, GITHUB_PAGINATION_WORKERS, NATION_DETECT_SAMPLE_SIZE, NATION_DETECT_SAMPLING
+from github_client import GraphQLError, github_client, last_page_number, max_pages_for
+from user_location import get_user_locations, remember_user_location
+
+
+def _build_profile(profile_data):
+    """把 /users/{username} 的返回值整理成统一的个人资料结构"""
+    return {
+        "用户名": profile_data.get("login"),
+        "全名": profile_data.get("name"),
+        "公司": profile_data.get("company"),
+        "博客": profile_data.get("blog"),
+        "国家": profile_data.get("location"),
+        "邮箱": profile_data.get("email"),
+        "简介": profile_data.get("bio"),
+        "公开仓库数": profile_data.get("public_repos"),
+        "关注者数": profile_data.get("followers"),
+        "关注中": profile_data.get("following"),
+        "GitHub 个人主页": profile_data.get("html_url")
+    }
+
+
 def get_user_profile(username):
     """
     获取用户的个人资料信息
@@ -13,7 +37,7 @@ def get_user_profile(username):
 
     url = f"https://api.github.com/users/{username}"
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = github_client.get(url)
 
         if response.status_code != 200:
             logger.warning(f"请求用户资料失败，状态码: {response.status_code}, 用户名: '{username}'")
@@ -21,153 +45,312 @@ def get_user_profile(username):
             return None
 
         profile_data = response.json()
-        profile = {
-            "用户名": profile_data.get("login"),
-            "全名": profile_data.get("name"),
-            "公司": profile_data.get("company"),
-            "博客": profile_data.get("blog"),
-            "国家": profile_data.get("location"),
-            "邮箱": profile_data.get("email"),
-            "简介": profile_data.get("bio"),
-            "公开仓库数": profile_data.get("public_repos"),
-            "关注者数": profile_data.get("followers"),
-            "关注中": profile_data.get("following"),
-            "GitHub 个人主页": profile_data.get("html_url")
-        }
+        remember_user_location(profile_data)
+        profile = _build_profile(profile_data)
         logger.info(f"成功获取用户 '{username}' 的个人资料")
         return profile
+    except CircuitOpenError:
+        # 熔断交给调用方处理（阶段图据此标记降级），不当作“没有资料”
+        raise
     except requests.exceptions.RequestException as e:
         logger.error(f"请求用户 '{username}' 资料时发生网络错误: {str(e)}")
         return None
-    except Exception as e:
-        logger.error(f"获取用户 '{username}' 资料时发生错误: {str(e)}")
-        return None    
 
 
-def get_user_total_stars(username):
+def get_user_total_stars(username, snapshot=None):
     """
     获取用户的所有仓库的总 Star 数（包括用户作为 Owner 和 Member 的仓库）。
+    传入 RepoSnapshot 时直接从快照中汇总，不再发起请求。
     """
+    if snapshot is not None:
+        return snapshot.total_stars
 
     total_stars = 0
 
     # 遍历仓库类型（Owner 和 Member）
     for repo_type in ["owner", "member"]:
-        page = 1
-        while True:
-            url = f"https://api.github.com/users/{username}/repos?page={page}&per_page=100&type={repo_type}"
-            response = requests.get(url, headers=headers)
+        url = f"https://api.github.com/users/{username}/repos"
+        # 累加每个仓库的 star 数
+        for repo in github_client.paginate(url, params={"type": repo_type}):
+            total_stars += repo.get("stargazers_count", 0)
+
+    return total_stars
+
+
+# GraphQL 一次最多返回 100 个仓库，连同 topics 和各语言字节数，替代 REST 的分页 + 每仓库一次 languages_url 请求
+REPOS_GRAPHQL_QUERY = """
+query($login: String!, $ownerAffiliations: [RepositoryAffiliation], $cursor: String) {
+  user(login: $login) {
+    repositories(first: 100, after: $cursor, ownerAffiliations: $ownerAffiliations) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        description
+        stargazerCount
+        forkCount
+        url
+        pushedAt
+        repositoryTopics(first: 20) { nodes { topic { name } } }
+        languages(first: 100, orderBy: {field: SIZE, direction: DESC}) { edges { size node { name } } }
+      }
+    }
+  }
+}
+"""
+
+# REST 的 type=owner / type=member 对应的 GraphQL ownerAffiliations
+GRAPHQL_REPO_AFFILIATIONS = {
+    "owner": ["OWNER"],
+    "member": ["COLLABORATOR", "ORGANIZATION_MEMBER"],
+}
+
+
+def _build_repo_record(name, description, star_count, fork_count, repo_type, html_url, topics, language_detail,
+                       pushed_at=None):
+    """构造统一的仓库记录，REST 和 GraphQL 两条路径输出相同的结构；pushed_at 为 ISO 8601 时间字符串"""
+    return {
+        "repo_name": name,
+        "repo_description": description,
+        "Star": star_count,
+        "Fork": fork_count,
+        "repo_type": repo_type,
+        "html_url": html_url or "",
+        "repo_topics": topics or [],
+        "repo_languages": list(language_detail.keys()),
+        "language_detail": language_detail,
+        "pushed_at": pushed_at
+    }
+
+
+def get_user_repos(username):
+    """
+    获取用户的仓库信息（包括用户作为 Owner 和 Member 的仓库），并统计总的 Star 数和 Fork 数。
+    有令牌时优先走 GraphQL 批量查询，失败时回退到 REST。
+    """
+    if github_client.can_use_graphql:
+        try:
+            return _get_user_repos_graphql(username)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"GraphQL 获取用户 '{username}' 的仓库失败，回退到 REST: {str(e)}")
+    return _get_user_repos_rest(username)
 
-            if response.status_code != 200:
-                print(f"请求 {repo_type} 仓库失败，状态码: {response.status_code}")
-                break
 
-            data = response.json()
-            if not data:
+def _parse_graphql_repo_page(connection, repo_type):
+    """解析一页 GraphQL 仓库数据，返回 (仓库记录列表, 下一页游标)；没有下一页时游标为 None"""
+    repos = []
+    for node in connection["nodes"]:
+        language_detail = {
+            edge["node"]["name"]: edge["size"]
+            for edge in (node.get("languages") or {}).get("edges", [])
+        }
+        topics = [
+            t["topic"]["name"]
+            for t in (node.get("repositoryTopics") or {}).get("nodes", [])
+        ]
+        repos.append(_build_repo_record(
+            node.get("name"),
+            node.get("description"),
+            node.get("stargazerCount", 0),
+            node.get("forkCount", 0),
+            repo_type,
+            node.get("url"),
+            topics,
+            language_detail,
+            node.get("pushedAt")
+        ))
+    page_info = connection["pageInfo"]
+    return repos, (page_info["endCursor"] if page_info["hasNextPage"] else None)
+
+
+def _build_rest_repo_record(repo, repo_type, language_detail):
+    """由 REST 仓库对象和 languages_url 的结果构造仓库记录"""
+    return _build_repo_record(
+        repo.get("name"),
+        repo.get("description"),
+        repo.get("stargazers_count", 0),
+        repo.get("forks_count", 0),
+        repo_type,
+        repo.get("html_url", ""),
+        repo.get("topics", []),
+        language_detail,
+        repo.get("pushed_at")
+    )
+
+
+def _graphql_repo_pages(username):
+    """
+    GraphQL 获取全部仓库的分页流程，同步和异步路径共用：每次 yield 一页查询的变量，
+    由调用方执行查询后把 data send 回来；结束时通过 StopIteration.value 返回仓库列表。
+    """
+    repos = []
+    for repo_type, affiliations in GRAPHQL_REPO_AFFILIATIONS.items():
+        cursor = None
+        while True:
+            data = yield {
+                "login": username,
+                "ownerAffiliations": affiliations,
+                "cursor": cursor,
+            }
+            user = data.get("user")
+            if not user:
+                raise GraphQLError(f"GraphQL 未找到用户 '{username}'")
+            page_repos, cursor = _parse_graphql_repo_page(user["repositories"], repo_type)
+            repos.extend(page_repos)
+            if cursor is None:
                 break
+    return repos
+
 
-            # 累加每个仓库的 star 数
-            for repo in data:
-                total_stars += repo.get("stargazers_count", 0)
+def _get_user_repos_graphql(username):
+    """通过 GraphQL 获取仓库信息，每次查询最多 100 个仓库（含语言字节数）"""
+    pages = _graphql_repo_pages(username)
+    try:
+        variables = next(pages)
+        while True:
+            variables = pages.send(github_client.graphql(REPOS_GRAPHQL_QUERY, variables))
+    except StopIteration as stop:
+        return stop.value
 
-            page += 1
 
-    return total_stars
+async def _get_user_repos_graphql_async(username, client):
+    """_get_user_repos_graphql 的异步版本"""
+    pages = _graphql_repo_pages(username)
+    try:
+        variables = next(pages)
+        while True:
+            variables = pages.send(await client.graphql(REPOS_GRAPHQL_QUERY, variables))
+    except StopIteration as stop:
+        return stop.value
 
 
-def get_user_repos(username):
+def _get_user_repos_rest(username):
     """
-    获取用户的仓库信息（包括用户作为 Owner 和 Member 的仓库），并统计总的 Star 数和 Fork 数
+    通过 REST 分页获取仓库信息，每个仓库额外请求一次 languages_url。
+    每到一页就用有界线程池并发请求这一页各仓库的 languages_url，结果按仓库顺序合并。
     """
 
     repos = []
-    total_stars = 0
-    total_forks = 0
 
     # 遍历仓库类型（Owner 和 Member）
     for repo_type in ["owner", "member"]:
-        page = 1
-        while True:
-            url = f"https://api.github.com/users/{username}/repos?page={page}&per_page=100&type={repo_type}"
-            response = requests.get(url, headers=headers)
+        url = f"https://api.github.com/users/{username}/repos"
+        for page in github_client.paginate_pages(url, params={"type": repo_type}):
+            repos.extend(_with_language_detail(page, repo_type))
 
-            if response.status_code != 200:
-                print(f"请求 {repo_type} 仓库失败，状态码: {response.status_code}")
-                break
+    return repos
 
-            data = response.json()
-            if not data:
-                break
 
-            for repo in data:
-                star_count = repo.get("stargazers_count", 0)
-                fork_count = repo.get("forks_count", 0)
-                total_stars += star_count
-                total_forks += fork_count
-                langs_url = repo.get("languages_url")
-                language_detail = {}
-                langs_resp = requests.get(langs_url, headers=headers)
-                if langs_resp.status_code == 200:
-                    language_detail = langs_resp.json()
-                repos.append({
-                    "repo_name": repo.get("name"),
-                    "repo_description": repo.get("description"),
-                    "Star": star_count,
-                    "Fork": fork_count,
-                    "repo_type": repo_type,
-                    "html_url": repo.get("html_url", ""),
-                    "repo_topics": repo.get("topics", []),
-                    "repo_languages": list(language_detail.keys()),
-                    "language_detail": language_detail
-                })
-
-            page += 1
 
-    return repos
+def _with_language_detail(page, repo_type):
+    """并发请求一批 REST 仓库的 languages_url，按原顺序构造仓库记录"""
+    langs_responses = github_client.get_many(repo.get("languages_url") for repo in page)
+    for repo, langs_resp in zip(page, langs_responses):
+        language_detail = langs_resp.json() if langs_resp.status_code == 200 else {}
+        yield _build_rest_repo_record(repo, repo_type, language_detail)
 
 
-def get_all_users(url):
-    """ 通过分页获取 GitHub API 返回的所有用户数据 """
-    users = []
-    page = 1
-    while True:
-        paginated_url = f"{url}?page={page}&per_page=100"
-        response = requests.get(paginated_url, headers=headers)
+# ——— 异步版本：供 main.py 中的并发采集流水线在同一个事件循环里 await ———
 
+async def get_user_profile_async(username, client):
+    """get_user_profile 的异步版本，client 为 AsyncGitHubClient"""
+    logger = logging.getLogger(__name__)
+    try:
+        response = await client.get(f"https://api.github.com/users/{username}")
         if response.status_code != 200:
-            break
+            logger.warning(f"请求用户资料失败，状态码: {response.status_code}, 用户名: '{username}'")
+            return None
+        profile_data = response.json()
+        remember_user_location(profile_data)
+        return _build_profile(profile_data)
+    except NETWORK_ERRORS as e:
+        logger.error(f"请求用户 '{username}' 资料时发生网络错误: {str(e)}")
+        return None
+
 
-        data = response.json()
-        if not data:
-            break  # 数据为空，说明已获取完所有用户
+async def get_user_repos_async(username, client):
+    """get_user_repos 的异步版本：优先 GraphQL，REST 回退时并发请求各仓库的 languages_url"""
+    if client.can_use_graphql:
+        try:
+            return await _get_user_repos_graphql_async(username, client)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"GraphQL 获取用户 '{username}' 的仓库失败，回退到 REST: {str(e)}")
 
-        users.extend(data)
-        page += 1  # 进入下一页
+    async def language_detail_of(repo):
+        resp = await client.get(repo.get("languages_url"))
+        return resp.json() if resp.status_code == 200 else {}
 
-    return users
+    repos = []
+    for repo_type in ["owner", "member"]:
+        url = f"https://api.github.com/users/{username}/repos"
+        async for data in client.paginate_pages(url, params={"type": repo_type}):
+            details = await asyncio.gather(*(language_detail_of(repo) for repo in data))
+            repos.extend(
+                _build_rest_repo_record(repo, repo_type, detail)
+                for repo, detail in zip(data, details)
+            )
+    return repos
 
 
-def get_user_mutual_followers(username):
-    """ 获取某个 GitHub 用户的互相关注列表 """
+def iter_user_logins(url, max_items=FOLLOW_LIST_MAX_ITEMS, sampling="recent", per_page=100,
+                     max_workers=GITHUB_PAGINATION_WORKERS):
+    """
+    流式产出 followers / following 等用户列表接口中的 login，只保留登录名，不在内存中保存完整的用户对象。
+    sampling="recent"：按 GitHub 返回顺序（最近关注的在前）产出前 max_items 个；
+    sampling="random"：读第 1 页的 Link 头得到总页数后随机挑选若干页，再从中随机抽取 max_items 个，
+    请求数约为 max_items / per_page + 1，与列表总长度无关。
+    max_workers 为同时请求的页数，已在线程池中调用时传 1 逐页读取，避免线程池嵌套。
+    """
+    if sampling == "recent":
+        for user in github_client.paginate(url, per_page=per_page, max_items=max_items, max_workers=max_workers):
+            yield user["login"]
+        return
+    if sampling != "random":
+        raise ValueError(f"不支持的抽样方式: {sampling}")
+
+    first = github_client.get(url, params={"per_page": per_page, "page": 1})
+    if first.status_code != 200:
+        logging.getLogger(__name__).warning(f"请求用户列表失败，状态码: {first.status_code}, URL: {url}")
+        return
+    last_page = last_page_number(first.headers.get("Link"))
+    if not max_items or last_page * per_page <= max_items:
+        # 列表本身不超过上限，全部读取即可
+        for user in github_client.paginate(url, per_page=per_page, max_items=max_items, max_workers=max_workers):
+            yield user["login"]
+        return
+
+    # 多抽一页，补偿最后一页可能不满
+    pages = sorted(random.sample(range(1, last_page + 1), min(last_page, max_pages_for(max_items, per_page) + 1)))
+    responses = github_client.get_many(
+        (github_client.build_url(url, {"per_page": per_page, "page": page}) for page in pages if page != 1),
+        max_workers=max_workers
+    )
+    if 1 in pages:
+        responses.insert(0, first)
+    logins = [user["login"] for response in responses if response.status_code == 200 for user in response.json()]
+    yield from random.sample(logins, min(max_items, len(logins)))
+
+
+def get_user_mutual_followers(username, max_items=FOLLOW_LIST_MAX_ITEMS):
+    """ 获取某个 GitHub 用户的互相关注列表；关注者和关注中各最多读取 max_items 个 """
     followers_url = f"https://api.github.com/users/{username}/followers"
     following_url = f"https://api.github.com/users/{username}/following"
 
-    followers = get_all_users(followers_url)  # 获取所有关注者
-    following = get_all_users(following_url)  # 获取所有关注的人
-
-    # 将 followers 和 following 的 login 名称存入集合，方便快速查找
-    followers_set = {user['login'] for user in followers}
-    following_set = {user['login'] for user in following}
+    # 关注中的人通常远少于关注者，先把它读成集合，再流式比对关注者
+    following_set = set(iter_user_logins(following_url, max_items))
+    return [login for login in iter_user_logins(followers_url, max_items) if login in following_set]
 
-    # 计算交集，得到互相关注者
-    if len(followers) <= len(following):
-      following_set = {user['login'] for user in following}
-      mutual_followers = [user['login'] for user in followers if user['login'] in following_set]
-    else:
-      followers_set = {user['login'] for user in followers}
-      mutual_followers = [user['login'] for user in following if user['login'] in followers_set]
 
-    return mutual_followers
+def _sample_locations(logins, sample_size):
+    """随机抽取最多 sample_size 个用户，获取位置（先读持久化缓存，未命中的并发请求），返回其中有效的位置信息"""
+    logins = list(logins)
+    if len(logins) > sample_size:
+        logins = random.sample(logins, sample_size)
+    locations = []
+    for record in get_user_locations(logins).values():
+        location = record.get("location")
+        if location and not any(char in location for char in ['#', '%', '&', '*', '乱码']):
+            locations.append(location)
+    return locations
 
 
 # TODO: 可以修改成根据分析相互关注者来推测用户国家
@@ -177,7 +360,7 @@ def get_user_profile_nation_detect(username):
     """
     # 获取用户的个人资料
     url = f"https://api.github.com/users/{username}"
-    response = requests.get(url, headers=headers)
+    response = github_client.get(url)
 
     if response.status_code != 200:
         print(f"请求用户资料失败，状态码: {response.status_code}")
@@ -205,33 +388,16 @@ def get_user_profile_nation_detect(username):
     }
 
     if location == "Unknown":
+        # 在有界的样本上统计：每类最多查看 NATION_DETECT_SAMPLE_SIZE 个用户的资料，请求数与关注者总数无关
         # 获取互相关注用户的国家信息
-        mutual_follow_nations = []
-        mutual_followers = get_user_mutual_followers(username)
-
-        for follower_name in mutual_followers:
-            follower_profile_url = f"https://api.github.com/users/{follower_name}"
-            follower_profile_response = requests.get(follower_profile_url, headers=headers)
-
-            if follower_profile_response.status_code == 200:
-                follower_data = follower_profile_response.json()
-                follower_location = follower_data.get("location")
-                if follower_location and not any(
-                        char in follower_location for char in ['#', '%', '&', '*', '乱码']):
-                    mutual_follow_nations.append(follower_location)
+        mutual_follow_nations = _sample_locations(get_user_mutual_followers(username), NATION_DETECT_SAMPLE_SIZE)
 
         # 获取"关注中"用户的国家信息
-        following_nations = []
-        following_users = get_all_users(f"https://api.github.com/users/{username}/following")
-
-        for user in following_users:
-            user_url = user.get("url")  # 获取每个用户的详细资料 URL
-            user_response = requests.get(user_url, headers=headers)
-            if user_response.status_code == 200:
-                user_data = user_response.json()
-                user_location = user_data.get("location")
-                if user_location and not any(char in user_location for char in ['#', '%', '&', '*', '乱码']):
-                    following_nations.append(user_location)
+        following_nations = _sample_locations(
+            iter_user_logins(f"https://api.github.com/users/{username}/following",
+                             NATION_DETECT_SAMPLE_SIZE, sampling=NATION_DETECT_SAMPLING),
+            NATION_DETECT_SAMPLE_SIZE
+        )
 
         # 统计出现最多的国家
         most_common_follower_nation = Counter(mutual_follow_nations).most_common(1)[0][0] if mutual_follow_nations else None
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# 测试不使用真实令牌，避免读取开发环境中的配置
+os.environ["GITHUB_TOKEN"] = ""
+os.environ["GITHUB_TOKENS"] = ""
+# 持久化缓存写到临时目录，不在工作目录下生成 github_cache/
+os.environ["GITHUB_CACHE_DIR"] = tempfile.mkdtemp(prefix="github_cache_")
+
+# src/ 下的模块之间以平铺方式导入（from config import ...），测试时把 src 加入搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
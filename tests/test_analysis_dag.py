@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from analysis_dag import StageGraph
+
+
+def _graph(calls):
+    graph = StageGraph()
+
+    @graph.stage("repos", inputs=("username",), default=[])
+    def repos(username):
+        calls.append("repos")
+        return [f"{username}/a", f"{username}/b"]
+
+    @graph.stage("count", inputs=("repos",), inline=True)
+    def count(repos):
+        calls.append("count")
+        return len(repos)
+
+    @graph.stage("names", inputs=("repos",), inline=True)
+    def names(repos):
+        calls.append("names")
+        return [name.split("/")[1] for name in repos]
+
+    @graph.stage("profile", inputs=("username",), default={"followers": 0})
+    async def profile(username):
+        calls.append("profile")
+        return {"followers": 3}
+
+    return graph
+
+
+def test_shared_input_computed_once():
+    calls = []
+    run = asyncio.run(_graph(calls).run(username="u"))
+    assert run["count"] == 2
+    assert run["names"] == ["a", "b"]
+    assert run["profile"] == {"followers": 3}
+    assert calls.count("repos") == 1
+    assert set(run.timings) == {"repos", "count", "names", "profile"}
+
+
+def test_only_requested_outputs_run():
+    calls = []
+    run = asyncio.run(_graph(calls).run(["count"], username="u"))
+    assert run["count"] == 2
+    assert "profile" not in calls and "names" not in calls
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph()
+    for name in ("a", "b", "c"):
+        graph.add(name, lambda: time.sleep(0.2) or name)
+    started = time.perf_counter()
+    asyncio.run(graph.run())
+    assert time.perf_counter() - started < 0.5
+
+
+def test_unknown_input_and_cycle_are_rejected():
+    graph = StageGraph()
+    graph.add("a", lambda b: b, inputs=("b",))
+    graph.add("b", lambda a: a, inputs=("a",))
+    with pytest.raises(ValueError):
+        asyncio.run(graph.run(["a"]))
+
+    graph = StageGraph()
+    graph.add("a", lambda missing: missing, inputs=("missing",))
+    with pytest.raises(ValueError):
+        asyncio.run(graph.run(["a"]))
+
+
+def _failing_graph():
+    graph = StageGraph()
+
+    def fail():
+        raise ConnectionError("down")
+
+    graph.add("data", fail, default={"items": []})
+    graph.add("total", lambda data: len(data["items"]), inputs=("data",), inline=True)
+    return graph
+
+
+def test_degraded_stage_uses_default_and_dependants_run():
+    run = asyncio.run(_failing_graph().run(degrade_on=ConnectionError))
+    assert run["data"] == {"items": []}
+    assert run["total"] == 0
+    assert run.degraded == ["data"]
+
+
+def test_degraded_default_is_not_shared_between_runs():
+    graph = _failing_graph()
+    first = asyncio.run(graph.run(degrade_on=ConnectionError))
+    first["data"]["items"].append("leaked")
+    first["data"]["degraded"] = True
+
+    second = asyncio.run(graph.run(degrade_on=ConnectionError))
+    assert second["data"] == {"items": []}
+    assert graph.stages["data"].default == {"items": []}
+
+
+def test_other_errors_propagate():
+    with pytest.raises(ConnectionError):
+        asyncio.run(_failing_graph().run(degrade_on=TimeoutError))
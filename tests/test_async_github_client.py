@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+from async_github_client import AsyncGitHubClient, AsyncResponse
+from github_client import GitHubClient
+
+URL = "https://api.github.com/users/ghost"
+
+
+class ThreadRecorder:
+    """记录每个方法在哪个线程上被调用"""
+
+    def __init__(self):
+        self.threads = {}
+
+    def _record(self, name):
+        self.threads[name] = threading.get_ident()
+
+
+class FakeETagCache(ThreadRecorder):
+    def conditional_headers(self, url):
+        self._record("conditional_headers")
+        return {}
+
+    def store(self, url, response):
+        self._record("store")
+
+
+class FakeNegativeCache(ThreadRecorder):
+    def get(self, key):
+        self._record("negative_get")
+        return None
+
+    def mark(self, key, status, body):
+        self._record("mark")
+
+
+def test_cache_io_runs_off_the_event_loop_thread():
+    sync_client = GitHubClient(tokens=[None])
+    sync_client.cache = FakeETagCache()
+    sync_client.negative_cache = FakeNegativeCache()
+    client = AsyncGitHubClient(sync_client=sync_client)
+
+    async def send(method, full_url, **kwargs):
+        return AsyncResponse(404, {}, b'{"message": "Not Found"}', full_url)
+
+    client._send = send
+
+    async def run():
+        loop_thread = threading.get_ident()
+        response = await client._get(URL)
+        return loop_thread, response
+
+    loop_thread, response = asyncio.run(run())
+    assert response.status_code == 404
+    threads = {**sync_client.cache.threads, **sync_client.negative_cache.threads}
+    assert set(threads) == {"conditional_headers", "negative_get", "mark", "store"}
+    assert loop_thread not in threads.values()
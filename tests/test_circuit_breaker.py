@@ -0,0 +1,105 @@
+import types
+
+import pytest
+import requests
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的时钟"""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _opened(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=10)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = _opened(clock)
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_admits_a_single_probe(clock):
+    breaker = _opened(clock)
+    clock[0] += 10
+    assert not breaker.is_open
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _opened(clock)
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_lost_probe_is_replaced_after_timeout(clock):
+    breaker = _opened(clock)
+    clock[0] += 10
+    breaker.before_call()
+    # 探测调用被取消，既没有报告成功也没有报告失败
+    clock[0] += 5
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock[0] += 5
+    assert not breaker.is_open
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_call_records_outcome(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10)
+    assert breaker.call(lambda x: x + 1, 1) == 2
+
+    def unreachable():
+        raise requests.exceptions.ConnectionError("refused")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        breaker.call(unreachable)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: None)
+
+
+def test_call_ignores_errors_raised_by_a_reachable_dependency(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10)
+
+    def bad_output():
+        raise ValueError("模型输出无法解析")
+
+    with pytest.raises(ValueError):
+        breaker.call(bad_output)
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,55 @@
+import pytest
+
+import country_prediction
+from circuit_breaker import CircuitOpenError
+
+
+def _count_calls(monkeypatch, counts, name, result):
+    def fake(username, **kwargs):
+        counts[name] = counts.get(name, 0) + 1
+        return result
+    monkeypatch.setattr(country_prediction, name, fake)
+
+
+def _fake_evidence(monkeypatch, profile):
+    counts = {}
+    _count_calls(monkeypatch, counts, "get_user_profile", profile)
+    _count_calls(monkeypatch, counts, "build_repo_snapshot", object())
+    # 时区和语言文化没有结果（None）时同样只计算一次
+    _count_calls(monkeypatch, counts, "analyze_timezone", None)
+    _count_calls(monkeypatch, counts, "analyze_language_culture_hints", None)
+    _count_calls(monkeypatch, counts, "crawl_social_network", {"locations": [("Berlin", 2.0)], "budget": {}})
+    monkeypatch.setattr(country_prediction, "geocode_location", lambda location: "DE")
+    return counts
+
+
+def test_evidence_is_computed_once_per_request(monkeypatch):
+    counts = _fake_evidence(monkeypatch, {"国家": ""})
+
+    results = country_prediction.predict_developer_country("u")
+
+    assert results["prediction"]["predicted_country"] == "DE"
+    assert counts == {
+        "get_user_profile": 1, "build_repo_snapshot": 1, "analyze_timezone": 1,
+        "analyze_language_culture_hints": 1, "crawl_social_network": 1,
+    }
+
+
+def test_separate_requests_do_not_share_evidence(monkeypatch):
+    counts = _fake_evidence(monkeypatch, {"国家": "Germany"})
+
+    country_prediction.predict_country_with_confidence("u", snapshot=object())
+    country_prediction.predict_country_with_confidence("u", snapshot=object())
+    assert counts["get_user_profile"] == counts["analyze_timezone"] == 2
+
+
+def test_open_breaker_propagates_instead_of_predicting_unknown(monkeypatch):
+    counts = _fake_evidence(monkeypatch, {"国家": ""})
+
+    def unavailable(username, **kwargs):
+        raise CircuitOpenError("GitHub API", 0)
+
+    monkeypatch.setattr(country_prediction, "analyze_timezone", unavailable)
+    with pytest.raises(CircuitOpenError):
+        country_prediction.predict_developer_country("u")
+    assert "crawl_social_network" not in counts
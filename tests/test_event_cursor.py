@@ -0,0 +1,169 @@
+import asyncio
+import json
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+import contribution_analysis
+from event_cursor import EventCursorStore, empty_cursor
+from github_client import GitHubClient
+
+
+def _cursor(last_event_id, scores, etag=None):
+    return {"last_event_id": last_event_id, "etag": etag, "raw_scores": scores,
+            "event_times": ["2024-05-01T13:45:00Z"]}
+
+
+def _store(tmp_path):
+    return EventCursorStore(str(tmp_path / "events.sqlite3"))
+
+
+def test_load_unknown_user(tmp_path):
+    store = EventCursorStore(str(tmp_path / "cache" / "events.sqlite3"))
+    # 构造时不创建目录，第一次读取时才打开数据库
+    assert not (tmp_path / "cache").exists()
+    assert store.load("nobody") == empty_cursor()
+    assert (tmp_path / "cache" / "events.sqlite3").exists()
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = _store(tmp_path)
+    assert store.save("User", _cursor(5, {"a/b": 0.4, "c/d": 0.2}, '"e1"'), None)
+    loaded = store.load("user")
+    assert loaded == _cursor(5, {"a/b": 0.4, "c/d": 0.2}, '"e1"')
+    assert list(loaded["raw_scores"]) == ["a/b", "c/d"]
+
+
+def test_save_is_compare_and_set(tmp_path):
+    store = _store(tmp_path)
+    assert store.save("u", _cursor(5, {"a/b": 0.4}), None)
+    # 另一次并发分析也是从空游标开始，不能覆盖已写入的结果
+    assert not store.save("u", _cursor(5, {"a/b": 0.4}), None)
+    # 基于过期游标的写入被拒绝
+    assert not store.save("u", _cursor(9, {"a/b": 0.8}), 3)
+    assert store.save("u", _cursor(9, {"a/b": 0.8}), 5)
+    assert store.load("u")["last_event_id"] == 9
+
+
+def test_cursor_without_events_can_be_updated(tmp_path):
+    store = _store(tmp_path)
+    # 还没有任何事件的用户只记录 ETag，last_event_id 为 NULL
+    assert store.save("u", _cursor(None, {}, '"e1"'), None)
+    assert store.save("u", _cursor(3, {"a/b": 0.4}, '"e2"'), None)
+    assert store.load("u")["last_event_id"] == 3
+
+
+def test_concurrent_refresh_does_not_double_count(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    monkeypatch.setattr(contribution_analysis, "event_cursor_store", store)
+    events = [
+        {"id": "2", "type": "PushEvent", "repo": {"name": "a/b"}, "created_at": "2024-05-01T13:45:00Z"},
+        {"id": "1", "type": "IssuesEvent", "repo": {"name": "a/b"}, "created_at": "2024-05-01T12:00:00Z"},
+    ]
+    # 两次分析读到同一个旧游标，折叠同一批新事件
+    first, second = store.load("u"), store.load("u")
+    contribution_analysis._apply_new_events("u", first, events, '"e1"')
+    contribution_analysis._apply_new_events("u", second, events, '"e1"')
+
+    saved = store.load("u")
+    assert saved["last_event_id"] == 2
+    assert abs(saved["raw_scores"]["a/b"] - 0.6) < 1e-9
+
+
+EVENTS_URL = "https://api.github.com/users/u/events"
+
+
+def _event(event_id):
+    return {"id": str(event_id), "type": "PushEvent", "repo": {"name": "a/b"}, "created_at": "2024-05-01T13:45:00Z"}
+
+
+def _events_response(page, page_count, etag='"e1"'):
+    # 事件按新→旧排列：第 1 页是 id 30..21，第 3 页是 id 10..1
+    response = requests.Response()
+    response.status_code = 200
+    first_id = (page_count - page + 1) * 10
+    response._content = json.dumps([_event(i) for i in range(first_id, first_id - 10, -1)]).encode("utf-8")
+    response.headers["ETag"] = etag
+    if page == 1:
+        response.headers["Link"] = f'<{EVENTS_URL}?page={page_count}>; rel="last"'
+    return response
+
+
+class FakeEventsClient:
+    def __init__(self, page_count=3):
+        self.page_count = page_count
+        self.pages = []
+
+    def _get(self, url, params=None, use_cache=True):
+        self.pages.append(params["page"])
+        return _events_response(params["page"], self.page_count)
+
+
+def _sync_client(fake):
+    client = GitHubClient(tokens=[None])
+
+    def get(url, params=None, use_cache=True):
+        if params is None:
+            params = {key: int(value) for key, value in parse_qsl(urlsplit(url).query)}
+        return fake._get(url, params)
+
+    client.get = get
+    return client
+
+
+class FakeAsyncEventsClient(FakeEventsClient):
+    async def get(self, url, params=None, use_cache=True):
+        return self._get(url, params)
+
+
+def _fetch_both(monkeypatch, cursor):
+    sync_fake = FakeEventsClient()
+    monkeypatch.setattr(contribution_analysis, "github_client", _sync_client(sync_fake))
+    sync_result = contribution_analysis._fetch_new_events("u", cursor)
+
+    async_fake = FakeAsyncEventsClient()
+    async_result = asyncio.run(contribution_analysis._fetch_new_events_async("u", cursor, async_fake))
+    assert sync_result == async_result
+    assert sorted(sync_fake.pages) == sorted(async_fake.pages)
+    return sync_result, sync_fake.pages
+
+
+def test_first_fetch_reads_every_page(monkeypatch):
+    (events, etag), pages = _fetch_both(monkeypatch, empty_cursor())
+    assert [int(event["id"]) for event in events] == list(range(30, 0, -1))
+    assert etag == '"e1"'
+    assert sorted(pages) == [1, 2, 3]
+
+
+def test_incremental_fetch_stops_at_the_cursor(monkeypatch):
+    (events, _), pages = _fetch_both(monkeypatch, _cursor(15, {"a/b": 0.4}, '"old"'))
+    assert [int(event["id"]) for event in events] == list(range(30, 15, -1))
+    assert pages == [1, 2]
+
+    # 第 1 页 ETag 未变：没有新事件，只请求一次
+    (events, _), pages = _fetch_both(monkeypatch, _cursor(30, {"a/b": 0.4}, '"e1"'))
+    assert events == [] and pages == [1]
+
+
+def test_failed_first_page_keeps_the_cursor(monkeypatch):
+    class FailingClient:
+        def get(self, url, params=None, use_cache=True):
+            response = requests.Response()
+            response.status_code = 502
+            return response
+
+    monkeypatch.setattr(contribution_analysis, "github_client", FailingClient())
+    assert contribution_analysis._fetch_new_events("u", empty_cursor()) == (None, None)
+
+
+def test_old_scores_decay_with_event_age():
+    cursor = {"last_event_id": 1, "etag": None, "raw_scores": {"old/repo": 0.4, "stale/repo": 0.015},
+              "event_times": ["2024-01-01T00:00:00Z"]}
+    # 新事件比上一批晚一个半衰期
+    new_event = dict(_event(2), created_at="2024-03-31T00:00:00Z")
+    folded = contribution_analysis._fold_events(cursor, [new_event], '"e2"')
+    assert abs(folded["raw_scores"]["old/repo"] - 0.2) < 1e-9
+    # 衰减到下限以下的仓库被移除
+    assert "stale/repo" not in folded["raw_scores"]
+    assert abs(folded["raw_scores"]["a/b"] - 0.4) < 1e-9
+    assert folded["event_times"][0] == "2024-03-31T00:00:00Z"
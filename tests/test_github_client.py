@@ -0,0 +1,147 @@
+import json as jsonlib
+import threading
+import time
+
+import pytest
+import requests
+
+import contribution_analysis
+import user_profile
+from github_client import GitHubClient, GraphQLError, github_client
+from http_cache import build_cached_response
+from negative_cache import NegativeCache
+
+
+def test_full_url_accepts_paths_and_absolute_urls():
+    client = GitHubClient(base_url="https://api.github.com/")
+    assert client._full_url("/users/u") == "https://api.github.com/users/u"
+    assert client._full_url("users/u") == "https://api.github.com/users/u"
+    assert client._full_url("https://example.com/x") == "https://example.com/x"
+
+
+def test_session_uses_pooled_adapter_with_retries():
+    client = GitHubClient(pool_size=7, max_retries=2)
+    adapter = client.session.get_adapter("https://api.github.com/users/u")
+    assert adapter._pool_maxsize == 7
+    assert adapter.max_retries.total == 2
+    # 限流（403 / 429）交给调用方处理，不在连接层重试
+    assert 403 not in adapter.max_retries.status_forcelist
+    assert 429 not in adapter.max_retries.status_forcelist
+    assert client.session.headers["Accept"] == "application/vnd.github+json"
+
+
+def test_modules_share_one_client():
+    assert user_profile.github_client is github_client
+    assert contribution_analysis.github_client is github_client
+
+
+def _graphql_client(status, payload):
+    client = GitHubClient()
+
+    def post(url, json=None, timeout=None, **kwargs):
+        response = requests.Response()
+        response.status_code = status
+        response._content = jsonlib.dumps(payload).encode("utf-8")
+        return response
+
+    client.post = post
+    return client
+
+
+def test_graphql_returns_data():
+    assert _graphql_client(200, {"data": {"user": {"login": "u"}}}).graphql("q") == {"user": {"login": "u"}}
+
+
+def test_graphql_errors_raise():
+    with pytest.raises(GraphQLError):
+        _graphql_client(200, {"data": None, "errors": [{"message": "bad"}]}).graphql("q")
+    with pytest.raises(GraphQLError):
+        _graphql_client(502, {}).graphql("q")
+
+
+class FakeETagCache:
+    """只记录一个 URL 的 ETag，304 时返回缓存的响应体"""
+
+    def __init__(self, url, etag, body):
+        self.entries = {url: (etag, body)}
+        self.stored = []
+
+    def conditional_headers(self, url):
+        entry = self.entries.get(url)
+        return {"If-None-Match": entry[0]} if entry else {}
+
+    def build_response(self, url, response):
+        return build_cached_response(url, 200, self.entries[url][1])
+
+    def store(self, url, response):
+        self.stored.append(url)
+
+
+def _client(tmp_path, cache, responses):
+    client = GitHubClient(tokens=[None], cache=cache,
+                          negative_cache=NegativeCache(str(tmp_path / "negative.sqlite3"), ttl=3600))
+    sent = []
+
+    def send(method, url, headers=None, **kwargs):
+        sent.append(dict(headers or {}))
+        return responses.pop(0)
+
+    client._send = send
+    return client, sent
+
+
+def test_404_is_served_from_negative_cache(tmp_path):
+    url = "https://api.github.com/repos/a/b/readme"
+    client, sent = _client(tmp_path, None, [build_cached_response(url, 404, "")])
+    assert client._get(url).status_code == 404
+    assert client._get(url).status_code == 404
+    assert len(sent) == 1
+
+
+def test_etag_revalidation_runs_before_negative_cache(tmp_path):
+    url = "https://api.github.com/users/u/events?per_page=100&page=1"
+    cache = FakeETagCache(url, '"v1"', "[]")
+    client, sent = _client(tmp_path, cache, [
+        build_cached_response(url, 304, ""),
+        build_cached_response(url, 200, '[{"id": "1"}]'),
+    ])
+    # 即使负缓存里残留了这个 URL，有 ETag 条目时也要发条件请求
+    client.negative_cache.mark(url, 404, "")
+
+    assert client._get(url).json() == []
+    assert sent[0] == {"If-None-Match": '"v1"'}
+    assert client._get(url).json() == [{"id": "1"}]
+    assert len(sent) == 2
+
+
+def test_empty_list_is_not_negatively_cached(tmp_path):
+    url = "https://api.github.com/users/u/events?per_page=100&page=1"
+    client, sent = _client(tmp_path, None, [
+        build_cached_response(url, 200, "[]"),
+        build_cached_response(url, 200, '[{"id": "2"}]'),
+    ])
+    assert client._get(url).json() == []
+    assert client._get(url).json() == [{"id": "2"}]
+    assert len(sent) == 2
+
+
+
+def test_get_many_keeps_input_order_and_runs_concurrently():
+    client = GitHubClient()
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def get(url, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return url
+
+    client.get = get
+    urls = [f"https://api.github.com/repos/o/r{i}/languages" for i in range(6)]
+    assert client.get_many(urls, max_workers=3) == urls
+    assert 1 < peak[0] <= 3
+    assert client.get_many([]) == []
@@ -0,0 +1,74 @@
+import os
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from http_cache import ETagCache
+
+URL = "https://api.github.com/users/u/repos?page=1"
+
+
+def _response(status, body, headers):
+    response = requests.Response()
+    response.status_code = status
+    response.url = URL
+    response._content = body.encode("utf-8")
+    response.headers = CaseInsensitiveDict(headers)
+    return response
+
+
+def test_directory_created_on_first_store(tmp_path):
+    cache = ETagCache(str(tmp_path / "http"))
+    assert cache.get(URL) is None
+    assert not (tmp_path / "http").exists()
+    cache.store(URL, _response(200, "[1]", {"ETag": '"v1"'}))
+    assert cache.get(URL)["body"] == "[1]"
+
+
+def test_store_and_conditional_headers(tmp_path):
+    cache = ETagCache(str(tmp_path))
+    assert cache.conditional_headers(URL) == {}
+    cache.store(URL, _response(200, "[1]", {"ETag": '"v1"', "Last-Modified": "Mon", "X-Other": "x"}))
+
+    assert cache.conditional_headers(URL) == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon"}
+    entry = cache.get(URL)
+    assert entry["body"] == "[1]"
+    # 只保留有复用价值的响应头
+    assert "X-Other" not in entry["headers"]
+
+
+def test_only_validatable_200_responses_are_stored(tmp_path):
+    cache = ETagCache(str(tmp_path))
+    cache.store(URL, _response(200, "[1]", {}))
+    cache.store(URL, _response(404, "", {"ETag": '"v1"'}))
+    assert cache.get(URL) is None
+
+
+def test_build_response_merges_not_modified_headers(tmp_path):
+    cache = ETagCache(str(tmp_path))
+    assert cache.build_response(URL) is None
+    cache.store(URL, _response(200, '[{"id": 1}]', {"ETag": '"v1"', "Link": "<next>"}))
+
+    not_modified = _response(304, "", {"ETag": '"v1"', "X-RateLimit-Remaining": "42"})
+    response = cache.build_response(URL, not_modified)
+    assert response.status_code == 200
+    assert response.from_cache
+    assert response.json() == [{"id": 1}]
+    assert response.headers["Link"] == "<next>"
+    assert response.headers["X-RateLimit-Remaining"] == "42"
+
+
+def test_corrupt_entry_is_ignored(tmp_path):
+    cache = ETagCache(str(tmp_path))
+    cache.store(URL, _response(200, "[1]", {"ETag": '"v1"'}))
+    with open(cache._path(URL), "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert cache.get(URL) is None
+    assert cache.conditional_headers(URL) == {}
+
+
+def test_no_temp_files_left_behind(tmp_path):
+    cache = ETagCache(str(tmp_path))
+    cache.store(URL, _response(200, "[1]", {"ETag": '"v1"'}))
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(files) == 1 and files[0].endswith(".json")
@@ -0,0 +1,35 @@
+import time
+
+from http_cache import build_cached_response
+from negative_cache import NegativeCache
+
+
+def test_only_404_is_negative():
+    assert NegativeCache.is_negative(build_cached_response("u", 404, '{"message": "Not Found"}'))
+    # 空列表（如还没有新事件的 /events）要靠条件请求重新验证，不能当作缺失结果缓存
+    assert not NegativeCache.is_negative(build_cached_response("u", 200, "[]"))
+    assert not NegativeCache.is_negative(build_cached_response("u", 200, '{"a": 1}'))
+
+
+def test_database_opened_on_first_use(tmp_path):
+    cache = NegativeCache(str(tmp_path / "cache" / "negative.sqlite3"), ttl=60)
+    assert not (tmp_path / "cache").exists()
+    assert cache.get("missing") is None
+    assert (tmp_path / "cache" / "negative.sqlite3").exists()
+
+
+def test_mark_get_and_expire(tmp_path):
+    cache = NegativeCache(str(tmp_path / "negative.sqlite3"), ttl=60)
+    cache.mark("https://api.github.com/repos/a/b/readme", 404, "missing")
+    assert cache.get("https://api.github.com/repos/a/b/readme") == {"status": 404, "body": "missing"}
+
+    cache.mark("expired", 404, "", ttl=-1)
+    assert cache.get("expired") is None
+
+
+def test_absent_helpers(tmp_path):
+    cache = NegativeCache(str(tmp_path / "negative.sqlite3"), ttl=60)
+    assert not cache.is_absent("blog:https://example.com")
+    cache.mark_absent("blog:https://example.com")
+    assert cache.is_absent("blog:https://example.com")
+
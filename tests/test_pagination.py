@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+
+from requests.structures import CaseInsensitiveDict
+import requests
+
+from async_github_client import AsyncGitHubClient
+from github_client import GitHubClient, last_page_number, max_pages_for
+
+URL = "https://api.github.com/users/u/followers"
+
+
+def _link(last_page):
+    return (f'<{URL}?per_page=2&page=2>; rel="next", '
+            f'<{URL}?per_page=2&page={last_page}>; rel="last"')
+
+
+def _response(status, data, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(data).encode("utf-8")
+    response.headers = CaseInsensitiveDict(headers or {})
+    return response
+
+
+def _pages_client(pages, link_last=None):
+    """按页码返回 pages[page]（(状态码, 数据) 或数据列表），第 1 页带 rel="last" 的 Link 头"""
+    client = GitHubClient()
+    requested = []
+    lock = threading.Lock()
+
+    def get(url, params=None, **kwargs):
+        page = params["page"]
+        with lock:
+            requested.append(page)
+        status, data = pages[page] if isinstance(pages[page], tuple) else (200, pages[page])
+        headers = {"Link": _link(link_last or len(pages))} if page == 1 and (link_last or len(pages)) > 1 else {}
+        return _response(status, data, headers)
+
+    client.get = get
+    return client, requested
+
+
+def test_last_page_number():
+    assert last_page_number(None) == 1
+    assert last_page_number(_link(7)) == 7
+    assert last_page_number(f'<{URL}?page=2>; rel="next"') == 1
+
+
+def test_max_pages_for():
+    assert max_pages_for(None, 100) is None
+    assert max_pages_for(250, 100) == 3
+    assert max_pages_for(100, 100) == 1
+
+
+def test_pages_are_yielded_in_order():
+    pages = {1: [1, 2], 2: [3, 4], 3: [5, 6], 4: [7]}
+    client, requested = _pages_client(pages)
+    assert list(client.paginate_pages(URL, per_page=2)) == [[1, 2], [3, 4], [5, 6], [7]]
+    # 根据 Link 头直接请求到最后一页，不再多请求一个空页
+    assert sorted(requested) == [1, 2, 3, 4]
+
+
+def test_single_page_without_link_header():
+    client, requested = _pages_client({1: [1]})
+    assert list(client.paginate_pages(URL)) == [[1]]
+    assert requested == [1]
+
+
+def test_stops_at_failed_or_empty_page():
+    client, _ = _pages_client({1: [1], 2: [2], 3: (502, {}), 4: [4]})
+    assert list(client.paginate_pages(URL)) == [[1], [2]]
+
+    client, _ = _pages_client({1: [1], 2: [], 3: [3]})
+    assert list(client.paginate_pages(URL)) == [[1]]
+
+    client, requested = _pages_client({1: (404, {})}, link_last=3)
+    assert list(client.paginate_pages(URL)) == []
+    assert requested == [1]
+
+
+def test_max_pages_and_max_items():
+    pages = {page: [page * 10, page * 10 + 1] for page in range(1, 6)}
+    client, requested = _pages_client(pages)
+    assert list(client.paginate_pages(URL, per_page=2, max_pages=2)) == [[10, 11], [20, 21]]
+    assert sorted(requested) == [1, 2]
+
+    client, requested = _pages_client(pages)
+    assert list(client.paginate(URL, per_page=2, max_items=3)) == [10, 11, 20]
+    assert sorted(requested) == [1, 2]
+
+
+def test_async_pagination_matches_sync():
+    pages = {1: [1, 2], 2: [3, 4], 3: (502, {}), 4: [7]}
+    sync_client, _ = _pages_client(pages)
+    async_client = AsyncGitHubClient(sync_client=sync_client)
+
+    async def get(url, params=None, use_cache=True):
+        return sync_client.get(url, params=params)
+
+    async_client.get = get
+
+    async def collect():
+        return [page async for page in async_client.paginate_pages(URL, per_page=2)]
+
+    assert asyncio.run(collect()) == list(sync_client.paginate_pages(URL, per_page=2)) == [[1, 2], [3, 4]]
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from rate_limit import UNKNOWN_RESET_WAIT, RateLimitExceeded, RateLimitScheduler
+
+
+def _headers(limit, remaining, reset_at, resource="core"):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(reset_at),
+        "X-RateLimit-Resource": resource,
+    }
+
+
+def test_unprobed_token_is_used_without_waiting():
+    scheduler = RateLimitScheduler(tokens=["a"])
+    assert scheduler.reserve("core") == ("a", 0.0)
+
+
+def test_prefers_token_with_most_remaining():
+    scheduler = RateLimitScheduler(tokens=["a", "b"])
+    reset_at = time.time() + 3600
+    scheduler.update("a", "core", _headers(5000, 100, reset_at))
+    scheduler.update("b", "core", _headers(5000, 4000, reset_at))
+    token, delay = scheduler.reserve("core")
+    assert token == "b" and delay == 0.0
+
+
+def test_reserve_decrements_remaining():
+    scheduler = RateLimitScheduler(tokens=["a"])
+    scheduler.update("a", "core", _headers(5000, 4000, time.time() + 3600))
+    scheduler.reserve("core")
+    assert scheduler.snapshot()["token#1:core"]["remaining"] == 3999
+
+
+def test_exhausted_token_waits_until_reset():
+    scheduler = RateLimitScheduler(tokens=["a"])
+    reset_at = time.time() + 100
+    scheduler.update("a", "core", _headers(5000, 0, reset_at))
+    token, delay = scheduler.reserve("core")
+    assert token == "a"
+    assert 99 < delay <= 101.5
+
+
+def test_paces_when_below_threshold():
+    scheduler = RateLimitScheduler(tokens=["a"], pace_threshold=0.2)
+    scheduler.update("a", "core", _headers(100, 10, time.time() + 100))
+    _, first = scheduler.reserve("core")
+    _, second = scheduler.reserve("core")
+    assert first == 0.0
+    # 剩余 10 次摊到 100 秒里，第二次请求约在 10 秒后
+    assert 9 < second <= 10.5
+
+
+def test_quarantined_token_is_skipped():
+    scheduler = RateLimitScheduler(tokens=["a", "b"])
+    scheduler.quarantine("a", "core", time.time() + 60)
+    token, delay = scheduler.reserve("core")
+    assert token == "b" and delay == 0.0
+
+
+def test_refreshed_bucket_never_goes_negative():
+    scheduler = RateLimitScheduler(tokens=["a"])
+    # 重置时间已过：refresh 恢复满额并把 reset_at 清零，此后不知道下一次重置的时刻
+    scheduler.update("a", "core", _headers(2, 0, time.time() - 1))
+    assert scheduler.reserve("core")[1] == 0.0
+    assert scheduler.reserve("core")[1] == 0.0
+
+    token, delay = scheduler.reserve("core")
+    state = scheduler.snapshot()["token#1:core"]
+    assert token == "a"
+    assert state["remaining"] == 0
+    assert UNKNOWN_RESET_WAIT - 1 < delay <= UNKNOWN_RESET_WAIT
+    assert state["quarantined_until"] > time.time()
+
+    # 隔离期间继续预占只会等待，额度不会被透支
+    scheduler.reserve("core")
+    assert scheduler.snapshot()["token#1:core"]["remaining"] == 0
+
+
+def test_acquire_raises_when_wait_exceeds_limit():
+    scheduler = RateLimitScheduler(tokens=["a"], max_wait=10)
+    scheduler.update("a", "core", _headers(5000, 0, time.time() + 3600))
+    with pytest.raises(RateLimitExceeded):
+        scheduler.acquire("core")
+
+
+def test_resource_for_url():
+    assert RateLimitScheduler.resource_for_url("https://api.github.com/graphql") == "graphql"
+    assert RateLimitScheduler.resource_for_url("https://api.github.com/search/repositories") == "search"
+    assert RateLimitScheduler.resource_for_url("https://api.github.com/users/x") == "core"
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+
+import repo_metadata
+from github_client import GraphQLError
+from http_cache import build_cached_response
+
+
+def _node(full_name):
+    return {"stargazerCount": len(full_name), "forkCount": 1, "url": f"https://github.com/{full_name}"}
+
+
+class FakeClient:
+    """GraphQL 按别名返回仓库，名称以 missing 开头的仓库不存在；fail_graphql 时 GraphQL 整批失败"""
+
+    def __init__(self, can_use_graphql=True, fail_graphql=False):
+        self.can_use_graphql = can_use_graphql
+        self.fail_graphql = fail_graphql
+        self.queries = []
+        self.urls = []
+
+    def _answer(self, variables):
+        if self.fail_graphql:
+            raise GraphQLError("boom")
+        self.queries.append(variables)
+        count = len(variables) // 2
+        return {
+            f"r{i}": None if variables[f"n{i}"].startswith("missing") else
+            _node(f"{variables[f'o{i}']}/{variables[f'n{i}']}")
+            for i in range(count)
+        }
+
+    def graphql(self, query, variables, allow_partial=False):
+        return self._answer(variables)
+
+    def get_many(self, urls):
+        return [self.get(url) for url in urls]
+
+    def get(self, url):
+        self.urls.append(url)
+        full_name = url.split("/repos/", 1)[1]
+        if full_name.split("/")[1].startswith("missing"):
+            return build_cached_response(url, 404, "{}")
+        return build_cached_response(url, 200, json.dumps({
+            "stargazers_count": len(full_name), "forks_count": 1, "html_url": f"https://github.com/{full_name}",
+        }))
+
+
+class FakeAsyncClient(FakeClient):
+    async def graphql(self, query, variables, allow_partial=False):
+        return self._answer(variables)
+
+    async def get(self, url):
+        return FakeClient.get(self, url)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(repo_metadata, "_metadata_cache", {})
+
+
+def test_batch_query_uses_aliases():
+    query, variables = repo_metadata._batch_query(["a/b", "c/d"])
+    assert variables == {"o0": "a", "n0": "b", "o1": "c", "n1": "d"}
+    assert "r1: repository(owner: $o1, name: $n1)" in query
+
+
+def test_graphql_batches_and_cache(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(repo_metadata, "github_client", client)
+    monkeypatch.setattr(repo_metadata, "GRAPHQL_BATCH_SIZE", 2)
+
+    found = repo_metadata.get_repos_metadata(["a/b", "c/d", "a/b", "e/missing", "g/h"])
+    assert list(found) == ["a/b", "c/d", "g/h"]
+    assert found["a/b"] == {"stargazers_count": 3, "forks_count": 1, "html_url": "https://github.com/a/b"}
+    assert len(client.queries) == 2
+
+    # 第二次只请求上次没有拿到的仓库
+    repo_metadata.get_repos_metadata(["a/b", "c/d", "e/missing"])
+    assert len(client.queries) == 3
+    assert client.queries[-1] == {"o0": "e", "n0": "missing"}
+    assert client.urls == []
+
+
+def test_failed_graphql_batch_falls_back_to_rest(monkeypatch):
+    client = FakeClient(fail_graphql=True)
+    monkeypatch.setattr(repo_metadata, "github_client", client)
+    found = repo_metadata.get_repos_metadata(["a/b", "c/d"])
+    assert list(found) == ["a/b", "c/d"]
+    assert client.urls == ["https://api.github.com/repos/a/b", "https://api.github.com/repos/c/d"]
+
+
+def test_without_graphql_uses_rest_and_cache(monkeypatch):
+    client = FakeClient(can_use_graphql=False)
+    monkeypatch.setattr(repo_metadata, "github_client", client)
+
+    found = repo_metadata.get_repos_metadata(["a/b", "e/missing", "a/b"])
+    assert list(found) == ["a/b"]
+    assert client.urls == ["https://api.github.com/repos/a/b", "https://api.github.com/repos/e/missing"]
+
+    # 请求失败的仓库不进缓存，下次重新请求
+    repo_metadata.get_repos_metadata(["a/b", "e/missing"])
+    assert client.urls[2:] == ["https://api.github.com/repos/e/missing"]
+    assert client.queries == []
+
+
+def test_async_matches_sync(monkeypatch):
+    monkeypatch.setattr(repo_metadata, "github_client", FakeClient())
+    monkeypatch.setattr(repo_metadata, "GRAPHQL_BATCH_SIZE", 2)
+    sync_found = repo_metadata.get_repos_metadata(["a/b", "c/d", "g/h"])
+
+    monkeypatch.setattr(repo_metadata, "_metadata_cache", {})
+    client = FakeAsyncClient()
+    async_found = asyncio.run(repo_metadata.get_repos_metadata_async(["a/b", "c/d", "g/h"], client))
+    assert async_found == sync_found
+    assert len(client.queries) == 2
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import repo_snapshot
+from single_flight import request_scope
+
+
+def _repo(name, repo_type, stars, pushed_at=None):
+    return {"repo_name": name, "repo_type": repo_type, "Star": stars, "pushed_at": pushed_at,
+            "html_url": f"https://github.com/u/{name}", "language_detail": {"Go": 10}}
+
+
+REPOS = [
+    _repo("a", "owner", 3, "2024-01-02T00:00:00Z"),
+    _repo("b", "owner", 1, "2024-03-01T00:00:00Z"),
+    _repo("c", "owner", 7),
+    _repo("m", "member", 5, "2024-05-01T00:00:00Z"),
+]
+
+
+def test_snapshot_derives_views_from_one_repo_list():
+    snapshot = repo_snapshot.RepoSnapshot("u", REPOS)
+    assert [repo["repo_name"] for repo in snapshot.owner_repos] == ["a", "b", "c"]
+    assert [repo["repo_name"] for repo in snapshot.member_repos] == ["m"]
+    assert snapshot.total_stars == 16
+    assert snapshot.language_percentages() == {"Go": 100.0}
+    assert repo_snapshot.RepoSnapshot.full_name(REPOS[3]) == "u/m"
+
+
+def test_top_repos_orders_and_caps_owner_repos():
+    snapshot = repo_snapshot.RepoSnapshot("u", REPOS)
+
+    def names(repos):
+        return [repo["repo_name"] for repo in repos]
+
+    # 没有推送时间的仓库排在最后
+    assert names(snapshot.top_repos("pushed")) == ["b", "a", "c"]
+    assert names(snapshot.top_repos("pushed", limit=2)) == ["b", "a"]
+    assert names(snapshot.top_repos("stars", limit=2)) == ["c", "a"]
+    assert names(snapshot.top_repos("stars", repos=snapshot.repos)) == ["c", "m", "a", "b"]
+    with pytest.raises(ValueError):
+        snapshot.top_repos("forks")
+
+
+def test_async_and_sync_builds_share_one_fetch_per_scope(monkeypatch):
+    calls = []
+
+    async def fake_async(username, client):
+        calls.append("async")
+        await asyncio.sleep(0.05)
+        return REPOS
+
+    def fake_sync(username):
+        calls.append("sync")
+        return REPOS
+
+    monkeypatch.setattr(repo_snapshot, "get_user_repos_async", fake_async)
+    monkeypatch.setattr(repo_snapshot, "get_user_repos", fake_sync)
+
+    async def run():
+        # 两个异步阶段和一个线程里的同步分析同时构建快照，不依赖阶段图的编排顺序
+        return await asyncio.gather(
+            repo_snapshot.build_repo_snapshot_async("u", client=None),
+            repo_snapshot.build_repo_snapshot_async("u", client=None),
+            asyncio.to_thread(repo_snapshot.build_repo_snapshot, "u"),
+        )
+
+    with request_scope():
+        snapshots = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
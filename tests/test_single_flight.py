@@ -0,0 +1,215 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from github_client import GitHubClient
+from single_flight import (
+    SingleFlight, current_scope, is_shareable, memoize_in_scope, memoize_in_scope_async, memoize_json, request_scope,
+)
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(flight.do, "k", slow)
+        started.wait()
+        others = [executor.submit(flight.do, "k", slow) for _ in range(3)]
+        results = [first.result()] + [f.result() for f in others]
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+
+
+def test_single_flight_propagates_errors_and_forgets_key():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flight.do("k", lambda: 1) == 1
+
+
+def test_nested_scope_reuses_outer():
+    assert current_scope() is None
+    with request_scope() as outer:
+        with request_scope() as inner:
+            assert inner is outer
+        assert current_scope() is outer
+    assert current_scope() is None
+
+
+def test_scope_reaches_worker_threads_through_copied_context():
+    with request_scope() as scope:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            seen = executor.submit(contextvars.copy_context().run, current_scope).result()
+    assert seen is scope
+
+
+def test_memoize_outside_scope_always_calls():
+    calls = []
+    memoize_in_scope("k", lambda: calls.append(1))
+    memoize_in_scope("k", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_memoize_caches_none():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    with request_scope():
+        assert memoize_in_scope("k", compute) is None
+        assert memoize_in_scope("k", compute) is None
+    assert len(calls) == 1
+
+
+def test_memoize_runs_once_across_threads():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def build():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    def worker():
+        barrier.wait()
+        return memoize_in_scope("repo_snapshot:u", build)
+
+    with request_scope():
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, worker) for _ in range(8)]
+            results = [f.result() for f in futures]
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_memoize_retries_after_failure():
+    with request_scope():
+        with pytest.raises(RuntimeError):
+            memoize_in_scope("k", lambda: (_ for _ in ()).throw(RuntimeError("fail")))
+        assert memoize_in_scope("k", lambda: 42) == 42
+
+
+def test_memoize_json_parses_once():
+    response = _response(200, b'{"a": 1}')
+    parses = []
+    parse = response.json
+    response.json = lambda **kwargs: parses.append(1) or parse(**kwargs)
+
+    memoize_json(memoize_json(response))
+    assert response.json() == {"a": 1}
+    assert response.json() is response.json()
+    assert len(parses) == 1
+
+
+def test_only_deterministic_responses_are_shared():
+    assert is_shareable(_response(200))
+    assert is_shareable(_response(404))
+    for status in (403, 429, 500, 502):
+        assert not is_shareable(_response(status))
+
+
+def _response(status, body=b"{}"):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+def _counting_client(delay=0.0, status=200):
+    """网络层换成计数的假实现，返回 (客户端, 实际发出的请求 URL 列表)"""
+    client = GitHubClient(tokens=[None])
+    sent = []
+    lock = threading.Lock()
+
+    def request(method, url, headers=None, **kwargs):
+        with lock:
+            sent.append(url)
+        time.sleep(delay)
+        return _response(status, b'{"login": "u"}')
+
+    client.session.request = request
+    return client, sent
+
+
+def test_concurrent_gets_are_sent_once():
+    client, sent = _counting_client(delay=0.05)
+    barrier = threading.Barrier(4)
+
+    def fetch():
+        barrier.wait()
+        return client.get("/users/u", use_cache=False)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = [f.result() for f in [executor.submit(fetch) for _ in range(4)]]
+    assert len(sent) == 1
+    assert all(response.json() == {"login": "u"} for response in responses)
+
+
+def test_request_scope_shares_responses():
+    client, sent = _counting_client()
+    with request_scope():
+        first = client.get("/users/u", use_cache=False)
+        assert client.get("https://api.github.com/users/u", use_cache=False) is first
+    # 作用域结束后重新请求
+    client.get("/users/u", use_cache=False)
+    assert len(sent) == 2
+
+
+def test_failed_responses_are_not_shared_in_scope():
+    client, sent = _counting_client(status=502)
+    with request_scope():
+        client.get("/users/u", use_cache=False)
+        client.get("/users/u", use_cache=False)
+    assert len(sent) == 2
+
+
+def test_async_memoize_shares_one_call_with_coroutines_and_threads():
+    calls = []
+
+    async def build():
+        calls.append(1)
+        # 协程内仍能看到调用方的请求作用域
+        assert current_scope() is scope
+        await asyncio.sleep(0.05)
+        return "snapshot"
+
+    async def run():
+        def sync_caller():
+            return memoize_in_scope("k", lambda: "computed in thread")
+
+        return await asyncio.gather(
+            memoize_in_scope_async("k", build),
+            memoize_in_scope_async("k", build),
+            asyncio.to_thread(sync_caller),
+        )
+
+    with request_scope() as scope:
+        results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results in (["snapshot"] * 3, ["computed in thread"] * 3)
+
+
+def test_async_memoize_outside_scope_always_calls():
+    calls = []
+
+    async def build():
+        calls.append(1)
+
+    asyncio.run(memoize_in_scope_async("k", build))
+    asyncio.run(memoize_in_scope_async("k", build))
+    assert len(calls) == 2
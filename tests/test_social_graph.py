@@ -0,0 +1,155 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import social_graph
+from social_graph import SocialGraphStore
+
+
+def _store(tmp_path):
+    return SocialGraphStore(str(tmp_path / "graph"), ttl=3600)
+
+
+def test_neighbours_keep_crawl_order(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "follower", ["c", "a", "b", "a", "root"])
+    assert store.neighbours("root", "follower") == ["c", "a", "b"]
+    assert store.is_fresh("root", "follower")
+    assert not store.is_fresh("root", "following")
+
+
+def test_recrawl_replaces_compacted_edges(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "follower", ["a", "b"])
+    store.record("x", "follower", ["a"])
+    store.compact(force=True)
+    assert store.neighbours("root", "follower") == ["a", "b"]
+
+    store.record("root", "follower", ["c"])
+    assert store.neighbours("root", "follower") == ["c"]
+    # 没有被重新爬取的节点保持原样
+    assert store.neighbours("x", "follower") == ["a"]
+
+
+def test_recrawl_twice_between_compactions_keeps_latest(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "follower", ["a", "b"])
+    store.record("x", "follower", ["a"])
+    store.record("root", "follower", ["b", "c"])
+    assert store.neighbours("root", "follower") == ["b", "c"]
+    assert store.neighbours("x", "follower") == ["a"]
+
+
+def test_empty_recrawl_clears_edges(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "follower", ["a"])
+    assert store.neighbours("root", "follower") == ["a"]
+    store.record("root", "follower", ["b"])
+    store.record("root", "follower", [])
+    assert store.neighbours("root", "follower") == []
+
+
+def test_adjacency_covers_nodes_added_after_compaction(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "follower", ["a"])
+    store.compact(force=True)
+    store.node_ids(["late"], create=True)
+    matrix = store.adjacency("follower")
+    assert matrix.shape[0] == store._node_count()
+    assert matrix.nnz == 1
+
+
+def test_reads_use_log_tails_without_compacting(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "follower", ["a", "b"])
+    store.record("x", "follower", ["a"])
+    store.compact(force=True)
+    store.record("root", "follower", ["c"])
+
+    assert store.neighbours("root", "follower") == ["c"]
+    assert store.neighbours("x", "follower") == ["a"]
+    matrix = store.adjacency("follower")
+    assert matrix.nnz == 2
+    # 读取不改写 CSR，也不清空日志
+    assert os.path.getsize(store._path("follower", "log")) > 0
+    assert np.load(store._path("follower", "indices.npy")).size == 3
+
+
+def test_log_tails_survive_reopen(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "follower", ["a", "b"])
+    store.record("root", "follower", ["b"])
+    reopened = _store(tmp_path)
+    assert reopened.neighbours("root", "follower") == ["b"]
+    assert reopened._load_tails("follower")[1] == 3
+
+
+def test_compact_only_past_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(social_graph, "SOCIAL_GRAPH_LOG_MIN_EDGES", 3)
+    monkeypatch.setattr(social_graph, "SOCIAL_GRAPH_LOG_MAX_EDGES", 100)
+    store = _store(tmp_path)
+    store.record("root", "follower", ["a", "b"])
+    store.compact()
+    assert not os.path.exists(store._path("follower", "indices.npy"))
+
+    store.record("x", "follower", ["a"])
+    store.compact()
+    assert os.path.getsize(store._path("follower", "log")) == 0
+    assert store.neighbours("root", "follower") == ["a", "b"]
+    assert store.neighbours("x", "follower") == ["a"]
+
+
+def test_node_ids_batches_lookups(tmp_path):
+    store = _store(tmp_path)
+    logins = [f"User{i}" for i in range(1200)]
+    created = store.node_ids(logins, create=True)
+    assert len(created) == 1200
+    # 按小写匹配，返回时保留调用方传入的写法
+    found = store.node_ids(["user5", "USER1199", "nobody"])
+    assert found == {"user5": created["User5"], "USER1199": created["User1199"]}
+
+
+def test_depth_weights(tmp_path):
+    store = _store(tmp_path)
+    # root 的关注者 a、b，其中 a 与 root 互相关注；a 的关注者 c，b 的关注者 d（b 不是互相关注，不展开）
+    store.record("root", "follower", ["a", "b"])
+    store.record("root", "mutual", ["a"])
+    store.record("a", "follower", ["c"])
+    store.record("b", "follower", ["d"])
+
+    node_ids, weights = store.depth_weights("root", max_depth=2)
+    result = dict(zip(store.logins(node_ids), weights))
+    assert result == {"a": 2.0, "b": 1.0, "c": 0.5}
+
+
+def test_depth_weights_unknown_user(tmp_path):
+    node_ids, weights = _store(tmp_path).depth_weights("nobody", max_depth=2)
+    assert len(node_ids) == 0 and len(weights) == 0
+
+
+def test_collaborators(tmp_path):
+    store = _store(tmp_path)
+    store.record("root", "collaborator", ["a", "b"])
+    ids = store.node_ids(["a", "b"])
+    assert sorted(store.collaborators("root").tolist()) == sorted(ids.values())
+    assert np.asarray(store.collaborators("nobody")).size == 0
+
+
+def test_importing_stores_creates_no_files(tmp_path):
+    # 导入模块时各持久化存储都不打开，第一次使用时才创建目录和数据库
+    src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env = dict(os.environ, GITHUB_CACHE_DIR=str(tmp_path / "cache"), PYTHONPATH=src_dir)
+    subprocess.run(
+        [sys.executable, "-c", "import github_client, event_cursor, user_location, social_graph"],
+        cwd=tmp_path, env=env, check=True
+    )
+    assert os.listdir(tmp_path) == []
+
+
+def test_store_opened_on_first_use(tmp_path):
+    store = _store(tmp_path)
+    assert not (tmp_path / "graph").exists()
+    assert store.neighbours("root", "follower") == []
+    assert (tmp_path / "graph" / "graph.sqlite3").exists()
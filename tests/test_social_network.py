@@ -0,0 +1,243 @@
+import json
+import threading
+import time
+
+import pytest
+
+import social_network
+import user_location
+from github_client import github_client
+from http_cache import build_cached_response
+from repo_snapshot import RepoSnapshot
+from config import SOCIAL_CRAWL_WORKERS, SOCIAL_FOLLOWING_MAX_ITEMS
+from social_graph import SocialGraphStore
+from user_location import UserLocationStore
+
+
+def _user(n):
+    return f"u{n}"
+
+
+def _body(url):
+    """假的 GitHub 网络：每个用户有 20 个关注者，并且关注了他们全部，位置统一为 Earth"""
+    path = url.split("api.github.com", 1)[1].split("?", 1)[0]
+    parts = path.strip("/").split("/")
+    if parts[0] == "repos":
+        return [{"login": f"{parts[2]}-c{i}"} for i in range(3)]
+    login = parts[1]
+    if len(parts) == 2:
+        return {"login": login, "location": "Earth", "bio": None}
+    children = [{"login": f"{login}.{i}"} for i in range(20)]
+    return children  # followers 和 following 相同，全部互相关注
+
+
+def _install_network(tmp_path, monkeypatch, body, link=None, delay=0, stats=None):
+    """
+    把共享客户端的网络层换成 body(url) 描述的假网络，返回实际发出的请求 URL 列表。
+    link(url) 给出响应的 Link 头；delay 为每个请求的耗时，stats["peak"] 记录同时在途的最大请求数。
+    """
+    urls = []
+    lock = threading.Lock()
+    in_flight = [0]
+
+    def send(method, url, headers=None, **kwargs):
+        with lock:
+            urls.append(url)
+            in_flight[0] += 1
+            if stats is not None:
+                stats["peak"] = max(stats.get("peak", 0), in_flight[0])
+        try:
+            time.sleep(delay)
+            link_header = link(url) if link else None
+            return build_cached_response(url, 200, json.dumps(body(url)),
+                                         {"Link": link_header} if link_header else None)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(github_client, "_send_with_rate_limit", send)
+    monkeypatch.setattr(github_client, "cache", None)
+    monkeypatch.setattr(github_client, "negative_cache", None)
+    locations = UserLocationStore(str(tmp_path / "locations.sqlite3"), ttl=3600)
+    monkeypatch.setattr(user_location, "user_location_store", locations)
+    monkeypatch.setattr(social_network, "user_location_store", locations)
+    monkeypatch.setattr(social_network, "social_graph_store", SocialGraphStore(str(tmp_path / "graph"), ttl=3600))
+    return urls
+
+
+@pytest.fixture
+def sent(tmp_path, monkeypatch):
+    return _install_network(tmp_path, monkeypatch, _body)
+
+
+def _snapshot(repo_count):
+    return RepoSnapshot("root", [
+        {"repo_name": f"r{i}", "repo_type": "member", "html_url": f"https://github.com/org/r{i}"}
+        for i in range(repo_count)
+    ])
+
+
+def test_crawl_never_exceeds_max_calls(sent):
+    result = social_network.crawl_social_network("root", depth=3, snapshot=_snapshot(0), max_calls=100)
+    budget = result["budget"]
+    assert budget["calls_used"] == len(sent) <= 100
+    assert budget["stopped_by"] == "calls"
+    assert budget["nodes_expanded"] >= 1
+    assert dict(result["locations"])["Earth"] > 0
+
+
+def test_budget_too_small_for_one_node_sends_nothing(sent):
+    result = social_network.crawl_social_network("root", snapshot=_snapshot(0),
+                                                 max_calls=social_network.MAX_CALLS_PER_NODE - 1)
+    assert sent == []
+    assert result["budget"]["stopped_by"] == "calls"
+    assert result["budget"]["nodes_pending"] == 1
+
+
+def test_collaborator_phase_counts_against_budget(sent):
+    result = social_network.crawl_social_network("root", snapshot=_snapshot(5), max_calls=3)
+    assert len(sent) == 3
+    assert all("/contributors" in url for url in sent)
+    assert result["budget"]["stopped_by"] == "calls"
+    # 中途停止的共同贡献者列表不记录，下次分析时重新获取
+    assert not social_network.social_graph_store.is_fresh("root", "collaborator")
+
+
+def test_deadline_stops_before_any_request(sent):
+    result = social_network.crawl_social_network("root", snapshot=_snapshot(2), deadline=0)
+    assert sent == []
+    assert result["budget"]["stopped_by"] == "deadline"
+
+
+def test_stored_nodes_are_expanded_without_requests(sent):
+    social_network.crawl_social_network("root", depth=2, snapshot=_snapshot(0), max_calls=10000)
+    first = len(sent)
+    assert first > 0
+
+    result = social_network.crawl_social_network("root", depth=2, snapshot=_snapshot(0), max_calls=10000)
+    assert len(sent) == first
+    assert result["budget"]["calls_used"] == 0
+    assert result["budget"]["stopped_by"] is None
+
+
+# 小型固定社交图：root 关注了 a 但没有关注 b，a 关注了 c 但没有关注 d，c 和 e 互相关注
+FIXTURE_FOLLOWERS = {"root": ["a", "b"], "a": ["c", "d"], "c": ["e"]}
+FIXTURE_FOLLOWING = {"root": ["a"], "a": ["c"], "c": ["e"]}
+FIXTURE_LOCATIONS = {"a": "Tokyo", "b": "Paris", "c": "Tokyo", "d": "Berlin", "e": "Seoul"}
+
+
+def _fixture_body(url):
+    parts = url.split("api.github.com", 1)[1].split("?", 1)[0].strip("/").split("/")
+    login = parts[1]
+    if len(parts) == 2:
+        return {"login": login, "location": FIXTURE_LOCATIONS.get(login), "bio": None}
+    table = FIXTURE_FOLLOWERS if parts[2] == "followers" else FIXTURE_FOLLOWING
+    return [{"login": other} for other in table.get(login, [])]
+
+
+@pytest.fixture
+def fixture_sent(tmp_path, monkeypatch):
+    return _install_network(tmp_path, monkeypatch, _fixture_body)
+
+
+def test_mutual_means_the_node_follows_back(fixture_sent):
+    social_network.crawl_social_network("root", depth=3, snapshot=_snapshot(0), max_calls=10000)
+    store = social_network.social_graph_store
+    assert store.neighbours("root", "mutual") == ["a"]
+    assert store.neighbours("a", "mutual") == ["c"]
+    # 非互相关注的关注者不向下展开
+    assert not any("/users/b/" in url or "/users/d/" in url for url in fixture_sent)
+    # 不再逐个请求 /users/{follower}/following/{node}
+    assert not any("/following/" in url for url in fixture_sent)
+
+
+def test_depth_weighting_on_fixture_graph(fixture_sent):
+    result = social_network.crawl_social_network("root", depth=3, snapshot=_snapshot(0), max_calls=10000)
+    weights = dict(result["locations"])
+    # 第 1 层：a 互相关注 2/1，b 单向 1/1；第 2 层：c 互相关注 2/2，d 单向 1/2；第 3 层：e 互相关注 2/3
+    assert weights == pytest.approx({"Tokyo": 2.0 + 1.0, "Paris": 1.0, "Berlin": 0.5, "Seoul": 2 / 3})
+    assert list(weights) == ["Tokyo", "Paris", "Seoul", "Berlin"]
+
+    shallow = dict(social_network.network_location_weights("root", depth=1))
+    assert shallow == pytest.approx({"Tokyo": 2.0, "Paris": 1.0})
+
+
+def _paged_body(url):
+    """每个用户 20 个关注者；关注中列表有 10 页，每页 100 个，前 20 个就是全部关注者"""
+    path, _, query = url.split("api.github.com", 1)[1].partition("?")
+    parts = path.strip("/").split("/")
+    login = parts[1]
+    if len(parts) == 2:
+        return {"login": login, "location": "Earth", "bio": None}
+    if parts[2] == "followers":
+        return [{"login": f"{login}.{i}"} for i in range(20)]
+    page = int(dict(item.split("=") for item in query.split("&")).get("page", 1))
+    return [{"login": f"{login}.{i}"} for i in range((page - 1) * 100, page * 100)]
+
+
+def _paged_link(url):
+    if "/following" in url:
+        return '<https://api.github.com/x?page=10>; rel="last"'
+    return None
+
+
+def test_crawl_caps_concurrency_and_following_pages(tmp_path, monkeypatch):
+    stats = {}
+    sent = _install_network(tmp_path, monkeypatch, _paged_body, link=_paged_link, delay=0.005, stats=stats)
+    result = social_network.crawl_social_network("root", depth=3, snapshot=_snapshot(0), max_calls=200)
+
+    # 节点爬取和位置查询不嵌套线程池，同时在途的请求数不超过 SOCIAL_CRAWL_WORKERS
+    assert 1 < stats["peak"] <= SOCIAL_CRAWL_WORKERS
+    following_pages = [url for url in sent if "/root/following" in url]
+    assert len(following_pages) == SOCIAL_FOLLOWING_MAX_ITEMS // 100
+    assert result["budget"]["calls_used"] == len(sent) <= 200
+
+    # 写入图中的节点，其关注者的位置都已缓存
+    store = social_network.social_graph_store
+    crawled = [url.split("/users/", 1)[1].split("/")[0] for url in sent if url.split("?")[0].endswith("/followers")]
+    assert crawled
+    for node in crawled:
+        followers = store.neighbours(node, "follower")
+        assert len(followers) == 20
+        assert set(social_network.user_location_store.get_many(followers)) == set(followers)
+
+
+def test_one_node_fits_in_max_calls_per_node(tmp_path, monkeypatch):
+    sent = _install_network(tmp_path, monkeypatch, _paged_body, link=_paged_link)
+    result = social_network.crawl_social_network("root", depth=3, snapshot=_snapshot(0),
+                                                 max_calls=social_network.MAX_CALLS_PER_NODE)
+    assert result["budget"]["nodes_expanded"] == 1
+    assert len(sent) == social_network.MAX_CALLS_PER_NODE
+
+
+def test_candidates_ordered_by_priority_with_batched_lookups(sent, monkeypatch):
+    store = social_network.social_graph_store
+    store.record("root", "follower", ["plain", "located", "stored", "oneway"])
+    store.record("root", "mutual", ["plain", "located", "stored"])
+    store.record("stored", "follower", [])
+    social_network.user_location_store.put_many({
+        "located": {"location": "Tokyo", "bio": None},
+        "plain": {"location": None, "bio": None},
+    })
+
+    calls = {"locations": 0, "fresh": 0}
+    get_many, fresh_nodes = social_network.user_location_store.get_many, store.fresh_nodes
+
+    def counted_get_many(logins):
+        calls["locations"] += 1
+        return get_many(logins)
+
+    def counted_fresh_nodes(logins, kind):
+        calls["fresh"] += 1
+        return fresh_nodes(logins, kind)
+
+    monkeypatch.setattr(social_network.user_location_store, "get_many", counted_get_many)
+    monkeypatch.setattr(store, "fresh_nodes", counted_fresh_nodes)
+    monkeypatch.setattr(store, "is_fresh", lambda *args: pytest.fail("逐个查询图中状态"))
+
+    candidates = social_network._claim_candidates("root", 0, 3, {"root"})
+    assert calls == {"locations": 1, "fresh": 1}
+    ranked = [login for _, login, _, _ in sorted(candidates, reverse=True)]
+    # 已在图中（不花请求）> 位置已缓存 > 其他；单向关注者不展开
+    assert ranked == ["stored", "located", "plain"]
+    assert [is_fresh for _, login, _, is_fresh in candidates if login == "stored"] == [True]
@@ -0,0 +1,74 @@
+import numpy as np
+
+import timezone_analysis
+from timezone_analysis import LOCAL_ACTIVITY_TEMPLATE, activity_histogram, analyze_timezone, fit_utc_offset
+
+
+def _events_for_offset(offset, days=10):
+    """按典型作息模板生成某个 UTC 偏移下的事件时间（UTC）"""
+    times = []
+    for day in range(days):
+        for local_hour, weight in enumerate(LOCAL_ACTIVITY_TEMPLATE):
+            utc_hour = (local_hour - offset) % 24
+            for _ in range(int(weight * 10)):
+                times.append(f"2024-05-{day + 1:02d}T{utc_hour:02d}:30:00Z")
+    return times
+
+
+def test_activity_histogram():
+    hours, weekdays = activity_histogram(["2024-05-06T13:45:00Z", "2024-05-06T13:05:00Z", "2024-05-12T00:00:00Z"])
+    assert hours[13] == 2 and hours[0] == 1 and hours.sum() == 3
+    # 2024-05-06 是周一，2024-05-12 是周日
+    assert weekdays.tolist() == [2, 0, 0, 0, 0, 0, 1]
+
+
+def test_fit_recovers_offset():
+    for offset in (-5, 0, 8):
+        hours, _ = activity_histogram(_events_for_offset(offset, days=1))
+        best, scores = fit_utc_offset(hours)
+        assert best == offset
+        assert len(scores) == len(timezone_analysis.CANDIDATE_OFFSETS)
+
+
+def test_fit_on_empty_histogram_does_not_divide_by_zero():
+    _, scores = fit_utc_offset(np.zeros(24))
+    assert np.all(scores == 0)
+
+
+def test_analyze_timezone(monkeypatch):
+    monkeypatch.setattr(timezone_analysis, "TIMEZONE_MIN_EVENTS", 10)
+    result = analyze_timezone("u", event_times=_events_for_offset(8))
+    assert result["commit_timezone"] == "UTC+8"
+    assert result["country"] == "CN"
+    assert 0 < result["confidence"] <= timezone_analysis.TIMEZONE_MAX_CONFIDENCE
+    assert len(result["activity_patterns"]["local_hourly"]) == 24
+
+
+def test_too_few_events(monkeypatch):
+    monkeypatch.setattr(timezone_analysis, "TIMEZONE_MIN_EVENTS", 10)
+    assert analyze_timezone("u", event_times=["2024-05-06T13:45:00Z"]) is None
+
+
+def test_weekday_histogram_uses_local_time():
+    # UTC 周日 23:30 在 UTC+8 是周一 07:30
+    hours, weekdays = activity_histogram(["2024-05-12T23:30:00Z"], utc_offset=8)
+    assert hours[7] == 1
+    assert weekdays.tolist() == [1, 0, 0, 0, 0, 0, 0]
+    _, utc_weekdays = activity_histogram(["2024-05-12T23:30:00Z"])
+    assert utc_weekdays.tolist() == [0, 0, 0, 0, 0, 0, 1]
+
+
+def test_analyze_timezone_reports_local_patterns(monkeypatch):
+    monkeypatch.setattr(timezone_analysis, "TIMEZONE_MIN_EVENTS", 10)
+    events = _events_for_offset(8)
+    result = analyze_timezone("u", event_times=events)
+    utc_hours, _ = activity_histogram(events)
+    assert result["activity_patterns"]["local_hourly"] == np.roll(utc_hours, 8).tolist()
+    assert result["activity_patterns"]["weekday"] == activity_histogram(events, 8)[1].tolist()
+    assert result["region"] == timezone_analysis.OFFSET_REGIONS[8][0]
+
+
+def test_region_table_covers_every_candidate_offset():
+    assert sorted(timezone_analysis.OFFSET_REGIONS) == timezone_analysis.CANDIDATE_OFFSETS.tolist()
+    assert timezone_analysis.OFFSET_COUNTRY_MAP[8] == "CN"
+    assert 2 not in timezone_analysis.OFFSET_COUNTRY_MAP
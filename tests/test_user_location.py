@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import user_location
+from http_cache import build_cached_response
+from user_location import UserLocationStore, get_user_locations, remember_user_location
+
+
+class FakeClient:
+    """/users/{login}：名称以 ghost 开头的用户 404，以 flaky 开头的返回 502"""
+
+    def __init__(self):
+        self.urls = []
+
+    def get_many(self, urls, max_workers=None):
+        responses = []
+        for url in urls:
+            self.urls.append(url)
+            login = url.rsplit("/", 1)[1]
+            if login.startswith("ghost"):
+                responses.append(build_cached_response(url, 404, ""))
+            elif login.startswith("flaky"):
+                responses.append(build_cached_response(url, 502, ""))
+            else:
+                responses.append(build_cached_response(url, 200, json.dumps(
+                    {"login": login, "location": f"City of {login}", "bio": None})))
+        return responses
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(user_location, "github_client", fake)
+    monkeypatch.setattr(user_location, "user_location_store",
+                        UserLocationStore(str(tmp_path / "locations.sqlite3"), ttl=3600))
+    return fake
+
+
+def test_store_is_case_insensitive_and_expires(tmp_path):
+    store = UserLocationStore(str(tmp_path / "locations.sqlite3"), ttl=3600)
+    store.put_many({"Alice": {"location": "Paris", "bio": "hi"}})
+    assert store.get_many(["alice", "bob"]) == {"alice": {"location": "Paris", "bio": "hi"}}
+
+    expired = UserLocationStore(str(tmp_path / "locations.sqlite3"), ttl=-1)
+    assert expired.get_many(["alice"]) == {}
+
+
+def test_database_opened_on_first_use(tmp_path):
+    store = UserLocationStore(str(tmp_path / "cache" / "locations.sqlite3"), ttl=3600)
+    assert not (tmp_path / "cache").exists()
+    assert store.get_many(["alice"]) == {}
+    assert (tmp_path / "cache" / "locations.sqlite3").exists()
+
+
+def test_get_many_handles_large_batches(tmp_path):
+    store = UserLocationStore(str(tmp_path / "locations.sqlite3"), ttl=3600)
+    logins = [f"u{i}" for i in range(1200)]
+    store.put_many({login: {"location": "X", "bio": None} for login in logins})
+    assert len(store.get_many(logins)) == 1200
+
+
+def test_get_user_locations_caches_results(client):
+    result = get_user_locations(["bob", "ghost1", "flaky1", "bob"])
+    # 按输入顺序；请求失败（非 404）的用户不出现在结果中
+    assert list(result) == ["bob", "ghost1"]
+    assert result["bob"] == {"location": "City of bob", "bio": None}
+    assert result["ghost1"] == {"location": None, "bio": None}
+    assert len(client.urls) == 3
+
+    # 已缓存的用户（包括不存在的用户）不再请求，失败的用户下次重试
+    get_user_locations(["bob", "ghost1", "flaky1"])
+    assert client.urls[3:] == ["https://api.github.com/users/flaky1"]
+
+
+def test_remember_user_location(client):
+    remember_user_location({"login": "carol", "location": "Berlin", "bio": "dev"})
+    remember_user_location(None)
+    assert get_user_locations(["carol"]) == {"carol": {"location": "Berlin", "bio": "dev"}}
+    assert client.urls == []
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import random
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+import requests
+
+import user_profile
+from circuit_breaker import CircuitOpenError
+from github_client import GitHubClient, GraphQLError
+
+
+def _page(names, end_cursor=None):
+    return {"user": {"repositories": {
+        "nodes": [
+            {
+                "name": name,
+                "description": None,
+                "stargazerCount": 1,
+                "forkCount": 0,
+                "url": f"https://github.com/u/{name}",
+                "languages": {"edges": [{"size": 10, "node": {"name": "Python"}}]},
+                "repositoryTopics": {"nodes": [{"topic": {"name": "cli"}}]},
+            }
+            for name in names
+        ],
+        "pageInfo": {"hasNextPage": end_cursor is not None, "endCursor": end_cursor},
+    }}}
+
+
+# 按 (ownerAffiliations, cursor) 返回的假数据：owner 两页，member 一页
+PAGES = {
+    (("OWNER",), None): _page(["a"], "c1"),
+    (("OWNER",), "c1"): _page(["b"]),
+    (("COLLABORATOR", "ORGANIZATION_MEMBER"), None): _page(["m"]),
+}
+
+
+def _answer(variables):
+    return PAGES[(tuple(variables["ownerAffiliations"]), variables["cursor"])]
+
+
+class FakeSyncClient:
+    def __init__(self, can_use_graphql=True):
+        self.can_use_graphql = can_use_graphql
+        self.calls = []
+
+    def graphql(self, query, variables):
+        self.calls.append(variables)
+        return _answer(variables)
+
+
+class FakeAsyncClient(FakeSyncClient):
+    async def graphql(self, query, variables):
+        return super().graphql(query, variables)
+
+
+def _summary(repos):
+    return [(repo["repo_name"], repo["repo_type"], repo["language_detail"]) for repo in repos]
+
+
+EXPECTED = [("a", "owner", {"Python": 10}), ("b", "owner", {"Python": 10}), ("m", "member", {"Python": 10})]
+
+
+def test_graphql_repos_follow_cursors(monkeypatch):
+    client = FakeSyncClient()
+    monkeypatch.setattr(user_profile, "github_client", client)
+    repos = user_profile.get_user_repos("u")
+
+    assert _summary(repos) == EXPECTED
+    assert repos[0]["repo_topics"] == ["cli"]
+    assert repos[0]["repo_languages"] == ["Python"]
+    assert repos[0]["html_url"] == "https://github.com/u/a"
+    assert [call["cursor"] for call in client.calls] == [None, "c1", None]
+
+
+def test_graphql_failure_falls_back_to_rest(monkeypatch):
+    class MissingUserClient(FakeSyncClient):
+        def graphql(self, query, variables):
+            return {"user": None}
+
+    monkeypatch.setattr(user_profile, "github_client", MissingUserClient())
+    monkeypatch.setattr(user_profile, "_get_user_repos_rest", lambda username: ["rest"])
+    assert user_profile.get_user_repos("u") == ["rest"]
+    with pytest.raises(GraphQLError):
+        user_profile._get_user_repos_graphql("u")
+
+
+def test_without_token_uses_rest(monkeypatch):
+    client = FakeSyncClient(can_use_graphql=False)
+    monkeypatch.setattr(user_profile, "github_client", client)
+    monkeypatch.setattr(user_profile, "_get_user_repos_rest", lambda username: ["rest"])
+    assert user_profile.get_user_repos("u") == ["rest"]
+    assert client.calls == []
+
+
+def test_sync_and_async_graphql_paths_share_pagination(monkeypatch):
+    sync_client = FakeSyncClient()
+    monkeypatch.setattr(user_profile, "github_client", sync_client)
+    sync_repos = user_profile._get_user_repos_graphql("u")
+
+    async_client = FakeAsyncClient()
+    async_repos = asyncio.run(user_profile._get_user_repos_graphql_async("u", async_client))
+
+    assert _summary(sync_repos) == _summary(async_repos) == EXPECTED
+    assert sync_client.calls == async_client.calls
+    assert [call["cursor"] for call in sync_client.calls] == [None, "c1", None]
+
+
+def test_missing_user_raises_graphql_error():
+    pages = user_profile._graphql_repo_pages("ghost")
+    next(pages)
+    with pytest.raises(GraphQLError):
+        pages.send({"user": None})
+
+
+def test_rest_path_fetches_each_page_languages_in_one_batch(monkeypatch):
+    class RestClient:
+        can_use_graphql = False
+
+        def __init__(self):
+            self.batches = []
+
+        def paginate_pages(self, url, params=None):
+            if params["type"] == "owner":
+                yield [_rest_repo("a"), _rest_repo("b")]
+                yield [_rest_repo("c")]
+
+        def get_many(self, urls):
+            urls = list(urls)
+            self.batches.append(urls)
+            return [_languages_response(url) for url in urls]
+
+    client = RestClient()
+    monkeypatch.setattr(user_profile, "github_client", client)
+    repos = user_profile.get_user_repos("u")
+
+    assert [(repo["repo_name"], repo["language_detail"]) for repo in repos] == [
+        ("a", {"Go": 1}), ("b", {}), ("c", {"Go": 1}),
+    ]
+    assert [len(batch) for batch in client.batches] == [2, 1]
+
+
+def _rest_repo(name):
+    return {"name": name, "description": None, "stargazers_count": 0, "forks_count": 0,
+            "html_url": f"https://github.com/u/{name}", "topics": [],
+            "languages_url": f"https://api.github.com/repos/u/{name}/languages"}
+
+
+def _languages_response(url):
+    # 仓库 b 的语言请求失败，按空语言处理
+    response = requests.Response()
+    response.status_code = 500 if "/b/" in url else 200
+    response._content = b'{"Go": 1}'
+    return response
+
+
+def test_async_profile_lets_open_breaker_propagate():
+    class OpenBreakerClient:
+        async def get(self, url):
+            raise CircuitOpenError("GitHub API", 0)
+
+    class BrokenNetworkClient:
+        async def get(self, url):
+            raise asyncio.TimeoutError()
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(user_profile.get_user_profile_async("u", OpenBreakerClient()))
+    assert asyncio.run(user_profile.get_user_profile_async("u", BrokenNetworkClient())) is None
+
+
+FOLLOWERS_URL = "https://api.github.com/users/u/followers"
+
+
+def _followers_client(page_count, per_page=100):
+    """关注者列表共 page_count 页，每页 per_page 人；记录请求过的页码"""
+    client = GitHubClient(tokens=[None])
+    requested = []
+
+    def get(url, params=None, use_cache=True):
+        query = dict(parse_qsl(urlsplit(client.build_url(url, params)).query))
+        page = int(query.get("page", 1))
+        requested.append(page)
+        response = requests.Response()
+        response.status_code = 200
+        users = [{"login": f"p{page}_{i}"} for i in range(per_page)] if page <= page_count else []
+        response._content = json.dumps(users).encode("utf-8")
+        if page == 1 and page_count > 1:
+            response.headers["Link"] = f'<{FOLLOWERS_URL}?page={page_count}>; rel="last"'
+        return response
+
+    client.get = get
+    return client, requested
+
+
+def test_random_sampling_reads_a_bounded_number_of_pages(monkeypatch):
+    client, requested = _followers_client(page_count=50)
+    monkeypatch.setattr(user_profile, "github_client", client)
+    random.seed(7)
+
+    logins = list(user_profile.iter_user_logins(FOLLOWERS_URL, max_items=150, sampling="random"))
+
+    assert len(logins) == len(set(logins)) == 150
+    # 第 1 页读 Link 头，再随机抽 max_items / per_page + 1 = 3 页，与列表总长度无关
+    assert len(set(requested)) <= 4
+    assert {int(login[1:].split("_")[0]) for login in logins} <= set(requested)
+
+
+def test_random_sampling_reads_short_lists_in_full(monkeypatch):
+    client, requested = _followers_client(page_count=2)
+    monkeypatch.setattr(user_profile, "github_client", client)
+    logins = list(user_profile.iter_user_logins(FOLLOWERS_URL, max_items=500, sampling="random"))
+    assert sorted(logins) == sorted(f"p{page}_{i}" for page in (1, 2) for i in range(100))
+
+
+def test_recent_sampling_keeps_github_order(monkeypatch):
+    client, _ = _followers_client(page_count=50)
+    monkeypatch.setattr(user_profile, "github_client", client)
+    logins = list(user_profile.iter_user_logins(FOLLOWERS_URL, max_items=120))
+    assert logins == [f"p1_{i}" for i in range(100)] + [f"p2_{i}" for i in range(20)]
+    with pytest.raises(ValueError):
+        list(user_profile.iter_user_logins(FOLLOWERS_URL, sampling="oldest"))